@@ -0,0 +1,2 @@
+# benchmarks package
+# Run from ai_service/, e.g. python -m benchmarks.bench_keywords
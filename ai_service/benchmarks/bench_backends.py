@@ -0,0 +1,156 @@
+"""
+CPU execution backends: latency, peak RSS and accuracy drift vs torch fp32
+
+    python -m benchmarks.bench_backends [--models embedding,vision,extractor]
+        [--backends torch,int8,onnx] [--images DIR] [--limit 20]
+
+Each (model, backend) runs in a fresh process so RSS numbers don't mix.
+The first onnx run also exports the model into MODEL_CACHE_DIR/onnx/.
+Eval set: the benchmark sample posts for text models, and the photos in
+--images for DETR (synthetic frames are used for timing only otherwise)
+"""
+
+import os
+import glob
+import time
+import argparse
+import resource
+import statistics
+import multiprocessing
+from typing import Any, Dict, List
+
+import numpy as np
+
+from benchmarks.corpus import load_corpus
+
+MODEL_ENV = {"embedding": "EMBEDDING", "vision": "VISION", "extractor": "EXTRACTOR"}
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _load_images(image_dir: str, limit: int):
+    from PIL import Image
+
+    if image_dir:
+        paths = sorted(glob.glob(os.path.join(image_dir, "*")))[:limit]
+        return [Image.open(p).convert("RGB") for p in paths], True
+
+    rng = np.random.default_rng(0)
+    images = []
+    for _ in range(min(limit, 8)):
+        frame = rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)
+        images.append(Image.fromarray(frame))
+    return images, False
+
+
+def _measure(model: str, backend: str, texts: List[str], image_dir: str, limit: int) -> Dict[str, Any]:
+    """Runs in a child process: load one model on one backend and run the eval set"""
+    os.environ[f"{MODEL_ENV[model]}_BACKEND"] = backend
+    rss_before = _rss_mb()
+
+    started = time.perf_counter()
+    if model == "embedding":
+        from models.embedder import EmbeddingModel
+        instance = EmbeddingModel(device="cpu")
+        run, inputs = (lambda text: instance.encode(text)), texts
+    elif model == "vision":
+        from models.vision import VisionModel
+        instance = VisionModel(device="cpu")
+        images, _ = _load_images(image_dir, limit)
+        run, inputs = (lambda image: instance.detect_objects(image, threshold=0.5)), images
+    else:
+        from models.extractor import ItemExtractor
+        instance = ItemExtractor(device="cpu")
+        if instance.model is None:
+            raise RuntimeError("Local LLM failed to load")
+        run, inputs = (lambda text: instance._llm_extraction(text)), texts
+    load_seconds = time.perf_counter() - started
+
+    run(inputs[0])
+    latencies, outputs = [], []
+    for item in inputs:
+        started = time.perf_counter()
+        outputs.append(run(item))
+        latencies.append(time.perf_counter() - started)
+
+    return {
+        "outputs": outputs,
+        "load_s": load_seconds,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": sorted(latencies)[int(0.95 * (len(latencies) - 1))] * 1000,
+        "rss_mb": _rss_mb() - rss_before,
+    }
+
+
+def drift(model: str, reference: List[Any], outputs: List[Any]) -> str:
+    """Agreement of a backend's outputs with the torch fp32 outputs"""
+    if model == "embedding":
+        ref, out = np.stack(reference), np.stack(outputs)
+        cosine = np.sum(ref * out, axis=1)
+        # Nearest neighbour of each post within the eval set
+        same_neighbour = np.mean(
+            np.argsort(-(ref @ ref.T), axis=1)[:, 1] == np.argsort(-(out @ out.T), axis=1)[:, 1]
+        )
+        return f"cosine min {cosine.min():.4f} mean {cosine.mean():.4f}, same top-1 neighbour {same_neighbour:.0%}"
+
+    if model == "vision":
+        overlaps, conf_diffs = [], []
+        for ref, out in zip(reference, outputs):
+            ref_labels = {d["label"]: d["confidence"] for d in ref}
+            out_labels = {d["label"]: d["confidence"] for d in out}
+            union = set(ref_labels) | set(out_labels)
+            overlaps.append(len(set(ref_labels) & set(out_labels)) / len(union) if union else 1.0)
+            conf_diffs += [abs(ref_labels[l] - out_labels[l]) for l in set(ref_labels) & set(out_labels)]
+        max_diff = max(conf_diffs) if conf_diffs else 0.0
+        return f"label overlap {np.mean(overlaps):.0%}, max confidence diff {max_diff:.3f}"
+
+    same_category = np.mean([r.get("category") == o.get("category") for r, o in zip(reference, outputs)])
+    same_title = np.mean([r.get("title") == o.get("title") for r, o in zip(reference, outputs)])
+    return f"same category {same_category:.0%}, same title {same_title:.0%}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--models", default="embedding,vision,extractor")
+    parser.add_argument("--backends", default="torch,int8,onnx")
+    parser.add_argument("--images", help="Directory of eval photos for DETR")
+    parser.add_argument("--corpus", help="JSONL file with a 'text' field per line")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    texts = load_corpus(args.corpus, repeat=1)[:args.limit]
+    backends = args.backends.split(",")
+    if "torch" not in backends:
+        backends.insert(0, "torch")
+
+    context = multiprocessing.get_context("spawn")
+    for model in args.models.split(","):
+        print(f"\n== {model} ==")
+        if model == "vision" and not args.images:
+            print("(no --images: synthetic frames, drift is not meaningful)")
+
+        reference = None
+        for backend in backends:
+            with context.Pool(1) as pool:
+                try:
+                    result = pool.apply(_measure, (model, backend, texts, args.images, args.limit))
+                except Exception as e:
+                    print(f"{backend:<6} failed: {e}")
+                    continue
+
+            line = (
+                f"{backend:<6} load {result['load_s']:>6.1f} s  p50 {result['p50_ms']:>8.1f} ms"
+                f"  p95 {result['p95_ms']:>8.1f} ms  RSS +{result['rss_mb']:>7.0f} MB"
+            )
+            if backend == "torch":
+                reference = result["outputs"]
+            elif reference is not None:
+                line += "  | " + drift(model, reference, result["outputs"])
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Long-text embedding: truncation vs chunk-and-pool, and length-sorted batching
+
+    python -m benchmarks.bench_embed_long [--device cpu] [--docs 200] [--corpus posts.jsonl]
+
+Retrieval: synthetic long "social media" posts - chatter, then the item,
+then where it was last seen at the end - each queried by a short text
+naming the item and the place. Every (item, place) pair is one post, so a
+mode that loses the tail can't tell same-item posts apart.
+Modes: legacy (first 512 characters, as before), truncate (first
+max_seq_length tokens), mean / max (chunks pooled)
+
+Throughput: the same mixed-length texts sent as fixed 32-text batches in
+arrival order vs plan_batches (sorted by token length, token budget)
+"""
+
+import time
+import argparse
+from typing import List, Tuple
+
+import numpy as np
+
+from benchmarks.corpus import SAMPLE_POSTS, load_corpus
+
+PLACES = [
+    "Riverside Mall", "Central Station", "the city library", "Oak Street bus stop",
+    "Galle Face Green", "the university gym", "Union Square", "the airport taxi stand",
+    "Maple Avenue park", "the night market",
+]
+
+CHATTER = [
+    "Honestly this week has been a mess and I don't even know where to start.",
+    "Sharing this for a friend, please share it around too!",
+    "Thanks everyone who messaged yesterday, you are all amazing.",
+    "I was running late for work and everything went wrong from there.",
+    "It was raining so hard and the buses were packed as usual.",
+    "Long story short I only noticed when I got home in the evening.",
+    "Posting here because the last group was really helpful.",
+    "We checked with the security desk but they had nothing yet.",
+    "My phone battery was almost dead so I couldn't call anyone right away.",
+    "If this is the wrong group please let me know where to post.",
+]
+
+
+def long_posts(n: int, seed: int = 0) -> Tuple[List[str], List[str]]:
+    """(documents, queries), query i should retrieve document i"""
+    rng = np.random.default_rng(seed)
+    docs, queries = [], []
+    for i in range(n):
+        item = SAMPLE_POSTS[i % len(SAMPLE_POSTS)]
+        place = PLACES[(i // len(SAMPLE_POSTS)) % len(PLACES)]
+        chatter = []
+        target = rng.integers(300, 2500)
+        while sum(len(c) for c in chatter) < target:
+            chatter.append(CHATTER[rng.integers(len(CHATTER))])
+        split = rng.integers(len(chatter) + 1)
+        docs.append(
+            " ".join(chatter[:split]) + f" {item} " + " ".join(chatter[split:])
+            + f" Last seen near {place}, please DM or call 555-01{i % 100:02d}."
+        )
+        queries.append(f"{' '.join(item.split()[:8])} near {place}")
+    return docs, queries
+
+
+def retrieval(model, docs: List[str], queries: List[str]) -> Tuple[float, float]:
+    """recall@1 and MRR of each query's own document"""
+    doc_embs = np.stack(model.encode_batch(docs))
+    query_embs = np.stack(model.encode_batch(queries))
+    scores = query_embs @ doc_embs.T
+    ranks = (scores > scores[np.arange(len(queries)), np.arange(len(queries))][:, None]).sum(axis=1)
+    return float(np.mean(ranks == 0)), float(np.mean(1.0 / (ranks + 1)))
+
+
+def padded_tokens(lengths: List[int], batches: List[List[int]]) -> Tuple[int, int]:
+    """(real, padded) tokens over a batch plan"""
+    real = sum(lengths)
+    padded = sum(len(b) * max(lengths[i] for i in b) for b in batches)
+    return real, padded
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--corpus", help="JSONL file with a 'text' field per line (throughput only)")
+    args = parser.parse_args()
+
+    from models.embedder import EmbeddingModel
+
+    model = EmbeddingModel(device=args.device)
+    docs, queries = long_posts(args.docs)
+    doc_tokens = model.token_lengths(docs)
+    print(f"{len(docs)} long posts, {np.median(doc_tokens):.0f} tokens median,"
+          f" {np.mean(np.array(doc_tokens) > model.max_seq_length):.0%} over max_seq_length {model.max_seq_length}")
+
+    print("\n== retrieval (query -> its own post) ==")
+    for mode in ("legacy", "truncate", "mean", "max"):
+        model.long_text = "truncate" if mode == "legacy" else mode
+        inputs = [d[:512] for d in docs] if mode == "legacy" else docs
+        started = time.perf_counter()
+        recall, mrr = retrieval(model, inputs, queries)
+        seconds = time.perf_counter() - started
+        print(f"{mode:<9} recall@1 {recall:.1%}  MRR {mrr:.3f}  ({(len(docs) + len(queries)) / seconds:.0f} texts/s)")
+
+    print("\n== throughput, mixed lengths ==")
+    model.long_text = "truncate"
+    if args.corpus:
+        texts = load_corpus(args.corpus)
+    else:
+        texts = load_corpus(repeat=20) + docs * 2
+    order = np.random.default_rng(1).permutation(len(texts))
+    texts = [texts[i] for i in order]
+    lengths = [min(n, model.max_seq_length) for n in model.token_lengths(texts)]
+    model.encode_batch(texts[:32])  # Warm-up
+
+    fixed = [list(range(i, min(i + 32, len(texts)))) for i in range(0, len(texts), 32)]
+    pieces, planned = model.plan(texts)
+    for name, batches in (("fixed 32", fixed), ("planned", planned)):
+        started = time.perf_counter()
+        for batch in batches:
+            model.encode_with_backoff([pieces[i] for i in batch])
+        seconds = time.perf_counter() - started
+        real, padded = padded_tokens(lengths, batches)
+        print(
+            f"{name:<9} {len(texts) / seconds:>7.0f} texts/s  {len(batches):>4} batches"
+            f"  padding {1 - real / padded:.0%} of {padded} tokens"
+        )
+
+
+if __name__ == "__main__":
+    main()
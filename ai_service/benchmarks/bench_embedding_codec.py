@@ -0,0 +1,100 @@
+"""
+Compact embedding encodings: size on the wire/disk and recall@10 vs float32
+
+    python -m benchmarks.bench_embedding_codec [--corpus posts.jsonl] [--device cpu]
+        [--synthetic 5000] [--k 10]
+
+Stored vectors go through quantize/dequantize, queries stay float32 (as
+for a fresh post scored against stored ones). recall@k is the share of
+each post's exact float32 top-k neighbours that the encoded set returns.
+Without --corpus the sample posts are combined pairwise for a few hundred
+distinct texts; --synthetic skips the model and uses clustered random
+unit vectors instead
+"""
+
+import json
+import time
+import base64
+import argparse
+from typing import List
+
+import numpy as np
+
+from benchmarks.corpus import SAMPLE_POSTS, load_corpus
+from models.embedder import EMBEDDING_ENCODINGS, encoded_size, quantize_embeddings, dequantize_embeddings
+
+
+def _texts(path: str) -> List[str]:
+    if path:
+        return load_corpus(path)
+    return [f"{a} {b}" for a in SAMPLE_POSTS for b in SAMPLE_POSTS if a != b]
+
+
+def _synthetic(n: int, dimension: int, seed: int = 0) -> np.ndarray:
+    # Clustered like real posts (many near-duplicates per item type)
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, n // 50), dimension))
+    vectors = centers[rng.integers(len(centers), size=n)] + rng.normal(scale=0.6, size=(n, dimension))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def top_k(queries: np.ndarray, stored: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ stored.T
+    np.fill_diagonal(scores, -np.inf)  # A post is not its own neighbour
+    top = np.argpartition(-scores, k, axis=1)[:, :k]
+    return top
+
+
+def recall_at_k(reference: np.ndarray, approx: np.ndarray) -> float:
+    hits = [len(set(r) & set(a)) for r, a in zip(reference, approx)]
+    return float(np.sum(hits)) / reference.size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", help="JSONL file with a 'text' field per line")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--synthetic", type=int, default=0, help="Random vectors instead of the model")
+    parser.add_argument("--dimension", type=int, default=384, help="With --synthetic")
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        embeddings = _synthetic(args.synthetic, args.dimension)
+        source = f"{args.synthetic} synthetic vectors"
+    else:
+        from models.embedder import EmbeddingModel
+
+        model = EmbeddingModel(device=args.device)
+        texts = _texts(args.corpus)
+        embeddings = np.stack(model.encode_batch(texts)).astype(np.float32)
+        source = f"{len(texts)} posts, {model.version}"
+
+    n, dimension = embeddings.shape
+    k = min(args.k, n - 1)
+    reference = top_k(embeddings, embeddings, k)
+    print(f"{source}, {dimension}-d, recall@{k}")
+
+    json_bytes = np.mean([len(json.dumps(e.tolist())) for e in embeddings[:200]])
+    mongo_bytes = 8 * dimension  # [Number] is an array of doubles
+    print(f"{'json list':<9} {json_bytes:>7.0f} B wire  {mongo_bytes:>6} B stored (float64 array)")
+
+    for encoding in EMBEDDING_ENCODINGS:
+        started = time.perf_counter()
+        blobs = quantize_embeddings(embeddings, encoding)
+        decoded = dequantize_embeddings(blobs, encoding, dimension)
+        codec_ms = (time.perf_counter() - started) * 1000
+
+        size = encoded_size(encoding, dimension)
+        b64 = len(base64.b64encode(blobs[0].tobytes()))
+        cosine = np.sum(embeddings * decoded, axis=1) / np.linalg.norm(decoded, axis=1)
+        recall = recall_at_k(reference, top_k(embeddings, decoded, k))
+        print(
+            f"{encoding:<9} {b64:>7} B wire  {size:>6} B stored"
+            f"  cosine min {cosine.min():.5f}  recall@{k} {recall:.2%}"
+            f"  (round trip {codec_ms:.1f} ms for {n})"
+        )
+
+
+if __name__ == "__main__":
+    main()
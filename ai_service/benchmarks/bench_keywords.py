@@ -0,0 +1,220 @@
+"""
+Rule-based extraction throughput: compiled keyword matcher vs the
+previous per-keyword substring scan
+
+    python -m benchmarks.bench_keywords [--corpus posts.jsonl] [--rounds 10]
+
+Timings are best-of-rounds and still vary between runs; also reports
+how many posts the whole-word matching extracts differently
+"""
+
+import re
+import time
+import argparse
+from typing import Any, Dict
+
+from benchmarks.corpus import load_corpus
+from utils.rules import rule_based_pass, KEYWORD_MATCHER, COLORS, BRANDS, ITEM_TYPES
+from utils.prompts import CATEGORIES
+
+
+# Previous implementation, kept verbatim for comparison
+def legacy_rule_based_extraction(text: str) -> Dict[str, Any]:
+    result = {"title": None, "description": text[:500] if text else None, "category": None,
+              "attributes": {}, "location": None, "date": None, "contact_info": None, "reward": None}
+    text_lower = text.lower()
+
+    for category, keywords in CATEGORIES.items():
+        if any(kw in text_lower for kw in keywords):
+            result["category"] = category
+            break
+    if not result["category"]:
+        result["category"] = "other"
+
+    colors = ["black", "white", "red", "blue", "green", "yellow", "orange", "purple",
+              "pink", "brown", "gray", "grey", "silver", "gold", "beige", "navy", "maroon"]
+    for color in colors:
+        if color in text_lower:
+            result["attributes"]["color"] = color
+            break
+
+    brands = ["apple", "iphone", "samsung", "galaxy", "google", "pixel", "huawei", "xiaomi",
+              "oneplus", "sony", "lg", "motorola", "nokia", "hp", "dell", "lenovo", "asus",
+              "acer", "microsoft", "surface", "macbook", "ipad", "airpods", "nike", "adidas",
+              "puma", "reebok", "converse", "vans", "gucci", "louis vuitton", "prada",
+              "coach", "michael kors", "ray-ban", "oakley", "rolex", "casio", "fossil"]
+    for brand in brands:
+        if brand in text_lower:
+            result["attributes"]["brand"] = brand.title()
+            break
+
+    location_patterns = [
+        r'(?:at|near|in|around|by|outside|inside)\s+(?:the\s+)?([A-Z][a-zA-Z\s]+(?:station|park|mall|center|centre|street|road|avenue|plaza|square|building|hospital|school|university|college|airport|market|store|shop|restaurant|cafe|hotel|office|gym|library|church|mosque|temple))',
+        r'(?:near|at|in)\s+([A-Z][a-zA-Z\s]+)',
+        r'(?:on|along)\s+([A-Z][a-zA-Z]+\s+(?:Street|Road|Avenue|Boulevard|Lane|Drive|Way|Place))',
+    ]
+    for pattern in location_patterns:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            loc_text = match.group(1).strip()
+            if len(loc_text) > 3:
+                result["location"] = {"description": loc_text}
+                break
+
+    date_patterns = [
+        r'(?:on|dated?)\s+(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4})',
+        r'(\d{1,2}\s+(?:January|February|March|April|May|June|July|August|September|October|November|December)(?:\s+\d{4})?)',
+        r'\b(yesterday|today|last\s+(?:night|evening|morning|week))\b',
+        r'\b(this\s+(?:morning|afternoon|evening))\b',
+    ]
+    for pattern in date_patterns:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            result["date"] = match.group(1) if match.lastindex else match.group(0)
+            break
+
+    contact = {}
+    phone_match = re.search(r'(\+?\d{1,3}[-.\s]?\(?\d{2,4}\)?[-.\s]?\d{3,4}[-.\s]?\d{3,4})', text)
+    if phone_match:
+        phone = re.sub(r'[^\d+]', '', phone_match.group(1))
+        if len(phone) >= 10:
+            contact["phone"] = phone
+    email_match = re.search(r'[\w\.-]+@[\w\.-]+\.\w+', text)
+    if email_match:
+        contact["email"] = email_match.group(0)
+    if contact:
+        result["contact_info"] = contact
+
+    reward_match = re.search(r'(?:reward|cash reward|offering)\s*[:of]?\s*\$?\s*(\d+)', text, re.IGNORECASE)
+    if reward_match:
+        result["reward"] = f"${reward_match.group(1)}"
+
+    item_types = {
+        "phone": ["phone", "iphone", "android", "smartphone", "mobile"],
+        "wallet": ["wallet", "purse", "billfold"],
+        "keys": ["keys", "keychain", "key fob", "car key"],
+        "bag": ["bag", "backpack", "handbag", "purse", "tote", "suitcase", "luggage"],
+        "laptop": ["laptop", "macbook", "notebook computer"],
+        "watch": ["watch", "smartwatch", "fitbit"],
+        "glasses": ["glasses", "sunglasses", "spectacles", "eyeglasses"],
+        "dog": ["dog", "puppy", "golden retriever", "labrador", "bulldog", "poodle", "beagle", "husky"],
+        "cat": ["cat", "kitten"],
+        "earbuds": ["earbuds", "airpods", "headphones", "earphones"],
+        "ring": ["ring", "engagement ring", "wedding ring"],
+        "necklace": ["necklace", "chain", "pendant"],
+        "camera": ["camera", "gopro", "dslr"],
+        "tablet": ["tablet", "ipad"],
+        "id card": ["id", "id card", "license", "passport", "driving license"],
+    }
+
+    detected_item = None
+    for item_name, keywords in item_types.items():
+        if any(kw in text_lower for kw in keywords):
+            detected_item = item_name
+            break
+
+    title_parts = []
+    if result["attributes"].get("color"):
+        title_parts.append(result["attributes"]["color"].title())
+    if result["attributes"].get("brand"):
+        title_parts.append(result["attributes"]["brand"])
+    if detected_item:
+        title_parts.append(detected_item.title())
+
+    if title_parts:
+        result["title"] = " ".join(title_parts)
+    else:
+        sentences = text.split('.')
+        for sentence in sentences:
+            clean = sentence.strip()
+            if 10 < len(clean) < 100:
+                if not re.search(r'call|contact|reward|email|phone|@', clean, re.IGNORECASE):
+                    result["title"] = clean
+                    break
+        if not result["title"]:
+            result["title"] = text[:80].strip()
+
+    return result
+
+
+def legacy_detect_post_type(text: str) -> str:
+    text_lower = text.lower()
+    lost_keywords = ["lost", "missing", "misplaced", "can't find", "cannot find",
+                    "dropped", "left behind", "help me find", "looking for",
+                    "have you seen", "please help", "i lost"]
+    found_keywords = ["found", "picked up", "discovered", "someone left",
+                     "claim", "owner", "is this yours", "belongs to",
+                     "i found", "we found", "came across"]
+    lost_score = sum(1 for kw in lost_keywords if kw in text_lower)
+    found_score = sum(1 for kw in found_keywords if kw in text_lower)
+    return "FOUND" if found_score > lost_score else "LOST"
+
+
+def legacy(text: str):
+    legacy_rule_based_extraction(text)
+    legacy_detect_post_type(text)
+
+
+def legacy_keyword_scan(text: str):
+    """Only the vocabulary lookups of the previous implementation"""
+    text_lower = text.lower()
+    for keywords in CATEGORIES.values():
+        if any(kw in text_lower for kw in keywords):
+            break
+    for color in COLORS:
+        if color in text_lower:
+            break
+    for brand in BRANDS:
+        if brand in text_lower:
+            break
+    for keywords in ITEM_TYPES.values():
+        if any(kw in text_lower for kw in keywords):
+            break
+    legacy_detect_post_type(text)
+
+
+def _fields(result: Dict[str, Any], post_type: str):
+    attributes = result["attributes"]
+    return result["category"], attributes.get("color"), attributes.get("brand"), result["title"], post_type
+
+
+def bench(name: str, fn, texts, rounds: int):
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for text in texts:
+            fn(text)
+        best = min(best, time.perf_counter() - started)
+    print(f"{name:<28} {len(texts) / best:>10,.0f} posts/s  ({best * 1000:.1f} ms)")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", help="JSONL file with a 'text' field per line")
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    texts = load_corpus(args.corpus)
+    print(f"Corpus: {len(texts)} posts\n")
+
+    distinct = set(texts)
+    changed = sum(
+        _fields(legacy_rule_based_extraction(t), legacy_detect_post_type(t)) != _fields(*rule_based_pass(t))
+        for t in distinct
+    )
+    print(f"Category/color/brand/title/post type differ on {changed} of {len(distinct)} distinct posts\n")
+
+    print("Keyword lookups only")
+    previous = bench("substring scan (previous)", legacy_keyword_scan, texts, args.rounds)
+    compiled = bench("compiled matcher", KEYWORD_MATCHER.scan, texts, args.rounds)
+    print(f"Speedup: {previous / compiled:.2f}x\n")
+
+    print("Full rule-based extraction + post type")
+    previous = bench("substring scan (previous)", legacy, texts, args.rounds)
+    compiled = bench("compiled matcher", rule_based_pass, texts, args.rounds)
+    print(f"Speedup: {previous / compiled:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Local LLM extraction: tokens and latency per request for each decoding mode
+
+    python -m benchmarks.bench_llm_decoding [--corpus posts.jsonl] [--limit 20]
+
+Loads LOCAL_LLM once and switches ItemExtractor.decoding between runs
+"""
+
+import time
+import argparse
+
+import torch
+
+from benchmarks.corpus import load_corpus
+from models.decoding import ConstrainedJsonDecoder
+from models.extractor import ItemExtractor
+
+
+def run(extractor: ItemExtractor, mode: str, texts):
+    extractor.decoding = mode
+    extractor.generate_requests = 0
+    extractor.generated_tokens = 0
+    extractor.json_decoder = None
+    if mode == "constrained":
+        extractor.json_decoder = ConstrainedJsonDecoder(
+            extractor.model, extractor.tokenizer, extractor.device
+        )
+
+    parsed = 0
+    started = time.perf_counter()
+    for text in texts:
+        if extractor._llm_extraction(text):
+            parsed += 1
+    elapsed = time.perf_counter() - started
+
+    stats = extractor.decode_stats()
+    print(
+        f"{mode:<12} {stats['output_tokens_per_request']:>8.1f} tokens/request"
+        f"  {elapsed / len(texts) * 1000:>8.0f} ms/request"
+        f"  {parsed}/{len(texts)} parsed"
+    )
+    if "model_tokens_per_request" in stats:
+        print(
+            f"{'':<12} {stats['model_tokens_per_request']:>8.1f} chosen by the model,"
+            f" {stats['forward_passes_per_request']:.1f} forward passes/request"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", help="JSONL file with a 'text' field per line")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    texts = load_corpus(args.corpus, repeat=1)[:args.limit]
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    extractor = ItemExtractor(device=device)
+    if extractor.model is None:
+        raise SystemExit("Local LLM failed to load (LLM_MODEL=local required)")
+
+    print(f"Model: {extractor.model_name} on {device}, {len(texts)} posts\n")
+    for mode in ("sample", "greedy", "constrained"):
+        run(extractor, mode, texts)
+
+
+if __name__ == "__main__":
+    main()
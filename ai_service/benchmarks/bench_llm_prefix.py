@@ -0,0 +1,99 @@
+"""
+Local LLM extraction latency with and without the pinned prompt prefix
+
+    python -m benchmarks.bench_llm_prefix [--corpus posts.jsonl] [--limit 20]
+
+Reports time to first token (prefill only) and full extraction latency
+"""
+
+import time
+import argparse
+import statistics
+
+import torch
+
+from benchmarks.corpus import load_corpus
+from models.extractor import ItemExtractor
+from utils.prompts import EXTRACTION_PROMPTS
+
+
+def sync():
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+
+
+def time_to_first_token(extractor: ItemExtractor, text: str, use_prefix: bool) -> float:
+    prompt = EXTRACTION_PROMPTS["text_extraction"].format(post_type="lost or found", text=text[:1000])
+    ids, prefix = extractor._prompt_ids("text_extraction", prompt)
+    if not use_prefix:
+        prefix = None
+
+    sync()
+    started = time.perf_counter()
+    with torch.no_grad():
+        extractor.model(
+            input_ids=torch.tensor([ids[len(prefix):] if prefix else ids], device=extractor.device),
+            past_key_values=prefix.cache() if prefix else None,
+            use_cache=True,
+        )
+    sync()
+    return time.perf_counter() - started
+
+
+def extraction_latency(extractor: ItemExtractor, text: str, use_prefix: bool) -> float:
+    prefixes = extractor.prefixes
+    if not use_prefix:
+        extractor.prefixes = {}
+    try:
+        sync()
+        started = time.perf_counter()
+        extractor._llm_extraction(text)
+        sync()
+        return time.perf_counter() - started
+    finally:
+        extractor.prefixes = prefixes
+
+
+def report(name: str, full, pinned):
+    full_ms = statistics.median(full) * 1000
+    pinned_ms = statistics.median(pinned) * 1000
+    print(f"{name:<22} full prefill {full_ms:>8.1f} ms   pinned prefix {pinned_ms:>8.1f} ms"
+          f"   ({full_ms / pinned_ms:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", help="JSONL file with a 'text' field per line")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    texts = load_corpus(args.corpus, repeat=1)[:args.limit]
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    extractor = ItemExtractor(device=device)
+    if extractor.model is None:
+        raise SystemExit("Local LLM failed to load (LLM_MODEL=local required)")
+    if "text_extraction" not in extractor.prefixes:
+        raise SystemExit("No pinned prefix for text_extraction (LLM_PIN_PREFIX=true required)")
+
+    pinned = len(extractor.prefixes["text_extraction"])
+    print(f"Model: {extractor.model_name} on {device}, decoding={extractor.decoding}, "
+          f"{pinned} pinned tokens, {len(texts)} posts\n")
+
+    # Warm up kernels and allocator
+    time_to_first_token(extractor, texts[0], True)
+    time_to_first_token(extractor, texts[0], False)
+
+    report(
+        "time to first token",
+        [time_to_first_token(extractor, t, False) for t in texts],
+        [time_to_first_token(extractor, t, True) for t in texts],
+    )
+    report(
+        "extraction latency",
+        [extraction_latency(extractor, t, False) for t in texts],
+        [extraction_latency(extractor, t, True) for t in texts],
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+/match/score core: vectorized score_matches vs a per-candidate port of
+calculateMatchScore from the backend's matching.service.js
+
+    python -m benchmarks.bench_match [--candidates 10000] [--dimension 384] [--runs 5]
+
+Candidates are synthetic posts around one city; with the default
+text_weight=0 the two totals must agree exactly
+"""
+
+import math
+import time
+import argparse
+import statistics
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+import numpy as np
+
+from benchmarks.corpus import SAMPLE_POSTS
+from utils.matching import score_matches, CandidateColumns
+from utils.prompts import CATEGORIES
+
+COLORS = ["black", "white", "blue", "red", "silver", None]
+BRANDS = ["Apple", "Samsung", "Nike", "Dell", None]
+MODELS = ["13", "S21", "Air", None]
+CITIES = ["Colombo", "Kandy", "Galle", None]
+
+
+def synthetic_posts(n: int, dimension: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(seed)
+    base = datetime(2024, 6, 1)
+    embeddings = rng.normal(size=(n, dimension)).astype(np.float32)
+    categories = list(CATEGORIES)
+    posts = []
+    for i in range(n):
+        text = SAMPLE_POSTS[i % len(SAMPLE_POSTS)]
+        posts.append({
+            "post_id": f"p{i}",
+            "title": text[:40],
+            "description": text,
+            "category": categories[rng.integers(len(categories))],
+            "attributes": {
+                "color": COLORS[rng.integers(len(COLORS))],
+                "brand": BRANDS[rng.integers(len(BRANDS))],
+                "model": MODELS[rng.integers(len(MODELS))],
+            },
+            "location": {
+                "city": CITIES[rng.integers(len(CITIES))],
+                "coordinates": [79.86 + rng.normal(0, 0.05), 6.93 + rng.normal(0, 0.05)],
+            },
+            "date": base + timedelta(hours=float(rng.integers(0, 24 * 45))),
+            "embedding": embeddings[i].tolist() if rng.random() < 0.9 else None,
+        })
+    return posts
+
+
+# Per-candidate port of calculateMatchScore (matching.service.js)
+def legacy_score(post1: Dict[str, Any], post2: Dict[str, Any], embedding1) -> float:
+    breakdown = {"category": 0, "attribute": 0, "location": 0, "time": 0, "embedding": 0}
+    if post1["category"] == post2["category"]:
+        breakdown["category"] = 25
+
+    attr_score = 0
+    a1, a2 = post1["attributes"], post2["attributes"]
+    for key, points in (("color", 8), ("brand", 10), ("model", 7)):
+        if a1.get(key) and a2.get(key) and a1[key].lower() == a2[key].lower():
+            attr_score += points
+    breakdown["attribute"] = min(attr_score, 25)
+
+    l1, l2 = post1["location"], post2["location"]
+    if l1.get("city") and l2.get("city"):
+        if l1["city"].lower() == l2["city"].lower():
+            breakdown["location"] = 20
+        elif l1.get("coordinates") and l2.get("coordinates"):
+            lon1, lat1 = l1["coordinates"]
+            lon2, lat2 = l2["coordinates"]
+            d_lat, d_lon = math.radians(lat2 - lat1), math.radians(lon2 - lon1)
+            a = (math.sin(d_lat / 2) ** 2
+                 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(d_lon / 2) ** 2)
+            distance = 6371 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+            if distance < 1:
+                breakdown["location"] = 20
+            elif distance < 5:
+                breakdown["location"] = 15
+            elif distance < 10:
+                breakdown["location"] = 10
+
+    days = abs((post1["date"] - post2["date"]).total_seconds()) / 86400
+    if days <= 1:
+        breakdown["time"] = 15
+    elif days <= 3:
+        breakdown["time"] = 12
+    elif days <= 7:
+        breakdown["time"] = 8
+    elif days <= 30:
+        breakdown["time"] = 4
+
+    embedding2 = post2.get("embedding")
+    if embedding1 is not None and embedding2 is not None and len(embedding1) == len(embedding2):
+        dot = norm1 = norm2 = 0.0
+        for x, y in zip(embedding1, embedding2):
+            dot += x * y
+            norm1 += x * x
+            norm2 += y * y
+        magnitude = math.sqrt(norm1) * math.sqrt(norm2)
+        similarity = dot / magnitude if magnitude > 0 else 0
+        breakdown["embedding"] = math.floor(similarity * 15 + 0.5)
+
+    return min(sum(breakdown.values()), 100)
+
+
+def legacy_top(query: Dict[str, Any], candidates: List[Dict[str, Any]], top_k: int = 10) -> List[tuple]:
+    scored = []
+    for candidate in candidates:
+        score = legacy_score(query, candidate, query["embedding"])
+        if score >= 40:
+            scored.append((candidate["post_id"], score))
+    scored.sort(key=lambda x: -x[1])
+    return scored[:top_k]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--candidates", type=int, default=10000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    posts = synthetic_posts(args.candidates + 1, args.dimension)
+    query, candidates = posts[0], posts[1:]
+    # Make the query embedding close to a few candidates so the AI factor matters
+    query["embedding"] = (np.asarray(candidates[7]["embedding"] or query["embedding"]) * 0.9).tolist()
+
+    timings = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        fast = score_matches(query, candidates)
+        timings.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    legacy = legacy_top(query, candidates)
+    legacy_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    CandidateColumns(candidates, args.dimension, with_tokens=False)
+    columns_time = time.perf_counter() - started
+
+    vectorized = statistics.median(timings)
+    print(f"{args.candidates} candidates, {args.dimension}-d embeddings")
+    print(f"vectorized  {vectorized * 1000:>9.1f} ms (median of {args.runs}),"
+          f" {columns_time * 1000:.1f} ms of it building columns from the post dicts")
+    print(f"per-post    {legacy_time * 1000:>9.1f} ms  ({legacy_time / vectorized:.0f}x)")
+    same = [(m["post_id"], m["score"]) for m in fast] == legacy
+    print(f"same top-10 ids and scores: {same}")
+
+    with_text = score_matches(query, candidates, text_weight=10)
+    print(f"with text overlap (weight 10): top score {with_text[0]['score'] if with_text else None}")
+
+
+if __name__ == "__main__":
+    main()
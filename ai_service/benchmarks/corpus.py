@@ -0,0 +1,45 @@
+"""
+Sample lost & found posts for benchmarks
+Pass --corpus with a JSONL export ({"text": ...} per line) to use real posts
+"""
+
+import json
+from typing import List, Optional
+
+SAMPLE_POSTS = [
+    "Lost my black iPhone 13 near Central Station yesterday. Reward $50. Call 555-123-4567",
+    "Found a brown leather wallet at the park this morning, has an ID card inside",
+    "LOST DOG! Golden retriever named Max, missing since last night near Oak Street",
+    "Did anyone see a blue Nike backpack? Left it on the bus, has my laptop inside",
+    "Found keys with a Toyota car key fob outside the library",
+    "I lost my gold engagement ring at the gym, please help. Cash reward 200",
+    "Found silver Apple Watch on 12/05/2024 at Riverside Mall, contact finder@mail.com",
+    "Missing cat, grey tabby kitten, very friendly, last seen on Maple Avenue",
+    "Picked up a pair of Ray-Ban sunglasses at the cafe on Main Street",
+    "My passport and driving license were in a red purse I lost at the airport",
+    "Someone left a navy umbrella and a Kindle on table 4 at Blue Bottle Cafe",
+    "Lost AirPods Pro case (white) somewhere around the university campus today",
+    "Found a Samsung Galaxy S21 with a cracked screen near the bus stop on 5th Avenue",
+    "Have you seen my daughter's teddy bear? Brown with a pink bow, lost at the zoo",
+    "Found: black Dell laptop bag with charger and notebook, at Union Square",
+    "Lost my grandfather's Rolex watch, gold with leather strap. Huge reward offered",
+    "We found a husky puppy wandering near the hospital, blue collar, no tag",
+    "Misplaced my insulin pen and glucose meter in a grey pouch on the train",
+    "Found guitar case (acoustic guitar inside) left behind at the music store",
+    "Lost my credit card and debit card holder, beige, near the market this afternoon",
+]
+
+
+def load_corpus(path: Optional[str] = None, repeat: int = 50) -> List[str]:
+    """Texts to benchmark with - the sample posts repeated, or a JSONL file"""
+    if path is None:
+        return SAMPLE_POSTS * repeat
+
+    texts = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                texts.append(record.get("text") or record.get("description") or "")
+    return [t for t in texts if t]
@@ -0,0 +1,2 @@
+# jobs package
+# Offline batch jobs, run from ai_service/, e.g. python -m jobs.reembed
@@ -0,0 +1,399 @@
+"""
+Bulk re-embedding job for embedding model upgrades
+Streams posts from a JSONL/NDJSON export (mongoexport output included),
+stdin or a mongodump .bson file through EmbeddingModel.encode_batch in
+large batches, and writes the vectors to a flat file for np.memmap or into
+a VectorIndex snapshot. Progress is checkpointed, so a crashed run resumes
+where it left off
+
+    python -m jobs.reembed posts.jsonl --output ./cache/reembed
+        [--encoding float32|float16|int8] [--index ./cache/vector_index.npz]
+        [--chunk 4096] [--batch-size 256] [--device cuda] [--model NAME] [--restart]
+
+Output directory:
+    vectors.bin      one fixed-size blob per post (see models.embedder encodings)
+    ids.txt          post id per row, same order
+    meta.json        model version, dimension and encoding
+    checkpoint.json  input position and rows written at the last checkpoint
+With --index the vectors go into the index snapshot instead of vectors.bin
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from models.embedder import EmbeddingModel, EMBEDDING_ENCODINGS, encoded_size, quantize_embeddings, dequantize_embeddings
+from utils.vector_index import VectorIndex
+
+CHECKPOINT_SECONDS = 30
+
+
+# ============== Input ==============
+
+def post_id(record: Dict[str, Any]) -> Optional[str]:
+    value = record.get("post_id") or record.get("_id") or record.get("id")
+    if isinstance(value, dict):  # Extended JSON, {"$oid": "..."}
+        value = value.get("$oid")
+    return str(value) if value is not None else None
+
+
+def post_text(record: Dict[str, Any]) -> str:
+    """The text the backend embeds for a post (generateEmbedding in matching.service.js)"""
+    if record.get("text"):
+        return record["text"]
+    attributes = record.get("attributes") or {}
+    return (
+        f"{record.get('title') or ''} {record.get('description') or ''}"
+        f" {attributes.get('brand') or ''} {attributes.get('model') or ''} {attributes.get('color') or ''}"
+    )
+
+
+def iter_records(path: str, position: int = 0) -> Iterator[Tuple[Dict[str, Any], int]]:
+    """
+    (record, position after it) from position on
+    Positions are byte offsets into the file, or record counts for stdin
+    """
+    if path == "-":
+        for i, line in enumerate(sys.stdin.buffer):
+            if i >= position and line.strip():
+                yield json.loads(line), i + 1
+        return
+
+    if path.endswith(".bson"):
+        try:
+            import bson  # Ships with pymongo
+        except ImportError:
+            raise RuntimeError("Reading .bson dumps needs pymongo installed")
+        with open(path, "rb") as f:
+            f.seek(position)
+            for record in bson.decode_file_iter(f):
+                yield record, f.tell()
+        return
+
+    with open(path, "rb") as f:
+        f.seek(position)
+        while True:
+            line = f.readline()
+            if not line:
+                return
+            position += len(line)
+            if line.strip():
+                yield json.loads(line), position
+
+
+class Chunk:
+    """Posts read between two positions, encoded and written together"""
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.categories: List[Optional[str]] = []
+        self.post_types: List[Optional[str]] = []
+        self.records = 0
+        self.skipped = 0
+        self.position = 0
+
+
+def read_chunks(path: str, position: int, size: int) -> Iterator[Chunk]:
+    chunk = Chunk()
+    for record, position in iter_records(path, position):
+        chunk.records += 1
+        chunk.position = position
+        pid, text = post_id(record), post_text(record)
+        if pid is None or len(text.strip()) < 3:
+            chunk.skipped += 1
+        else:
+            chunk.ids.append(pid)
+            chunk.texts.append(text)
+            chunk.categories.append(record.get("category"))
+            chunk.post_types.append(record.get("type") or record.get("post_type"))
+        if len(chunk.texts) >= size:
+            yield chunk
+            chunk = Chunk()
+    if chunk.records:
+        yield chunk
+
+
+def _prefetch(chunks: Iterator[Chunk], depth: int = 2) -> Iterator[Chunk]:
+    """Read and parse the next chunks on a thread while the current one encodes"""
+    buffer: "queue.Queue" = queue.Queue(maxsize=depth)
+    done = object()
+
+    def produce():
+        try:
+            for chunk in chunks:
+                buffer.put(chunk)
+        except Exception as e:
+            buffer.put(e)
+        buffer.put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        item = buffer.get()
+        if item is done:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+# ============== Output ==============
+
+def _write_json(path: str, data: Dict[str, Any]):
+    """Atomic replace - a crash leaves the previous version"""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class MemmapWriter:
+    """Appends blobs to vectors.bin and ids to ids.txt"""
+
+    def __init__(self, output_dir: str, encoding: str, dimension: int):
+        self.vectors_path = os.path.join(output_dir, "vectors.bin")
+        self.ids_path = os.path.join(output_dir, "ids.txt")
+        self.encoding = encoding
+        self.row_size = encoded_size(encoding, dimension)
+        self.rows = 0
+        self._ids_bytes = 0
+        self._vectors = self._ids = None
+
+    def open(self, checkpoint: Optional[Dict[str, Any]]):
+        """Start fresh, or drop whatever was written after the checkpoint"""
+        if checkpoint is None:
+            self._vectors = open(self.vectors_path, "wb")
+            self._ids = open(self.ids_path, "wb")
+            return
+        self.rows = checkpoint["rows"]
+        self._ids_bytes = checkpoint["ids_bytes"]
+        self._vectors = open(self.vectors_path, "r+b")
+        self._vectors.truncate(self.rows * self.row_size)
+        self._vectors.seek(0, os.SEEK_END)
+        self._ids = open(self.ids_path, "r+b")
+        self._ids.truncate(self._ids_bytes)
+        self._ids.seek(0, os.SEEK_END)
+
+    def write(self, chunk: Chunk, vectors: np.ndarray):
+        self._vectors.write(quantize_embeddings(vectors, self.encoding).tobytes())
+        ids = "".join(f"{pid}\n" for pid in chunk.ids).encode("utf-8")
+        self._ids.write(ids)
+        self._ids_bytes += len(ids)
+        self.rows += len(chunk.ids)
+
+    def flush(self) -> Dict[str, Any]:
+        for f in (self._vectors, self._ids):
+            f.flush()
+            os.fsync(f.fileno())
+        return {"rows": self.rows, "ids_bytes": self._ids_bytes}
+
+    def close(self):
+        for f in (self._vectors, self._ids):
+            if f is not None:
+                f.close()
+
+
+class IndexWriter:
+    """Upserts into a VectorIndex, saved as a snapshot at every checkpoint"""
+
+    def __init__(self, path: str, dimension: int):
+        self.path = path
+        self.index = VectorIndex(dimension)
+        self.rows = 0
+
+    def open(self, checkpoint: Optional[Dict[str, Any]]):
+        # A fresh run starts empty - vectors from the old model must not mix in
+        if checkpoint is not None:
+            self.index.load(self.path)
+            self.rows = checkpoint["rows"]
+
+    def write(self, chunk: Chunk, vectors: np.ndarray):
+        self.index.upsert_batch(chunk.ids, vectors, chunk.categories, chunk.post_types)
+        self.rows += len(chunk.ids)
+
+    def flush(self) -> Dict[str, Any]:
+        tmp = f"{self.path}.tmp.npz"
+        self.index.save(tmp)
+        os.replace(tmp, self.path)
+        return {"rows": self.rows}
+
+    def close(self):
+        pass
+
+
+def load_vectors(output_dir: str) -> Tuple[List[str], np.ndarray]:
+    """
+    Post ids and (n, dimension) vectors written by a memmap run
+    float32 output is returned as a read-only memmap, no copy
+    """
+    with open(os.path.join(output_dir, "meta.json")) as f:
+        meta = json.load(f)
+    with open(os.path.join(output_dir, "checkpoint.json")) as f:
+        rows = json.load(f)["rows"]
+    with open(os.path.join(output_dir, "ids.txt"), encoding="utf-8") as f:
+        ids = [line.rstrip("\n") for _, line in zip(range(rows), f)]
+
+    encoding, dimension = meta["encoding"], meta["dimension"]
+    blobs = np.memmap(
+        os.path.join(output_dir, "vectors.bin"), dtype=np.uint8, mode="r",
+        shape=(rows, encoded_size(encoding, dimension)),
+    )
+    if encoding == "float32":
+        return ids, blobs.view(np.float32)
+    return ids, dequantize_embeddings(blobs, encoding, dimension)
+
+
+# ============== Job ==============
+
+class ReembedJob:
+    """One resumable pass over an input file"""
+
+    def __init__(
+        self,
+        model: EmbeddingModel,
+        output_dir: str,
+        encoding: str = "float32",
+        index_path: Optional[str] = None,
+        chunk_size: int = 4096,
+        batch_size: int = 256,
+        checkpoint_seconds: float = CHECKPOINT_SECONDS,
+    ):
+        if encoding not in EMBEDDING_ENCODINGS:
+            raise ValueError(f"encoding must be one of {', '.join(EMBEDDING_ENCODINGS)}")
+        self.model = model
+        self.output_dir = output_dir
+        self.encoding = encoding
+        self.index_path = index_path
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.checkpoint_seconds = checkpoint_seconds
+        self.checkpoint_path = os.path.join(output_dir, "checkpoint.json")
+
+        if index_path:
+            self.writer = IndexWriter(index_path, model.dimension)
+        else:
+            self.writer = MemmapWriter(output_dir, encoding, model.dimension)
+
+    def _meta(self, source: str) -> Dict[str, Any]:
+        return {
+            "input": source,
+            "model": self.model.version,
+            "dimension": self.model.dimension,
+            "encoding": None if self.index_path else self.encoding,
+            "index": self.index_path,
+        }
+
+    def _load_checkpoint(self, meta: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path) as f:
+            checkpoint = json.load(f)
+        mismatched = [k for k, v in meta.items() if checkpoint.get("meta", {}).get(k) != v]
+        if mismatched:
+            raise RuntimeError(
+                f"Checkpoint in {self.output_dir} was written with different {', '.join(mismatched)}"
+                " - pass --restart to start over"
+            )
+        return checkpoint
+
+    def run(self, path: str, restart: bool = False) -> Dict[str, Any]:
+        os.makedirs(self.output_dir, exist_ok=True)
+        source = path if path == "-" else os.path.abspath(path)
+        meta = self._meta(source)
+        checkpoint = None if restart else self._load_checkpoint(meta)
+        if checkpoint is None:
+            _write_json(os.path.join(self.output_dir, "meta.json"), meta)
+            state = {"position": 0, "records": 0, "skipped": 0, "elapsed": 0.0}
+        else:
+            state = {k: checkpoint[k] for k in ("position", "records", "skipped", "elapsed")}
+            print(f"⏩ Resuming after {checkpoint['records']} posts ({checkpoint['rows']} embedded)")
+        self.writer.open(checkpoint)
+
+        started = time.perf_counter()
+        last_checkpoint = started
+        elapsed_before = state["elapsed"]
+        rows_at_start = self.writer.rows
+
+        def save_checkpoint():
+            state["elapsed"] = elapsed_before + time.perf_counter() - started
+            _write_json(self.checkpoint_path, {"meta": meta, **state, **self.writer.flush()})
+
+        try:
+            for chunk in _prefetch(read_chunks(path, state["position"], self.chunk_size)):
+                if chunk.texts:
+                    vectors = np.stack(self.model.encode_batch(chunk.texts, batch_size=self.batch_size))
+                    self.writer.write(chunk, vectors)
+                state["position"] = chunk.position
+                state["records"] += chunk.records
+                state["skipped"] += chunk.skipped
+
+                now = time.perf_counter()
+                if now - last_checkpoint >= self.checkpoint_seconds:
+                    save_checkpoint()
+                    last_checkpoint = now
+                    rate = (self.writer.rows - rows_at_start) / (now - started)
+                    print(f"💾 {self.writer.rows} embedded, {state['skipped']} skipped - {rate:.0f} items/s")
+            save_checkpoint()
+        finally:
+            self.writer.close()
+
+        seconds = time.perf_counter() - started
+        embedded = self.writer.rows - rows_at_start
+        summary = {
+            "records": state["records"],
+            "embedded": self.writer.rows,
+            "skipped": state["skipped"],
+            "seconds": round(seconds, 1),
+            "items_per_sec": round(embedded / seconds, 1) if seconds > 0 else 0.0,
+        }
+        print(
+            f"✅ Re-embedded {summary['embedded']} posts with {self.model.version}"
+            f" ({summary['skipped']} skipped) - {summary['items_per_sec']:.0f} items/s"
+        )
+        return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-embed every post after an embedding model change")
+    parser.add_argument("input", help="JSONL/NDJSON export, mongodump .bson file, or - for stdin")
+    parser.add_argument("--output", required=True, help="Directory for vectors, meta and checkpoint")
+    parser.add_argument("--encoding", default="float32", choices=EMBEDDING_ENCODINGS)
+    parser.add_argument("--index", help="Write into this VectorIndex .npz snapshot instead of vectors.bin")
+    parser.add_argument("--model", help="Embedding model (default: EMBEDDING_MODEL)")
+    parser.add_argument("--device", help="Default: cuda when available")
+    parser.add_argument("--chunk", type=int, default=4096, help="Posts read and written per step")
+    parser.add_argument("--batch-size", type=int, default=256, help="Texts per forward pass")
+    parser.add_argument("--checkpoint-seconds", type=float, default=CHECKPOINT_SECONDS)
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    args = parser.parse_args()
+
+    if args.model:
+        os.environ["EMBEDDING_MODEL"] = args.model
+    device = args.device
+    if device is None:
+        import torch
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+
+    job = ReembedJob(
+        EmbeddingModel(device=device),
+        args.output,
+        encoding=args.encoding,
+        index_path=args.index,
+        chunk_size=args.chunk,
+        batch_size=args.batch_size,
+        checkpoint_seconds=args.checkpoint_seconds,
+    )
+    job.run(args.input, restart=args.restart)
+
+
+if __name__ == "__main__":
+    main()
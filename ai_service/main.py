@@ -5,47 +5,95 @@ Runs on local NVIDIA GPU for $0 inference cost
 """
 
 import os
-import io
+import sys
+import json
+import time
 import base64
-from typing import Optional, List, Dict, Any
+import asyncio
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, List, Dict, Any, Tuple
 from contextlib import asynccontextmanager
 
 import torch
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+import numpy as np
+from fastapi import FastAPI, HTTPException, Request, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from pydantic import BaseModel, Field
-from PIL import Image
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
 # Import our modules
-from models.embedder import EmbeddingModel
-from models.vision import VisionModel
+from models.embedder import EmbeddingModel, EMBEDDING_ENCODINGS, quantize_embeddings
+from models.vision import VisionModel, CAPTION_MODES
 from models.ocr import OCRModel
 from models.extractor import ItemExtractor
+from models.registry import registry
+from models.residency import ResidencyManager
 from utils.prompts import EXTRACTION_PROMPTS
+from utils.executor import InferencePool, ExecutorSaturated
+from utils.batcher import EmbeddingBatcher
+from utils.cache import ResultCache, make_key
+from utils.vector_index import VectorIndex
+from utils.pipeline import StagePipeline
+from utils.image_io import IngestedImage, ImageRejected, ingest_image
+from utils.http_client import ImageFetcher
+from utils.rules import rule_pass
+from utils.matching import score_matches
+from utils.ndjson import END, DuplexStreamingResponse, parse_line, read_ahead
 
 # Configuration
 HOST = os.getenv("HOST", "0.0.0.0")
 PORT = int(os.getenv("PORT", 8000))
 USE_GPU = os.getenv("USE_GPU", "true").lower() == "true"
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "*").split(",")
+MAX_BATCH_IMAGES = int(os.getenv("MAX_BATCH_IMAGES", 10))
+MAX_TEXT_BATCH = int(os.getenv("MAX_TEXT_BATCH", 1000))
+MAX_MATCH_CANDIDATES = int(os.getenv("MAX_MATCH_CANDIDATES", 20000))
+MAX_EMBED_BATCH = int(os.getenv("MAX_EMBED_BATCH", 1000))
+EMBED_STREAM_WINDOW = int(os.getenv("EMBED_STREAM_WINDOW", 1024))
+EMBED_STREAM_MAX_LINE_BYTES = int(os.getenv("EMBED_STREAM_MAX_LINE_BYTES", 1024 * 1024))
+RULE_WORKERS = int(os.getenv("RULE_WORKERS", 2))
+RESIDENCY_SWEEP_SECONDS = float(os.getenv("RESIDENCY_SWEEP_SECONDS", 30))
+
+# Models this replica loads, e.g. MODELS=embed,vision for an embedding/image node
+ALL_MODELS = ("embedding", "vision", "ocr", "extractor")
+MODEL_ALIASES = {"embed": "embedding", "llm": "extractor"}
+ENABLED_MODELS = [
+    MODEL_ALIASES.get(name.strip(), name.strip())
+    for name in os.getenv("MODELS", ",".join(ALL_MODELS)).split(",")
+    if name.strip()
+]
 
 # Global model instances
 embedding_model: Optional[EmbeddingModel] = None
 vision_model: Optional[VisionModel] = None
 ocr_model: Optional[OCRModel] = None
 item_extractor: Optional[ItemExtractor] = None
+inference_pool: Optional[InferencePool] = None
+embed_batcher: Optional[EmbeddingBatcher] = None
+result_cache: Optional[ResultCache] = None
+vector_index: Optional[VectorIndex] = None
+image_fetcher: Optional[ImageFetcher] = None
+rule_pool: Optional[ProcessPoolExecutor] = None
+residency: Optional[ResidencyManager] = None
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifecycle manager for loading/unloading models"""
-    global embedding_model, vision_model, ocr_model, item_extractor
+    global embedding_model, vision_model, ocr_model, item_extractor, inference_pool
+    global embed_batcher, result_cache, vector_index, image_fetcher, rule_pool, residency
+    
+    unknown = set(ENABLED_MODELS) - set(ALL_MODELS)
+    if unknown:
+        raise ValueError(f"Unknown MODELS entries: {', '.join(sorted(unknown))}")
     
-    print("🚀 Loading AI models...")
+    print(f"🚀 Loading AI models: {', '.join(ENABLED_MODELS)}")
     
     device = "cuda" if USE_GPU and torch.cuda.is_available() else "cpu"
     print(f"📍 Using device: {device}")
@@ -54,18 +102,124 @@ async def lifespan(app: FastAPI):
         print(f"🎮 GPU: {torch.cuda.get_device_name(0)}")
         print(f"💾 VRAM: {torch.cuda.get_device_properties(0).total_memory / 1024**3:.1f} GB")
     
-    # Load models
-    embedding_model = EmbeddingModel(device=device)
-    vision_model = VisionModel(device=device)
-    ocr_model = OCRModel()
-    item_extractor = ItemExtractor(device=device)
+    # Dedicated executor per model so slow generations don't block the loop
+    inference_pool = InferencePool()
+    inference_pool.register("embedding", workers=2, queue=128)
+    inference_pool.register("vision", workers=1, queue=32)
+    inference_pool.register("caption", workers=1, queue=16)
+    inference_pool.register("ocr", workers=1, queue=32)
+    inference_pool.register("extractor", workers=1, queue=16)
+    inference_pool.register("index", workers=2, queue=256)
+    
+    # Idle models leave the GPU (and under RSS pressure, memory) and are
+    # moved back by the executor before their next call
+    residency = ResidencyManager()
+    inference_pool.attach_residency(residency)
+    
+    # Results keyed by input content + model, optionally persisted to disk
+    cache_dir = os.getenv("CACHE_DIR", "./cache")
+    use_disk_cache = os.getenv("RESULT_CACHE_DISK", "false").lower() == "true"
+    result_cache = ResultCache(
+        disk_path=os.path.join(cache_dir, "results.sqlite") if use_disk_cache else None,
+    )
+    
+    # Shared keep-alive client for image_url downloads
+    image_fetcher = ImageFetcher()
+    
+    # Rule-based extraction for bulk imports runs outside the GIL.
+    # (spawned, so workers never inherit the loaded models)
+    rule_pool = ProcessPoolExecutor(
+        max_workers=RULE_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+    
+    index_path = os.getenv("VECTOR_INDEX_PATH")
+    factories = {
+        "embedding": lambda: EmbeddingModel(device=device),
+        "vision": lambda: VisionModel(device=device),
+        "ocr": OCRModel,
+        "extractor": lambda: ItemExtractor(device=device),
+    }
+    
+    async def load(name: str):
+        """Build one model (each exactly once per process) and publish it"""
+        global embedding_model, vision_model, ocr_model, item_extractor
+        global embed_batcher, vector_index
+        
+        model = await asyncio.to_thread(registry.get_or_create, name, factories[name])
+        try:
+            for unit, (modules, unit_device, on_move) in model.residency_units().items():
+                residency.register(unit, modules, unit_device, on_move)
+            
+            if name == "embedding":
+                # Coalesce concurrent /embed calls into batched forward passes
+                embed_batcher = EmbeddingBatcher(
+                    model.encode_batch,
+                    run=lambda fn, texts: inference_pool.run("embedding", fn, texts),
+                )
+            
+                # Post embedding index for /match/search
+                index = VectorIndex(dimension=model.dimension)
+                if index_path and os.path.exists(index_path):
+                    await asyncio.to_thread(index.load, index_path)
+                    print(f"📚 Loaded {len(index)} vectors from {index_path}")
+                vector_index = index
+                embedding_model = model
+            elif name == "vision":
+                vision_model = model
+            elif name == "ocr":
+                ocr_model = model
+            else:
+                item_extractor = model
+        except Exception as e:
+            # Built, but not usable - the registry must not keep saying "ready"
+            registry.mark_failed(name, e)
+            raise
+        print(f"✅ {name} ready ({registry.load_times()[name]:.1f}s)")
     
-    print("✅ All models loaded successfully!")
+    async def load_all():
+        # Models load side by side; requests for a ready model are served
+        # while the rest are still loading
+        started = time.perf_counter()
+        results = await asyncio.gather(*(load(name) for name in ENABLED_MODELS), return_exceptions=True)
+        registry.freeze()
+        
+        wall = time.perf_counter() - started
+        load_times = registry.load_times()
+        print(f"⏱️ Startup: {wall:.1f}s wall, {sum(load_times.values()):.1f}s of model loading")
+        for name, result in zip(ENABLED_MODELS, results):
+            if isinstance(result, Exception):
+                print(f"   {name:<10} failed: {result}")
+            else:
+                print(f"   {name:<10} {load_times[name]:>6.1f}s")
+    
+    async def sweep_residency():
+        while True:
+            await asyncio.sleep(RESIDENCY_SWEEP_SECONDS)
+            try:
+                await asyncio.to_thread(residency.sweep)
+            except Exception as e:
+                print(f"⚠️ Residency sweep failed: {e}")
+    
+    registry.expect(ENABLED_MODELS)
+    loading = asyncio.create_task(load_all())
+    sweeper = asyncio.create_task(sweep_residency()) if residency.enabled else None
     
     yield
     
     # Cleanup
     print("🧹 Unloading models...")
+    loading.cancel()
+    if sweeper is not None:
+        sweeper.cancel()
+    inference_pool.shutdown()
+    await image_fetcher.aclose()
+    rule_pool.shutdown(cancel_futures=True)
+    result_cache.close()
+    residency.close()
+    if index_path and vector_index is not None:
+        vector_index.save(index_path)
+    registry.clear()
     del embedding_model, vision_model, ocr_model, item_extractor
     if torch.cuda.is_available():
         torch.cuda.empty_cache()
@@ -89,6 +243,47 @@ app.add_middleware(
 )
 
 
+@app.exception_handler(ExecutorSaturated)
+async def executor_saturated_handler(request: Request, exc: ExecutorSaturated):
+    """Model queue is full - tell the client when to come back"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "model": exc.model},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+def _model_state(name: str) -> str:
+    """ready, loading, failed or disabled (not in MODELS)"""
+    if name not in ENABLED_MODELS:
+        return "disabled"
+    loaded = {
+        "embedding": embedding_model,
+        "vision": vision_model,
+        "ocr": ocr_model,
+        "extractor": item_extractor,
+    }
+    if loaded[name] is not None:
+        return "ready"
+    return "failed" if registry.status(name) == "failed" else "loading"
+
+
+def _require(*names: str):
+    """503 until every model an endpoint needs is ready on this replica"""
+    for name in names:
+        state = _model_state(name)
+        if state == "disabled":
+            raise HTTPException(status_code=503, detail=f"Model '{name}' is not enabled on this replica")
+        if state == "failed":
+            raise HTTPException(status_code=503, detail=f"Model '{name}' failed to load: {registry.error(name)}")
+        if state == "loading":
+            raise HTTPException(
+                status_code=503,
+                detail=f"Model '{name}' is still loading",
+                headers={"Retry-After": "10"},
+            )
+
+
 # ============== Request/Response Models ==============
 
 class TextExtractionRequest(BaseModel):
@@ -96,6 +291,10 @@ class TextExtractionRequest(BaseModel):
     post_type: Optional[str] = Field(None, description="'lost' or 'found'")
 
 
+class TextBatchExtractionRequest(BaseModel):
+    items: List[TextExtractionRequest]
+
+
 class ImageExtractionRequest(BaseModel):
     image_url: Optional[str] = Field(None, description="URL of image")
     image_base64: Optional[str] = Field(None, description="Base64 encoded image")
@@ -103,6 +302,7 @@ class ImageExtractionRequest(BaseModel):
 
 class EmbeddingRequest(BaseModel):
     text: str = Field(..., description="Text to generate embedding for")
+    encoding: str = Field("float32", description="float32 (JSON list), float16 or int8 (base64 blob)")
 
 
 class CaptionRequest(BaseModel):
@@ -130,16 +330,71 @@ class ExtractionResult(BaseModel):
     detected_objects: List[Dict[str, Any]] = []
     extracted_text: Optional[str] = None
     original_text: Optional[str] = None
+    debug: Optional[Dict[str, Any]] = None  # Per-stage timings when requested
 
 
 class EmbeddingResult(BaseModel):
-    embedding: List[float]
+    embedding: Optional[List[float]] = None  # float32
+    embedding_b64: Optional[str] = None  # float16 / int8 blob
     dimension: int
+    encoding: str = "float32"
+    model: Optional[str] = None  # Embedding version tag, e.g. all-MiniLM-L6-v2@384
 
 
 class CaptionResult(BaseModel):
-    caption: str
+    caption: Optional[str]
     detected_objects: List[Dict[str, Any]]
+    caption_skipped: bool = False  # DETR was confident enough (skip_confidence)
+
+
+class IndexItem(BaseModel):
+    post_id: str
+    embedding: Optional[List[float]] = Field(None, description="Precomputed embedding")
+    text: Optional[str] = Field(None, description="Text to embed if no embedding given")
+    category: Optional[str] = None
+    post_type: Optional[str] = Field(None, description="'lost' or 'found'")
+
+
+class IndexUpsertRequest(BaseModel):
+    items: List[IndexItem]
+
+
+class IndexDeleteRequest(BaseModel):
+    post_ids: List[str]
+
+
+class MatchSearchRequest(BaseModel):
+    embedding: Optional[List[float]] = Field(None, description="Query embedding")
+    text: Optional[str] = Field(None, description="Query text if no embedding given")
+    top_k: int = Field(10, ge=1, le=100)
+    category: Optional[str] = None
+    post_type: Optional[str] = Field(None, description="Only return posts of this type")
+    exclude_post_id: Optional[str] = Field(None, description="Usually the query post itself")
+
+
+class MatchLocation(BaseModel):
+    city: Optional[str] = None
+    coordinates: Optional[List[float]] = Field(None, description="[longitude, latitude]")
+
+
+class MatchPost(BaseModel):
+    post_id: Optional[str] = None
+    title: str = ""
+    description: str = ""
+    category: Optional[str] = None
+    attributes: Dict[str, Any] = {}
+    location: Optional[MatchLocation] = None
+    date: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    embedding: Optional[List[float]] = None
+
+
+class MatchScoreRequest(BaseModel):
+    query: MatchPost
+    candidates: List[MatchPost]
+    top_k: int = Field(10, ge=1, le=100)
+    min_score: float = Field(40, description="Matches below this total are dropped")
+    text_weight: float = Field(0, ge=0, le=25, description="Opt-in points for full text overlap (0 = backend totals)")
 
 
 # ============== API Endpoints ==============
@@ -155,10 +410,18 @@ async def root():
         "gpu_name": torch.cuda.get_device_name(0) if gpu_available else None,
         "endpoints": {
             "/extract/text": "Extract item details from text",
+            "/extract/text/batch": "Extract item details from many texts (streams NDJSON)",
             "/extract/image": "Extract item details from image",
+            "/extract/image/batch": "Extract item details from several images",
             "/extract/combined": "Extract from both text and image",
             "/embed": "Generate text embedding",
+            "/embed/stream": "Embeddings for an NDJSON stream of texts",
             "/generate/caption": "Generate image caption",
+            "/generate/caption/batch": "Caption several images in one batch",
+            "/index/upsert": "Add or update post embeddings in the vector index",
+            "/index/delete": "Remove posts from the vector index",
+            "/match/search": "Top-k similar posts from the vector index",
+            "/match/score": "Score candidate posts against a query post",
         }
     }
 
@@ -170,67 +433,345 @@ async def extract_from_text(request: TextExtractionRequest):
     Uses LLM to parse and structure the information
     """
     try:
+        _require("extractor")
+        
         if not request.text or len(request.text.strip()) < 10:
             raise HTTPException(status_code=400, detail="Text too short")
         
-        result = await item_extractor.extract_from_text(
+        # Sampled generations differ run to run, everything else is cacheable
+        cache_key = None
+        if item_extractor.deterministic:
+            cache_key = make_key(
+                "extract_text",
+                item_extractor.model_id,
+                f"{request.post_type or ''}\n{request.text}",
+            )
+            cached = await result_cache.aget(cache_key)
+            if cached is not None:
+                return ExtractionResult(**cached)
+        
+        result = await inference_pool.run(
+            "extractor",
+            item_extractor.extract_from_text,
             request.text,
-            post_type=request.post_type
+            post_type=request.post_type,
         )
+        if cache_key:
+            result_cache.set(cache_key, result)
         
         return ExtractionResult(**result)
     
+    except (HTTPException, ExecutorSaturated):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/extract/text/batch")
+async def extract_from_text_batch(request: TextBatchExtractionRequest):
+    """
+    Extract item details from many texts (bulk social imports)
+    Texts are bucketed by length and generated in padded batches; results
+    stream back as NDJSON lines {"index", "result"} as each batch finishes
+    """
+    _require("extractor")
+    
+    items = request.items
+    if not items:
+        raise HTTPException(status_code=400, detail="No texts provided")
+    
+    if len(items) > MAX_TEXT_BATCH:
+        raise HTTPException(status_code=400, detail=f"Max {MAX_TEXT_BATCH} texts per batch")
+    
+    texts = [item.text for item in items]
+    post_types = [item.post_type for item in items]
+    rule_results = await rule_pass(rule_pool, texts, RULE_WORKERS)
+    # Tokenizing up to MAX_TEXT_BATCH texts is too slow for the event loop,
+    # and the tokenizer is shared with the extractor's generate calls
+    batches = await inference_pool.run("extractor", item_extractor.plan_batches, texts)
+    
+    async def stream():
+        for batch in batches:
+            try:
+                # Queued behind other requests is not a failure of these items
+                results = await inference_pool.run_waiting(
+                    "extractor",
+                    item_extractor.extract_from_text_batch,
+                    [texts[i] for i in batch],
+                    [post_types[i] for i in batch],
+                    [rule_results[i] for i in batch],
+                )
+                lines = [
+                    {"index": i, "result": ExtractionResult(**r).model_dump()}
+                    for i, r in zip(batch, results)
+                ]
+            except Exception as e:
+                lines = [{"index": i, "error": str(e)} for i in batch]
+            
+            yield "".join(json.dumps(line) + "\n" for line in lines)
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+async def _read_image_bytes(
+    image: Optional[UploadFile] = None,
+    image_url: Optional[str] = None,
+    image_base64: Optional[str] = None,
+) -> Optional[bytes]:
+    """Get raw image bytes from whichever source the client sent"""
+    if image:
+        return await image.read()
+    if image_base64:
+        return base64.b64decode(image_base64)
+    if image_url:
+        try:
+            return await image_fetcher.fetch(image_url)
+        except ImageRejected as e:
+            raise HTTPException(status_code=e.status_code, detail=str(e))
+    return None
+
+
+def _decode_image(contents: bytes) -> IngestedImage:
+    try:
+        return ingest_image(contents)
+    except ImageRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+
+def _image_cache_key(contents: bytes) -> str:
+    return make_key(
+        "extract_image",
+        f"{vision_model.detection_model_id}+colors+ocr:{ocr_model.mode}",
+        contents,
+    )
+
+
+def _build_image_result(
+    detected_objects: List[Dict[str, Any]],
+    ocr_text: Optional[str],
+) -> Dict[str, Any]:
+    # Extract structured data
+    result = item_extractor.extract_from_image(
+        detected_objects=detected_objects,
+        ocr_text=ocr_text,
+    )
+    
+    result["detected_objects"] = detected_objects
+    result["extracted_text"] = ocr_text
+    return result
+
+
+def _add_image_stages(pipeline: StagePipeline, contents: bytes):
+    """decode -> (detect || ocr) -> image, or decode -> detect -> ocr in regions mode"""
+    pipeline.add("decode", lambda: asyncio.to_thread(_decode_image, contents))
+    pipeline.add(
+        "detect",
+        lambda decode: inference_pool.run(
+            "vision",
+            vision_model.detect_objects,
+            decode.model,
+            target_size=decode.original_size,
+            colors=True,
+        ),
+        after=["decode"],
+    )
+    if ocr_model.mode == "regions":
+        # OCR reads only around the detected objects (or skips them)
+        pipeline.add(
+            "ocr",
+            lambda decode, detect: inference_pool.run(
+                "ocr",
+                ocr_model.extract_text_regions,
+                decode.ocr,
+                detect,
+                decode.ocr_scale,
+            ),
+            after=["decode", "detect"],
+        )
+    else:
+        pipeline.add(
+            "ocr",
+            lambda decode: inference_pool.run("ocr", ocr_model.extract_text, decode.ocr),
+            after=["decode"],
+        )
+    
+    async def build(detect, ocr):
+        return _build_image_result(detect, ocr)
+    
+    pipeline.add("image", build, after=["detect", "ocr"])
+
+
+async def _extract_image(contents: bytes) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Detection + OCR + structured extraction, cached by image content
+    Returns (result, timing report)
+    """
+    cache_key = _image_cache_key(contents)
+    cached = await result_cache.aget(cache_key)
+    if cached is not None:
+        return cached, {"cache": "hit"}
+    
+    # Detection and OCR are independent - run them side by side
+    pipeline = StagePipeline()
+    _add_image_stages(pipeline, contents)
+    outputs = await pipeline.run()
+    
+    result = outputs["image"]
+    result_cache.set(cache_key, result)
+    return result, pipeline.report()
+
+
+async def _extract_images(contents_list: List[bytes]) -> List[Dict[str, Any]]:
+    """Batched _extract_image - one DETR pass and one OCR run for all cache misses"""
+    keys = [_image_cache_key(contents) for contents in contents_list]
+    results = await result_cache.aget_many(keys)
+    missing = [i for i, r in enumerate(results) if r is None]
+    
+    if missing:
+        decoded = await asyncio.gather(*[
+            asyncio.to_thread(_decode_image, contents_list[i]) for i in missing
+        ])
+        
+        detections = await inference_pool.run(
+            "vision",
+            vision_model.detect_objects_batch,
+            [d.model for d in decoded],
+            target_sizes=[d.original_size for d in decoded],
+            colors=True,
+        )
+        if ocr_model.mode == "regions":
+            ocr_texts = await inference_pool.run(
+                "ocr",
+                ocr_model.extract_text_regions_batch,
+                [d.ocr for d in decoded],
+                detections,
+                [d.ocr_scale for d in decoded],
+            )
+        else:
+            ocr_texts = await inference_pool.run(
+                "ocr", ocr_model.extract_text_batch, [d.ocr for d in decoded]
+            )
+        
+        for i, detected_objects, ocr_text in zip(missing, detections, ocr_texts):
+            results[i] = _build_image_result(detected_objects, ocr_text)
+        result_cache.set_many((keys[i], results[i]) for i in missing)
+    
+    return results
+
+
+async def _embed_many(texts: List[str]) -> List[np.ndarray]:
+    """Embeddings for several texts: cache hits, then one adaptive pool call for the rest"""
+    keys = [
+        make_key("embed", embedding_model.model_id, embedding_model._preprocess(t))
+        for t in texts
+    ]
+    embeddings = await result_cache.aget_many(keys)
+    missing = [i for i, e in enumerate(embeddings) if e is None]
+    
+    if missing:
+        encoded = await inference_pool.run(
+            "embedding", embedding_model.encode_adaptive, [texts[i] for i in missing]
+        )
+        for i, embedding in zip(missing, encoded):
+            embeddings[i] = embedding
+        result_cache.set_many((keys[i], embeddings[i]) for i in missing)
+    return embeddings
+
+
+def _query_vector(embedding: List[float], what: str) -> np.ndarray:
+    """A client-supplied embedding, 400 unless it matches the index dimension"""
+    vector = np.asarray(embedding, dtype=np.float32)
+    if vector.shape != (vector_index.dimension,):
+        raise HTTPException(
+            status_code=400,
+            detail=f"{what} has {vector.size} dimensions, expected {vector_index.dimension}",
+        )
+    return vector
+
+
+async def _embed(text: str):
+    """Single-text embedding through the cache and micro-batcher"""
+    cache_key = make_key(
+        "embed",
+        embedding_model.model_id,
+        embedding_model._preprocess(text),
+    )
+    embedding = await result_cache.aget(cache_key)
+    if embedding is None:
+        embedding = await embed_batcher.submit(text)
+        result_cache.set(cache_key, embedding)
+    return embedding
+
+
 @app.post("/extract/image", response_model=ExtractionResult)
 async def extract_from_image(
     image: Optional[UploadFile] = File(None),
     image_url: Optional[str] = Form(None),
     image_base64: Optional[str] = Form(None),
+    debug: bool = Form(False),
 ):
     """
     Extract item details from image
     Uses vision model for object detection and OCR for text
     """
     try:
-        # Get image
-        pil_image = None
-        
-        if image:
-            contents = await image.read()
-            pil_image = Image.open(io.BytesIO(contents))
-        elif image_base64:
-            image_data = base64.b64decode(image_base64)
-            pil_image = Image.open(io.BytesIO(image_data))
-        elif image_url:
-            import httpx
-            async with httpx.AsyncClient() as client:
-                response = await client.get(image_url)
-                pil_image = Image.open(io.BytesIO(response.content))
-        else:
+        _require("vision", "ocr", "extractor")
+        
+        contents = await _read_image_bytes(image, image_url, image_base64)
+        if not contents:
             raise HTTPException(status_code=400, detail="No image provided")
         
-        # Convert to RGB if needed
-        if pil_image.mode != "RGB":
-            pil_image = pil_image.convert("RGB")
+        result, timings = await _extract_image(contents)
         
-        # Run vision and OCR
-        detected_objects = await vision_model.detect_objects(pil_image)
-        ocr_text = await ocr_model.extract_text(pil_image)
+        if debug:
+            result["debug"] = timings
         
-        # Extract structured data
-        result = await item_extractor.extract_from_image(
-            detected_objects=detected_objects,
-            ocr_text=ocr_text,
-        )
+        return ExtractionResult(**result)
+    
+    except (HTTPException, ExecutorSaturated):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/extract/image/batch")
+async def extract_from_images_batch(
+    images: Optional[List[UploadFile]] = File(None),
+    image_urls: Optional[List[str]] = Form(None),
+):
+    """
+    Extract item details from all photos of a post
+    Returns per-image results plus one merged extraction
+    """
+    try:
+        _require("vision", "ocr", "extractor")
         
-        result["detected_objects"] = detected_objects
-        result["extracted_text"] = ocr_text
+        contents_list = []
+        for image in images or []:
+            contents_list.append(await image.read())
+        for url in image_urls or []:
+            contents_list.append(await _read_image_bytes(image_url=url))
         
-        return ExtractionResult(**result)
+        if not contents_list:
+            raise HTTPException(status_code=400, detail="No images provided")
+        
+        if len(contents_list) > MAX_BATCH_IMAGES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Max {MAX_BATCH_IMAGES} images per batch",
+            )
+        
+        results = await _extract_images(contents_list)
+        merged = item_extractor.merge_image_extractions(results)
+        
+        return {
+            "results": [ExtractionResult(**r) for r in results],
+            "merged": ExtractionResult(**merged),
+            "count": len(results),
+        }
     
+    except (HTTPException, ExecutorSaturated):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -241,137 +782,580 @@ async def extract_combined(
     post_type: Optional[str] = Form(None),
     image: Optional[UploadFile] = File(None),
     image_url: Optional[str] = Form(None),
+    debug: bool = Form(False),
 ):
     """
     Extract item details from both text and image
     Combines results for best accuracy
     """
     try:
-        # Extract from text
-        text_result = await item_extractor.extract_from_text(text, post_type)
+        _require("extractor")
+        
+        pipeline = StagePipeline()
+        
+        # Text extraction, detection and OCR don't depend on each other
+        pipeline.add(
+            "text",
+            lambda: inference_pool.run(
+                "extractor", item_extractor.extract_from_text, text, post_type
+            ),
+        )
         
         # Extract from image if provided
         image_result = {}
-        if image or image_url:
-            pil_image = None
-            
-            if image:
-                contents = await image.read()
-                pil_image = Image.open(io.BytesIO(contents))
-            elif image_url:
-                import httpx
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(image_url)
-                    pil_image = Image.open(io.BytesIO(response.content))
-            
-            if pil_image:
-                if pil_image.mode != "RGB":
-                    pil_image = pil_image.convert("RGB")
-                
-                detected_objects = await vision_model.detect_objects(pil_image)
-                ocr_text = await ocr_model.extract_text(pil_image)
-                
-                image_result = await item_extractor.extract_from_image(
-                    detected_objects=detected_objects,
-                    ocr_text=ocr_text,
-                )
-                image_result["detected_objects"] = detected_objects
-                image_result["extracted_text"] = ocr_text
+        contents = await _read_image_bytes(image, image_url)
+        cache_key = None
+        if contents:
+            _require("vision", "ocr")
+            cache_key = _image_cache_key(contents)
+            image_result = await result_cache.aget(cache_key) or {}
+            if not image_result:
+                _add_image_stages(pipeline, contents)
+        
+        outputs = await pipeline.run()
+        text_result = outputs["text"]
+        if "image" in outputs:
+            image_result = outputs["image"]
+            result_cache.set(cache_key, image_result)
         
         # Merge results (text takes priority, image fills gaps)
         merged = item_extractor.merge_extractions(text_result, image_result)
         
+        if debug:
+            merged["debug"] = pipeline.report()
+        
         return ExtractionResult(**merged)
     
+    except (HTTPException, ExecutorSaturated):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _wants_binary(http_request: Request) -> bool:
+    return "application/octet-stream" in http_request.headers.get("accept", "")
+
+
+def _check_encoding(encoding: str):
+    if encoding not in EMBEDDING_ENCODINGS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"encoding must be one of {', '.join(EMBEDDING_ENCODINGS)}",
+        )
+
+
+def _binary_embeddings(blobs: np.ndarray, encoding: str) -> Response:
+    """Raw concatenated blobs, described by headers"""
+    return Response(
+        content=blobs.tobytes(),
+        media_type="application/octet-stream",
+        headers={
+            "X-Embedding-Model": embedding_model.version,
+            "X-Embedding-Encoding": encoding,
+            "X-Embedding-Dimension": str(embedding_model.dimension),
+            "X-Embedding-Count": str(len(blobs)),
+        },
+    )
+
+
 @app.post("/embed", response_model=EmbeddingResult)
-async def generate_embedding(request: EmbeddingRequest):
+async def generate_embedding(request: EmbeddingRequest, http_request: Request):
     """
     Generate embedding vector for text
     Used for semantic similarity matching
+    With Accept: application/octet-stream the body is the raw vector blob
     """
     try:
+        _require("embedding")
+        _check_encoding(request.encoding)
+        
         if not request.text or len(request.text.strip()) < 3:
             raise HTTPException(status_code=400, detail="Text too short")
         
-        embedding = embedding_model.encode(request.text)
+        embedding = await _embed(request.text)
+        
+        if _wants_binary(http_request):
+            return _binary_embeddings(quantize_embeddings(embedding, request.encoding), request.encoding)
         
+        if request.encoding == "float32":
+            return EmbeddingResult(
+                embedding=embedding.tolist(),
+                dimension=len(embedding),
+                model=embedding_model.version,
+            )
+        
+        blob = quantize_embeddings(embedding, request.encoding)[0]
         return EmbeddingResult(
-            embedding=embedding.tolist(),
-            dimension=len(embedding)
+            embedding_b64=base64.b64encode(blob.tobytes()).decode("ascii"),
+            dimension=len(embedding),
+            encoding=request.encoding,
+            model=embedding_model.version,
         )
     
+    except (HTTPException, ExecutorSaturated):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/embed/batch")
-async def generate_embeddings_batch(texts: List[str]):
+async def generate_embeddings_batch(texts: List[str], http_request: Request, encoding: str = "float32"):
     """
     Generate embeddings for multiple texts
     More efficient than calling /embed multiple times
+    encoding float16/int8 returns base64 blobs (embeddings_b64); with
+    Accept: application/octet-stream the body is the concatenated blobs
     """
     try:
+        _require("embedding")
+        _check_encoding(encoding)
+        
         if not texts or len(texts) == 0:
             raise HTTPException(status_code=400, detail="No texts provided")
         
-        if len(texts) > 100:
-            raise HTTPException(status_code=400, detail="Max 100 texts per batch")
+        if len(texts) > MAX_EMBED_BATCH:
+            raise HTTPException(status_code=400, detail=f"Max {MAX_EMBED_BATCH} texts per batch (use /embed/stream)")
         
-        embeddings = embedding_model.encode_batch(texts)
+        # Only encode the texts we haven't seen before
+        embeddings = await _embed_many(texts)
         
-        return {
-            "embeddings": [e.tolist() for e in embeddings],
+        if _wants_binary(http_request):
+            return _binary_embeddings(quantize_embeddings(np.stack(embeddings), encoding), encoding)
+        
+        result = {
             "count": len(embeddings),
             "dimension": len(embeddings[0]) if embeddings else 0,
+            "encoding": encoding,
+            "model": embedding_model.version,
         }
+        if encoding == "float32":
+            result["embeddings"] = [e.tolist() for e in embeddings]
+        else:
+            result["embeddings_b64"] = [
+                base64.b64encode(blob.tobytes()).decode("ascii")
+                for blob in quantize_embeddings(np.stack(embeddings), encoding)
+            ]
+        return result
     
+    except (HTTPException, ExecutorSaturated):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/embed/stream")
+async def generate_embeddings_stream(http_request: Request, encoding: str = "float32"):
+    """
+    Embeddings for an NDJSON body of any length, streamed back as NDJSON
+    Input lines: a JSON string, or {"text", "id"}
+    Output lines: {"index", "id", "embedding" | "embedding_b64"} or
+    {"index", "error"}, in the order batches finish; index counts the
+    non-empty input lines. A line over EMBED_STREAM_MAX_LINE_BYTES gets an
+    error line and the rest of the stream carries on
+    """
+    _require("embedding")
+    _check_encoding(encoding)
+    
+    # Bounded read-ahead: a few windows in flight, then the upload waits
+    lines, reader = read_ahead(http_request.stream(), 4 * EMBED_STREAM_WINDOW, EMBED_STREAM_MAX_LINE_BYTES)
+    
+    def result_lines(items: List[Tuple[int, Any]], embeddings: List[np.ndarray]) -> str:
+        if encoding == "float32":
+            values = [("embedding", e.tolist()) for e in embeddings]
+        else:
+            blobs = quantize_embeddings(np.stack(embeddings), encoding)
+            values = [("embedding_b64", base64.b64encode(b.tobytes()).decode("ascii")) for b in blobs]
+        return "".join(
+            json.dumps({"index": index, "id": item_id, field: value}) + "\n"
+            for (index, item_id), (field, value) in zip(items, values)
+        )
+    
+    async def stream():
+        index = 0
+        done = False
+        try:
+            while not done:
+                # Wait for a line, then take whatever else has already arrived
+                window = [await lines.get()]
+                while len(window) < EMBED_STREAM_WINDOW and not lines.empty():
+                    window.append(lines.get_nowait())
+                if window[-1] is END or isinstance(window[-1], Exception):
+                    # Client went away (or sent everything) - finish what was read
+                    done = True
+                    window.pop()
+                
+                errors, texts, hits, misses = [], [], [], []
+                for line in window:
+                    value, error = parse_line(line)
+                    item_id = value.get("id") if isinstance(value, dict) else None
+                    text = value.get("text") if isinstance(value, dict) else value
+                    if error is None and not isinstance(text, str):
+                        error = "Expected a JSON string or an object with a text field"
+                    elif error is None and len(text.strip()) < 3:
+                        error = "Text too short"
+                    
+                    if error is not None:
+                        errors.append({"index": index, "error": error})
+                    else:
+                        key = make_key("embed", embedding_model.model_id, embedding_model._preprocess(text))
+                        texts.append(((index, item_id), text, key))
+                    index += 1
+                
+                cached = await result_cache.aget_many([key for _, _, key in texts])
+                for (item, text, key), embedding in zip(texts, cached):
+                    if embedding is not None:
+                        hits.append((item, embedding))
+                    else:
+                        misses.append((item, text, key))
+                
+                if errors:
+                    yield "".join(json.dumps(e) + "\n" for e in errors)
+                if hits:
+                    yield result_lines([item for item, _ in hits], [e for _, e in hits])
+                
+                if not misses:
+                    continue
+                # Tokenizing a window is real work - plan on the pool, not the loop
+                try:
+                    pieces, batches = await inference_pool.run_waiting(
+                        "embedding", embedding_model.plan, [text for _, text, _ in misses]
+                    )
+                except Exception as e:
+                    yield "".join(json.dumps({"index": item[0], "error": str(e)}) + "\n" for item, _, _ in misses)
+                    continue
+                for batch in batches:
+                    items = [misses[i] for i in batch]
+                    try:
+                        encoded = await inference_pool.run_waiting(
+                            "embedding", embedding_model.encode_with_backoff, [pieces[i] for i in batch]
+                        )
+                    except Exception as e:
+                        yield "".join(json.dumps({"index": item[0], "error": str(e)}) + "\n" for item, _, _ in items)
+                        continue
+                    result_cache.set_many((key, embedding) for (_, _, key), embedding in zip(items, encoded))
+                    yield result_lines([item for item, _, _ in items], encoded)
+        finally:
+            reader.cancel()
+    
+    return DuplexStreamingResponse(stream(), headers={"X-Embedding-Model": embedding_model.version})
+
+
+def _caption_cache_key(contents: bytes, mode: str, max_latency_ms: Optional[float] = None) -> str:
+    caption_id = vision_model.caption_model_name
+    if mode != "quality":
+        caption_id += f":{mode}"
+    if mode == "fast":
+        # A decoding deadline may cut the caption short - keep it apart
+        budget = max_latency_ms if max_latency_ms is not None else vision_model.caption_max_latency_ms
+        if budget:
+            caption_id += f"@{budget:g}ms"
+    return make_key("caption", f"{vision_model.detection_model_id}+{caption_id}", contents)
+
+
+async def _caption_images(
+    contents_list: List[bytes],
+    mode: str,
+    skip_confidence: Optional[float] = None,
+    max_latency_ms: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """
+    DETR + BLIP for the cache misses, over images decoded once for both
+    With skip_confidence, images whose top detection reaches it are not captioned
+    """
+    if mode not in CAPTION_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(CAPTION_MODES)}")
+    
+    keys = [_caption_cache_key(contents, mode, max_latency_ms) for contents in contents_list]
+    results = await result_cache.aget_many(keys)
+    missing = [i for i, r in enumerate(results) if r is None]
+    if not missing:
+        return results
+    
+    decoded = await asyncio.gather(*[
+        asyncio.to_thread(_decode_image, contents_list[i]) for i in missing
+    ])
+    prepared = await asyncio.to_thread(vision_model.prepare_images, [d.model for d in decoded])
+    
+    detect = inference_pool.run(
+        "vision",
+        vision_model.detect_objects_batch,
+        prepared,
+        target_sizes=[d.original_size for d in decoded],
+    )
+    
+    def caption(indices: List[int]):
+        return inference_pool.run(
+            "caption",
+            vision_model.generate_captions,
+            prepared.subset(indices),
+            mode=mode,
+            max_latency_ms=max_latency_ms,
+        )
+    
+    if skip_confidence is None:
+        # Independent passes on separate executors
+        detections, captions = await asyncio.gather(detect, caption(list(range(len(decoded)))))
+    else:
+        detections = await detect
+        wanted = [
+            i for i, objects in enumerate(detections)
+            if not objects or objects[0]["confidence"] < skip_confidence
+        ]
+        captions = [None] * len(decoded)
+        if wanted:
+            for i, text in zip(wanted, await caption(wanted)):
+                captions[i] = text
+    
+    for i, detected_objects, text in zip(missing, detections, captions):
+        results[i] = {
+            "caption": text,
+            "detected_objects": detected_objects,
+            "caption_skipped": text is None,
+        }
+        # Don't pin the placeholder text if BLIP failed to load
+        if text is not None and vision_model.caption_model is not None:
+            result_cache.set(keys[i], results[i])
+    
+    return results
+
+
 @app.post("/generate/caption", response_model=CaptionResult)
 async def generate_caption(
     image: Optional[UploadFile] = File(None),
     image_url: Optional[str] = Form(None),
     image_base64: Optional[str] = Form(None),
+    mode: Optional[str] = Form(None, description="'quality' (beam search) or 'fast' (greedy)"),
+    skip_confidence: Optional[float] = Form(None, description="Skip captioning if a detection is at least this confident"),
+    max_latency_ms: Optional[float] = Form(None, description="Decoding time limit in fast mode"),
 ):
     """
     Generate descriptive caption for image
     Useful for accessibility and search
     """
     try:
-        pil_image = None
-        
-        if image:
-            contents = await image.read()
-            pil_image = Image.open(io.BytesIO(contents))
-        elif image_base64:
-            image_data = base64.b64decode(image_base64)
-            pil_image = Image.open(io.BytesIO(image_data))
-        elif image_url:
-            import httpx
-            async with httpx.AsyncClient() as client:
-                response = await client.get(image_url)
-                pil_image = Image.open(io.BytesIO(response.content))
-        else:
+        _require("vision")
+        
+        contents = await _read_image_bytes(image, image_url, image_base64)
+        if not contents:
             raise HTTPException(status_code=400, detail="No image provided")
         
-        if pil_image.mode != "RGB":
-            pil_image = pil_image.convert("RGB")
+        results = await _caption_images(
+            [contents],
+            mode or vision_model.caption_mode,
+            skip_confidence,
+            max_latency_ms,
+        )
+        return CaptionResult(**results[0])
+    
+    except (HTTPException, ExecutorSaturated):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/generate/caption/batch")
+async def generate_captions_batch(
+    images: Optional[List[UploadFile]] = File(None),
+    image_urls: Optional[List[str]] = Form(None),
+    mode: Optional[str] = Form(None, description="'quality' (beam search) or 'fast' (greedy)"),
+    skip_confidence: Optional[float] = Form(None, description="Skip captioning if a detection is at least this confident"),
+    max_latency_ms: Optional[float] = Form(None, description="Decoding time limit in fast mode"),
+):
+    """
+    Caption several images with one DETR pass and one BLIP generate()
+    Results are in input order
+    """
+    try:
+        _require("vision")
+        
+        contents_list = []
+        for image in images or []:
+            contents_list.append(await image.read())
+        for url in image_urls or []:
+            contents_list.append(await _read_image_bytes(image_url=url))
         
-        # Generate caption and detect objects
-        detected_objects = await vision_model.detect_objects(pil_image)
-        caption = await vision_model.generate_caption(pil_image)
+        if not contents_list:
+            raise HTTPException(status_code=400, detail="No images provided")
         
-        return CaptionResult(
-            caption=caption,
-            detected_objects=detected_objects,
+        if len(contents_list) > MAX_BATCH_IMAGES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Max {MAX_BATCH_IMAGES} images per batch",
+            )
+        
+        results = await _caption_images(
+            contents_list,
+            mode or vision_model.caption_mode,
+            skip_confidence,
+            max_latency_ms,
         )
+        return {
+            "results": [CaptionResult(**r) for r in results],
+            "count": len(results),
+        }
     
+    except (HTTPException, ExecutorSaturated):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/index/upsert")
+async def index_upsert(request: IndexUpsertRequest):
+    """
+    Add or update post embeddings in the vector index
+    Items without an embedding are embedded from their text
+    """
+    try:
+        _require("embedding")
+        
+        if not request.items:
+            raise HTTPException(status_code=400, detail="No items provided")
+        
+        vectors = [None] * len(request.items)
+        to_embed = []
+        for i, item in enumerate(request.items):
+            if item.embedding is not None:
+                vectors[i] = _query_vector(item.embedding, f"Post {item.post_id} embedding")
+            elif item.text:
+                to_embed.append(i)
+            else:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Post {item.post_id} has neither embedding nor text",
+                )
+        
+        # All missing texts go through one batched encode
+        if to_embed:
+            embedded = await _embed_many([request.items[i].text for i in to_embed])
+            for i, vector in zip(to_embed, embedded):
+                vectors[i] = vector
+        
+        await inference_pool.run(
+            "index",
+            vector_index.upsert_batch,
+            [item.post_id for item in request.items],
+            np.stack(vectors),
+            [item.category for item in request.items],
+            [item.post_type for item in request.items],
+        )
+        
+        return {"upserted": len(request.items), "size": len(vector_index)}
+    
+    except (HTTPException, ExecutorSaturated):
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/index/delete")
+async def index_delete(request: IndexDeleteRequest):
+    """Remove posts from the vector index"""
+    try:
+        _require("embedding")
+        
+        # Off the event loop - the index lock may be held by a training pass
+        deleted = await inference_pool.run("index", vector_index.delete_batch, request.post_ids)
+        
+        return {"deleted": deleted, "size": len(vector_index)}
+    
+    except (HTTPException, ExecutorSaturated):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/match/search")
+async def match_search(request: MatchSearchRequest):
+    """
+    Find the most similar indexed posts
+    Replaces per-candidate cosine similarity in the backend
+    """
+    try:
+        _require("embedding")
+        
+        if request.embedding is not None:
+            query = _query_vector(request.embedding, "Query embedding")
+        elif request.text:
+            query = await _embed(request.text)
+        else:
+            raise HTTPException(status_code=400, detail="Provide embedding or text")
+        
+        started = time.perf_counter()
+        results = await inference_pool.run(
+            "index",
+            vector_index.search,
+            query,
+            top_k=request.top_k,
+            category=request.category,
+            post_type=request.post_type,
+            exclude_id=request.exclude_post_id,
+        )
+        
+        return {
+            "results": results,
+            "count": len(results),
+            "took_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+    
+    except (HTTPException, ExecutorSaturated):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/match/score")
+async def match_score(request: MatchScoreRequest):
+    """
+    Score every candidate against the query post (category, attributes,
+    location, time, embedding, text) and return the top-k with breakdowns
+    Replaces per-candidate calculateMatchScore calls in the backend
+    """
+    try:
+        if len(request.candidates) > MAX_MATCH_CANDIDATES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Max {MAX_MATCH_CANDIDATES} candidates per request",
+            )
+        
+        query = request.query.model_dump()
+        
+        # Like the backend, embed the query post when it has no embedding yet
+        query_embedding = query["embedding"]
+        if query_embedding is None and _model_state("embedding") == "ready":
+            attributes = request.query.attributes
+            text = " ".join(
+                str(part) for part in (
+                    request.query.title, request.query.description,
+                    attributes.get("brand"), attributes.get("model"), attributes.get("color"),
+                ) if part
+            )
+            if text:
+                query_embedding = await _embed(text)
+        
+        started = time.perf_counter()
+        matches = await inference_pool.run(
+            "index",
+            score_matches,
+            query,
+            [candidate.model_dump() for candidate in request.candidates],
+            top_k=request.top_k,
+            min_score=request.min_score,
+            text_weight=request.text_weight,
+            query_embedding=query_embedding,
+        )
+        
+        return {
+            "matches": matches,
+            "count": len(matches),
+            "candidates": len(request.candidates),
+            "took_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+    
+    except (HTTPException, ExecutorSaturated):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -379,14 +1363,37 @@ async def generate_caption(
 @app.get("/health")
 async def health_check():
     """Detailed health check"""
+    states = {name: _model_state(name) for name in ALL_MODELS}
+    load_times = registry.load_times()
+    
+    status = "healthy"
+    if "failed" in states.values():
+        status = "degraded"
+    elif "loading" in states.values():
+        status = "starting"
+    
     return {
-        "status": "healthy",
+        "status": status,
         "models": {
-            "embedding": embedding_model is not None,
-            "vision": vision_model is not None,
-            "ocr": ocr_model is not None,
-            "extractor": item_extractor is not None,
+            name: {
+                "status": state,
+                "load_s": round(load_times[name], 2) if name in load_times else None,
+            }
+            for name, state in states.items()
+        },
+        "model_builds": registry.build_counts(),
+        "backends": {
+            "embedding": embedding_model.backend if embedding_model else None,
+            "vision": vision_model.detection_backend if vision_model else None,
+            "extractor": item_extractor.backend if item_extractor else None,
         },
+        "llm": item_extractor.decode_stats() if item_extractor else {},
+        "inference": inference_pool.stats() if inference_pool else {},
+        "residency": residency.stats() if residency else {},
+        "embed_batcher": embed_batcher.stats() if embed_batcher else {},
+        "cache": result_cache.stats() if result_cache else {},
+        "vector_index": vector_index.stats() if vector_index else {},
+        "image_fetch": image_fetcher.stats() if image_fetcher else {},
         "gpu": {
             "available": torch.cuda.is_available(),
             "device_count": torch.cuda.device_count() if torch.cuda.is_available() else 0,
@@ -396,6 +1403,11 @@ async def health_check():
 
 if __name__ == "__main__":
     import uvicorn
+    # Spawned children (rule_pool workers) re-run the __main__ script before
+    # anything else - started as "python main.py" that means torch and every
+    # model module per worker. The app is served from the importable "main"
+    # module, so children need nothing from this script
+    del sys.modules["__main__"].__file__
     uvicorn.run(
         "main:app",
         host=HOST,
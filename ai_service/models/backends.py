@@ -0,0 +1,111 @@
+"""
+Execution backends for CPU replicas
+Each model picks one with <MODEL>_BACKEND:
+- torch: PyTorch as loaded (fp16 on GPU, fp32 on CPU)
+- int8: PyTorch with int8 dynamic quantization of every nn.Linear
+- onnx: ONNX Runtime, exported once into MODEL_CACHE_DIR/onnx/
+"""
+
+import os
+from types import SimpleNamespace
+from typing import Any, Dict
+
+import torch
+
+BACKENDS = ("torch", "int8", "onnx")
+
+
+def resolve_backend(model: str, device: str) -> str:
+    """
+    Backend for model ("EMBEDDING", "VISION", "EXTRACTOR") from the environment
+    int8 and onnx are CPU paths - GPU replicas always use torch
+    """
+    backend = os.getenv(f"{model}_BACKEND", "torch").lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"{model}_BACKEND must be one of {', '.join(BACKENDS)}, got '{backend}'")
+    if backend != "torch" and device != "cpu":
+        print(f"⚠️ {model}_BACKEND={backend} is CPU-only, using torch on {device}")
+        return "torch"
+    return backend
+
+
+def quantize_int8(module: torch.nn.Module) -> torch.nn.Module:
+    """Dynamic int8 quantization - weights int8, activations quantized per batch"""
+    return torch.ao.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def export_dir(model_name: str, backend: str = "onnx") -> str:
+    """Where the exported copy of model_name lives under MODEL_CACHE_DIR"""
+    cache_dir = os.getenv("MODEL_CACHE_DIR", "./models")
+    return os.path.join(cache_dir, backend, model_name.replace("/", "--"))
+
+
+def export_onnx(model_name: str, task: str) -> str:
+    """
+    Export model_name to ONNX with optimum unless a previous export exists
+    Returns the export directory
+    """
+    path = export_dir(model_name)
+    if os.path.exists(os.path.join(path, "model.onnx")):
+        return path
+
+    from optimum.exporters.onnx import main_export
+
+    print(f"📦 Exporting {model_name} to ONNX ({task}) -> {path}")
+    main_export(
+        model_name,
+        output=path,
+        task=task,
+        cache_dir=os.getenv("MODEL_CACHE_DIR", "./models"),
+    )
+    return path
+
+
+def session_options():
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    threads = int(os.getenv("ONNX_THREADS", 0))
+    if threads:
+        options.intra_op_num_threads = threads
+    return options
+
+
+class OnnxDetectionModel:
+    """
+    Exported DETR behind the interface VisionModel uses: called with the
+    processor outputs, returns .logits/.pred_boxes for
+    post_process_object_detection, and exposes .config.id2label
+    """
+
+    def __init__(self, model_name: str):
+        import onnxruntime as ort
+        from transformers import AutoConfig
+
+        path = export_onnx(model_name, "object-detection")
+        self.session = ort.InferenceSession(
+            os.path.join(path, "model.onnx"),
+            sess_options=session_options(),
+            providers=["CPUExecutionProvider"],
+        )
+        self.config = AutoConfig.from_pretrained(path)
+        self._inputs = {i.name for i in self.session.get_inputs()}
+
+    def __call__(self, **inputs: torch.Tensor) -> Any:
+        feeds: Dict[str, Any] = {
+            name: tensor.cpu().numpy()
+            for name, tensor in inputs.items()
+            if name in self._inputs
+        }
+        logits, pred_boxes = self.session.run(["logits", "pred_boxes"], feeds)
+        return SimpleNamespace(
+            logits=torch.from_numpy(logits),
+            pred_boxes=torch.from_numpy(pred_boxes),
+        )
+
+    def to(self, device):
+        return self
+
+    def eval(self):
+        return self
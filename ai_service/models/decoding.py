@@ -0,0 +1,352 @@
+"""
+JSON decoding helpers for the local LLM
+The extractor only ever needs one JSON object with a known key set, so
+decoding can force the keys and punctuation, let the model pick only the
+values, and end at the closing brace instead of running to max_new_tokens
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch
+from transformers import StoppingCriteria
+
+try:
+    from transformers import DynamicCache
+except ImportError:
+    DynamicCache = None
+
+
+class PinnedPrefix:
+    """
+    KV cache of a prompt template's static head, prefilled once at startup
+    Kept in the legacy tuple format and wrapped in a new cache object per
+    request - cache updates concatenate into new tensors, so the pinned
+    ones are never modified
+    """
+
+    def __init__(self, model, ids: List[int], device: str):
+        self.ids = ids
+        with torch.no_grad():
+            outputs = model(input_ids=torch.tensor([ids], device=device), use_cache=True)
+        past = outputs.past_key_values
+        self._past = past.to_legacy_cache() if hasattr(past, "to_legacy_cache") else past
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def to(self, device: str):
+        """Move the pinned cache along with the model when it is offloaded"""
+        self._past = tuple(tuple(t.to(device) for t in layer) for layer in self._past)
+
+    def matches(self, ids: List[int]) -> bool:
+        return ids[:len(self.ids)] == self.ids
+
+    def cache(self):
+        """Fresh cache object for one request"""
+        if DynamicCache is not None and hasattr(DynamicCache, "from_legacy_cache"):
+            return DynamicCache.from_legacy_cache(self._past)
+        return self._past
+
+    @staticmethod
+    def stable_ids(tokenizer, head: str) -> List[int]:
+        """
+        Token ids of head that stay the same whatever text follows it
+        (BPE can merge the last few tokens with the start of the suffix)
+        """
+        ids = tokenizer(head)["input_ids"]
+        for probe in ("a", " a", "A", "1", "\n", '"', "{"):
+            full = tokenizer(head + probe)["input_ids"]
+            n = 0
+            while n < min(len(ids), len(full)) and ids[n] == full[n]:
+                n += 1
+            ids = ids[:n]
+        return ids
+
+
+class _JsonScanner:
+    """Tracks brace depth over streamed text, ignoring braces inside strings"""
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.start = -1
+        self.end = -1
+        self._offset = 0
+
+    @property
+    def closed(self) -> bool:
+        return self.end >= 0
+
+    def feed(self, text: str):
+        for i, char in enumerate(text, start=self._offset):
+            if self.closed:
+                break
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"' and self.depth > 0:
+                self.in_string = True
+            elif char == "{":
+                if self.depth == 0:
+                    self.start = i
+                self.depth += 1
+            elif char == "}" and self.depth > 0:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.end = i + 1
+        self._offset += len(text)
+
+
+def extract_json_object(text: str) -> Optional[str]:
+    """First balanced top-level {...} in text (nested objects included)"""
+    scanner = _JsonScanner()
+    scanner.feed(text)
+    return text[scanner.start:scanner.end] if scanner.closed else None
+
+
+def conform_to_schema(data: Any, schema: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Keep only schema keys with valid values
+    Enum values outside the list, nulls and empty strings/objects are dropped
+    """
+    result = {}
+    if not isinstance(data, dict):
+        return result
+
+    for key, spec in schema.items():
+        value = data.get(key)
+        if isinstance(spec, dict):
+            value = conform_to_schema(value, spec)
+        elif isinstance(spec, list):
+            value = value.strip().lower() if isinstance(value, str) else None
+            if value not in spec:
+                value = None
+        else:
+            value = value.strip() if isinstance(value, str) else None
+        if value:
+            result[key] = value
+    return result
+
+
+class JsonObjectStop(StoppingCriteria):
+    """
+    Stops generate() once every sequence in the batch has closed its
+    first top-level JSON object
+    """
+
+    def __init__(self, tokenizer, prompt_length: int, batch_size: int):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.scanners = [_JsonScanner() for _ in range(batch_size)]
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> bool:
+        if input_ids.shape[1] <= self.prompt_length:
+            return False
+        for scanner, token in zip(self.scanners, input_ids[:, -1].tolist()):
+            if not scanner.closed:
+                scanner.feed(self.tokenizer.decode([token]))
+        return all(scanner.closed for scanner in self.scanners)
+
+
+class _Decoding:
+    """State of one constrained generation"""
+
+    def __init__(
+        self,
+        decoder: "ConstrainedJsonDecoder",
+        prompt_ids: List[int],
+        prefix: Optional[PinnedPrefix] = None,
+    ):
+        self.decoder = decoder
+        self.past = prefix.cache() if prefix is not None else None
+        self.logits: Optional[torch.Tensor] = None
+        self.pending: List[int] = list(prompt_ids[len(prefix):] if prefix is not None else prompt_ids)
+        self.text = ""
+        self.output: List[int] = []
+        self.chosen = 0
+        self.passes = 0
+
+    def force(self, text: str):
+        """Append fixed text (keys, quotes, punctuation) without asking the model"""
+        self.text += text
+
+    def force_ids(self, ids: List[int]):
+        self._flush_text()
+        self.pending += ids
+        self.output += ids
+
+    def choose(self, token: int):
+        self._flush_text()
+        self.pending.append(token)
+        self.output.append(token)
+        self.chosen += 1
+
+    def _flush_text(self):
+        if self.text:
+            ids = self.decoder.encode(self.text)
+            self.pending += ids
+            self.output += ids
+            self.text = ""
+
+    def next_logits(self) -> torch.Tensor:
+        """Feed everything pending through the KV cache, return next-token logits"""
+        self._flush_text()
+        if self.pending:
+            input_ids = torch.tensor([self.pending], device=self.decoder.device)
+            outputs = self.decoder.model(
+                input_ids=input_ids,
+                past_key_values=self.past,
+                use_cache=True,
+            )
+            self.past = outputs.past_key_values
+            self.logits = outputs.logits[0, -1].float()
+            self.pending = []
+            self.passes += 1
+        return self.logits
+
+    def finish(self) -> List[int]:
+        """Output ids - the closing text is never fed to the model"""
+        self._flush_text()
+        return self.output
+
+
+class ConstrainedJsonDecoder:
+    """
+    Greedy decoder that can only emit a JSON object matching a schema
+    (see EXTRACTION_SCHEMAS). Keys and punctuation are forced, the model
+    chooses string contents, enum values and string-vs-null. The prompt is
+    prefilled once and every later step only feeds new tokens through the
+    KV cache
+    """
+
+    def __init__(self, model, tokenizer, device: str, max_string_tokens: int = 24):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = device
+        self.max_string_tokens = max_string_tokens
+
+        # Classify the vocabulary once: tokens allowed inside a JSON string,
+        # and tokens that would close it
+        vocab_size = model.config.vocab_size
+        special = set(tokenizer.all_special_ids)
+        string_ok = torch.zeros(vocab_size, dtype=torch.bool)
+        closes = torch.zeros(vocab_size, dtype=torch.bool)
+        for token in range(min(len(tokenizer), vocab_size)):
+            if token in special:
+                continue
+            text = tokenizer.decode([token])
+            if text.startswith('"'):
+                closes[token] = True
+            elif text and '"' not in text and "\\" not in text and all(c >= " " for c in text):
+                string_ok[token] = True
+        self._string_ok = string_ok.to(device)
+        self._closes = closes.to(device)
+
+        self._open_string = self.encode(' "')[0]
+        self._null = self.encode(" null")[0]
+        self._enum_ids: Dict[Tuple[str, ...], List[Tuple[str, List[int]]]] = {}
+
+        self.requests = 0
+        self.output_tokens = 0
+        self.chosen_tokens = 0
+        self.forward_passes = 0
+
+    def encode(self, text: str) -> List[int]:
+        return self.tokenizer.encode(text, add_special_tokens=False)
+
+    def decode(
+        self,
+        prompt_ids: List[int],
+        schema: Dict[str, Any],
+        prefix: Optional[PinnedPrefix] = None,
+    ) -> str:
+        """
+        Generate the JSON object for a tokenized prompt, returns its text
+        prefix: pinned cache covering the start of prompt_ids, if any
+        """
+        state = _Decoding(self, prompt_ids, prefix)
+        with torch.no_grad():
+            self._write_object(state, schema, "{")
+        output = state.finish()
+
+        self.requests += 1
+        self.output_tokens += len(output)
+        self.chosen_tokens += state.chosen
+        self.forward_passes += state.passes
+        return self.tokenizer.decode(output)
+
+    def _write_object(self, state: _Decoding, schema: Dict[str, Any], opening: str):
+        for n, (key, spec) in enumerate(schema.items()):
+            state.force((opening if n == 0 else ",") + " " + json.dumps(key) + ":")
+            if isinstance(spec, dict):
+                self._write_object(state, spec, " {")
+            elif isinstance(spec, list):
+                self._write_enum(state, spec)
+            else:
+                self._write_string(state, nullable=spec.endswith("|null"))
+        state.force("}")
+
+    def _write_string(self, state: _Decoding, nullable: bool):
+        if nullable:
+            logits = state.next_logits()
+            if logits[self._null] > logits[self._open_string]:
+                state.force(" null")
+                return
+
+        state.force(' "')
+        for _ in range(self.max_string_tokens):
+            logits = state.next_logits()
+            body = logits.masked_fill(~self._string_ok, float("-inf"))
+            token = int(torch.argmax(body))
+            if logits.masked_fill(~self._closes, float("-inf")).max() >= body[token]:
+                break
+            state.choose(token)
+        state.force('"')
+
+    def _write_enum(self, state: _Decoding, values: List[str]):
+        """Greedy walk of the token trie of the allowed values"""
+        key = tuple(values)
+        if key not in self._enum_ids:
+            self._enum_ids[key] = [(value, self.encode(value)) for value in values]
+        options = self._enum_ids[key]
+
+        state.force(' "')
+        depth = 0
+        while True:
+            longer = [(v, ids) for v, ids in options if len(ids) > depth]
+            complete = [(v, ids) for v, ids in options if len(ids) == depth]
+            if not longer:
+                options = complete
+                break
+            if len(options) == 1:
+                break
+
+            logits = state.next_logits()
+            next_ids = sorted({ids[depth] for _, ids in longer})
+            token = next_ids[int(torch.argmax(logits[next_ids]))]
+            if complete and logits.masked_fill(~self._closes, float("-inf")).max() > logits[token]:
+                options = complete
+                break
+
+            state.choose(token)
+            options = [(v, ids) for v, ids in longer if ids[depth] == token]
+            depth += 1
+
+        # Only one value left - the rest of it needs no model calls
+        state.force_ids(options[0][1][depth:])
+        state.force('"')
+
+    def stats(self) -> Dict[str, Any]:
+        requests = max(self.requests, 1)
+        return {
+            "requests": self.requests,
+            "output_tokens_per_request": round(self.output_tokens / requests, 1),
+            "model_tokens_per_request": round(self.chosen_tokens / requests, 1),
+            "forward_passes_per_request": round(self.forward_passes / requests, 1),
+        }
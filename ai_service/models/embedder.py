@@ -4,10 +4,95 @@ Uses sentence-transformers for efficient embeddings
 """
 
 import os
-from typing import List, Union
+import copy
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple, Union
 import numpy as np
+import torch
 from sentence_transformers import SentenceTransformer
 
+from models.backends import resolve_backend, quantize_int8, export_dir
+from models.registry import registry
+
+# Compact storage/transport encodings. Each vector packs into one
+# fixed-size little-endian blob:
+#   float32: dimension x float32 (lossless)
+#   float16: dimension x float16
+#   int8:    float32 scale, then dimension x int8 (value = q * scale)
+EMBEDDING_ENCODINGS = ("float32", "float16", "int8")
+
+
+# How texts longer than the model's max_seq_length are embedded:
+#   truncate: the first max_seq_length tokens (the tokenizer cuts them)
+#   mean/max: overlapping max_seq_length chunks, pooled into one vector
+LONG_TEXT_MODES = ("truncate", "mean", "max")
+
+# Rough activation bytes per padded token, as a multiple of the hidden size
+# (fp32 activations, attention and FFN intermediates of one layer at a time)
+BYTES_PER_TOKEN_FACTOR = 64
+
+# Budget growth per batch that fits after an OOM halved it (back to full
+# in about seven)
+BUDGET_RECOVERY = 1.1
+
+
+def _is_oom(error: Exception) -> bool:
+    if isinstance(error, torch.cuda.OutOfMemoryError):
+        return True
+    return isinstance(error, RuntimeError) and "out of memory" in str(error).lower()
+
+
+def encoded_size(encoding: str, dimension: int) -> int:
+    """Bytes per vector blob"""
+    if encoding == "float32":
+        return 4 * dimension
+    if encoding == "float16":
+        return 2 * dimension
+    if encoding == "int8":
+        return 4 + dimension
+    raise ValueError(f"Unknown embedding encoding: {encoding}")
+
+
+def quantize_embeddings(embeddings: np.ndarray, encoding: str) -> np.ndarray:
+    """(n, dim) float vectors -> (n, encoded_size) uint8 blobs"""
+    matrix = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+    if encoding == "float32":
+        return matrix.astype("<f4").view(np.uint8)
+    if encoding == "float16":
+        return matrix.astype("<f2").view(np.uint8)
+    if encoding == "int8":
+        # Symmetric per-vector scale, so the largest component maps to +-127
+        scale = np.abs(matrix).max(axis=1, keepdims=True) / 127
+        scale[scale == 0] = 1
+        q = np.clip(np.rint(matrix / scale), -127, 127).astype(np.int8)
+        return np.hstack([scale.astype("<f4").view(np.uint8), q.view(np.uint8)])
+    raise ValueError(f"Unknown embedding encoding: {encoding}")
+
+
+def dequantize_embeddings(data: Union[bytes, np.ndarray], encoding: str, dimension: int) -> np.ndarray:
+    """Blobs (one or many, concatenated) -> (n, dim) float32"""
+    blobs = np.frombuffer(data, dtype=np.uint8) if isinstance(data, (bytes, bytearray, memoryview)) else data
+    blobs = np.ascontiguousarray(blobs, dtype=np.uint8).reshape(-1, encoded_size(encoding, dimension))
+    if encoding == "float32":
+        return blobs.view("<f4").astype(np.float32)
+    if encoding == "float16":
+        return blobs.view("<f2").astype(np.float32)
+    scale = np.ascontiguousarray(blobs[:, :4]).view("<f4").astype(np.float32)
+    return blobs[:, 4:].view(np.int8).astype(np.float32) * scale
+
+
+def _window_starts(n_tokens: int, window: int, overlap: int, max_chunks: int) -> List[int]:
+    """Start token of each chunk; the last chunk always ends on the last token"""
+    if n_tokens <= window:
+        return [0]
+    starts = list(range(0, n_tokens - window, max(1, window - overlap))) + [n_tokens - window]
+    if len(starts) > max_chunks:
+        # Keep the head and the tail, where location and contact usually are
+        starts = starts[:max_chunks - 1] + starts[-1:]
+    return starts
+
 
 class EmbeddingModel:
     """
@@ -16,61 +101,262 @@ class EmbeddingModel:
     """
     
     def __init__(self, device: str = "cuda"):
+        registry.check_buildable("embedding")
+        
         model_name = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
         cache_dir = os.getenv("MODEL_CACHE_DIR", "./models")
         
-        print(f"📥 Loading embedding model: {model_name}")
+        self.model_name = model_name
+        self.backend = resolve_backend("EMBEDDING", device)
+        # Backends differ slightly numerically - keep their cached results apart
+        self.model_id = model_name if self.backend == "torch" else f"{model_name}:{self.backend}"
         
-        self.model = SentenceTransformer(
-            model_name,
-            cache_folder=cache_dir,
-            device=device,
-        )
+        self.long_text = os.getenv("EMBED_LONG_TEXT", "truncate").lower()
+        if self.long_text not in LONG_TEXT_MODES:
+            raise ValueError(f"EMBED_LONG_TEXT must be one of {', '.join(LONG_TEXT_MODES)}")
+        self.chunk_overlap = int(os.getenv("EMBED_CHUNK_OVERLAP", 32))
+        self.max_chunks = int(os.getenv("EMBED_MAX_CHUNKS", 8))
+        # Bounds tokenizer work on pasted walls of text
+        self.max_chars = int(os.getenv("EMBED_MAX_CHARS", 10000))
+        
+        print(f"📥 Loading embedding model: {model_name} ({self.backend})")
+        
+        if self.backend == "onnx":
+            self.model = self._load_onnx(model_name, cache_dir, device)
+        else:
+            self.model = SentenceTransformer(
+                model_name,
+                cache_folder=cache_dir,
+                device=device,
+            )
+            if self.backend == "int8":
+                self.model = quantize_int8(self.model)
         
         self.dimension = self.model.get_sentence_embedding_dimension()
+        self.device = device
+        self.max_seq_length = getattr(self.model, "max_seq_length", None) or 512
+        self.tokenizer = getattr(self.model, "tokenizer", None)
+        if self.long_text != "truncate" and not getattr(self.tokenizer, "is_fast", False):
+            print("⚠️ Chunked long-text embedding needs a fast tokenizer, truncating instead")
+            self.long_text = "truncate"
+        # Planning has a tokenizer of its own - a fast tokenizer shared with
+        # encode() on another worker fails with "Already borrowed"
+        self._plan_tokenizer = copy.deepcopy(self.tokenizer) if self.tokenizer is not None else None
+        self._tokenizer_lock = threading.Lock()
+        # Chunk-pooled vectors differ from truncated ones - cached and stored alike
+        if self.long_text != "truncate":
+            self.model_id += f"+chunk-{self.long_text}"
+        # Stored vectors carrying another tag were made by a different model,
+        # backend or long-text mode
+        self.version = f"{self.model_id}@{self.dimension}"
+        
+        # Candidate embeddings keyed by text hash (LRU)
+        self._cache_size = int(os.getenv("EMBEDDING_CACHE_SIZE", 10000))
+        self._embedding_cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        
+        # Adaptive batching (plan_batches): padded tokens per forward pass
+        self.max_batch_size = int(os.getenv("EMBED_MAX_BATCH_SIZE", 512))
+        self.cpu_token_budget = int(os.getenv("EMBED_CPU_TOKENS_PER_BATCH", 8192))
+        self.memory_fraction = float(os.getenv("EMBED_MEMORY_FRACTION", 0.5))
+        # Halved after an OOM so later plans stay below what failed, then
+        # regrown a little with every batch that fits
+        self._budget_scale = 1.0
+        self.oom_retries = 0
+        
         print(f"✅ Embedding model loaded. Dimension: {self.dimension}")
     
+    def _load_onnx(self, model_name: str, cache_dir: str, device: str) -> SentenceTransformer:
+        """ONNX Runtime backend (sentence-transformers>=3.2), exported once"""
+        path = export_dir(model_name)
+        if os.path.exists(os.path.join(path, "onnx", "model.onnx")):
+            return SentenceTransformer(path, device=device, backend="onnx")
+        
+        print(f"📦 Exporting {model_name} to ONNX -> {path}")
+        model = SentenceTransformer(model_name, cache_folder=cache_dir, device=device, backend="onnx")
+        model.save_pretrained(path)
+        return model
+    
     def encode(self, text: str) -> np.ndarray:
         """
         Generate embedding for a single text
         """
-        # Normalize and clean text
-        text = self._preprocess(text)
+        return self.encode_batch([text])[0]
+    
+    def encode_batch(self, texts: List[str], batch_size: Optional[int] = 32) -> List[np.ndarray]:
+        """
+        Generate embeddings for multiple texts efficiently
+        batch_size: sequences per forward pass (bulk jobs use larger ones on
+        GPU), None for all of them in one pass
+        In mean/max long-text mode, long texts are embedded chunk by chunk
+        and pooled
+        """
+        if self.long_text == "truncate":
+            pieces = [[self._preprocess(t)] for t in texts]
+        else:
+            pieces, _ = self.split(texts)
+        return self.encode_pieces(pieces, batch_size)
+    
+    def encode_pieces(self, pieces: List[List[str]], batch_size: Optional[int] = None) -> List[np.ndarray]:
+        """One embedding per entry of split()'s pieces, chunks pooled"""
+        rows = [chunk for chunks in pieces for chunk in chunks]
         
-        embedding = self.model.encode(
-            text,
+        embeddings = self.model.encode(
+            rows,
             convert_to_numpy=True,
             normalize_embeddings=True,
+            batch_size=batch_size or len(rows),
+            show_progress_bar=False,
         )
         
-        return embedding
+        if len(rows) == len(pieces):
+            return list(embeddings)
+        
+        pooled, start = [], 0
+        for chunks in pieces:
+            vectors = embeddings[start:start + len(chunks)]
+            start += len(chunks)
+            if len(chunks) == 1:
+                pooled.append(vectors[0])
+                continue
+            vector = vectors.mean(axis=0) if self.long_text == "mean" else vectors.max(axis=0)
+            pooled.append(vector / (np.linalg.norm(vector) or 1.0))
+        return pooled
     
-    def encode_batch(self, texts: List[str]) -> List[np.ndarray]:
+    def split(self, texts: List[str]) -> Tuple[List[List[str]], List[int]]:
         """
-        Generate embeddings for multiple texts efficiently
+        Each text, preprocessed, as the strings it is embedded as (itself, or
+        its chunks in mean/max mode) and its token count before truncation,
+        special tokens included - one tokenizer pass for both
         """
         texts = [self._preprocess(t) for t in texts]
+        if self._plan_tokenizer is None:
+            return [[t] for t in texts], [len(t) // 4 + 2 for t in texts]
         
-        embeddings = self.model.encode(
-            texts,
-            convert_to_numpy=True,
-            normalize_embeddings=True,
-            batch_size=32,
-            show_progress_bar=len(texts) > 10,
-        )
+        chunked = self.long_text != "truncate"
+        with self._tokenizer_lock:
+            encoded = self._plan_tokenizer(
+                texts, add_special_tokens=False, truncation=False,
+                return_offsets_mapping=chunked, verbose=False,
+            )
+            special = self._plan_tokenizer.num_special_tokens_to_add()
+        lengths = [len(ids) + special for ids in encoded["input_ids"]]
+        if not chunked:
+            return [[t] for t in texts], lengths
+        
+        window = self.max_seq_length - special
+        pieces = []
+        for text, offsets in zip(texts, encoded["offset_mapping"]):
+            starts = _window_starts(len(offsets), window, self.chunk_overlap, self.max_chunks)
+            if len(starts) == 1:
+                pieces.append([text])
+                continue
+            pieces.append([
+                text[offsets[start][0]:offsets[min(start + window, len(offsets)) - 1][1]]
+                for start in starts
+            ])
+        return pieces, lengths
+    
+    def token_lengths(self, texts: List[str]) -> List[int]:
+        """Tokens per text before truncation, special tokens included"""
+        return self.split(texts)[1]
+    
+    def token_budget(self) -> int:
+        """Padded tokens one forward pass may use, from the free device memory"""
+        if self.device.startswith("cuda") and torch.cuda.is_available():
+            free, _ = torch.cuda.mem_get_info(torch.device(self.device))
+            budget = free * self.memory_fraction / (BYTES_PER_TOKEN_FACTOR * self.dimension * 4)
+        else:
+            budget = self.cpu_token_budget
+        return max(int(budget * self._budget_scale), self.max_seq_length)
+    
+    def plan(self, texts: List[str]) -> Tuple[List[List[str]], List[List[int]]]:
+        """
+        split() pieces, and text indices grouped into batches of similar length
+        Each batch holds as many texts as fit the token budget when padded
+        to its longest text, so short texts make large batches
+        """
+        pieces, lengths = self.split(texts)
+        lengths = [min(n, self.max_seq_length) for n in lengths]
+        order = sorted(range(len(texts)), key=lambda i: lengths[i])
+        budget = self.token_budget()
         
-        return list(embeddings)
+        batches, batch, batch_rows = [], [], 0
+        for i in order:
+            # Sorted ascending, so the newest text is the batch's longest
+            rows = len(pieces[i])  # Forward-pass rows: one, or one per chunk
+            if batch and ((batch_rows + rows) * lengths[i] > budget or len(batch) >= self.max_batch_size):
+                batches.append(batch)
+                batch, batch_rows = [], 0
+            batch.append(i)
+            batch_rows += rows
+        if batch:
+            batches.append(batch)
+        return pieces, batches
+    
+    def plan_batches(self, texts: List[str]) -> List[List[int]]:
+        """Batches of text indices from plan()"""
+        return self.plan(texts)[1]
+    
+    def encode_with_backoff(self, pieces: List[List[str]], _split: bool = False) -> List[np.ndarray]:
+        """
+        encode_pieces as one forward pass; on out-of-memory the batch is
+        split in half (recursively) instead of failing
+        """
+        try:
+            embeddings = self.encode_pieces(pieces)
+        except Exception as e:
+            if not _is_oom(e) or len(pieces) == 1:
+                raise
+        else:
+            if not _split and self._budget_scale < 1.0:
+                # Memory the OOM lacked is often back (other models offloaded)
+                self._budget_scale = min(1.0, self._budget_scale * BUDGET_RECOVERY)
+            return embeddings
+        
+        # Outside the except block, so the failed pass's tensors can be freed
+        self.oom_retries += 1
+        if not _split:
+            # Once per planned batch - later plans start at half the budget
+            self._budget_scale /= 2
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        print(f"⚠️ Embedding OOM on {len(pieces)} texts, halving the batch")
+        half = len(pieces) // 2
+        return (self.encode_with_backoff(pieces[:half], _split=True)
+                + self.encode_with_backoff(pieces[half:], _split=True))
+    
+    def encode_adaptive(self, texts: List[str]) -> List[np.ndarray]:
+        """Embeddings for any number of texts, in planned batches, in input order"""
+        embeddings: List[np.ndarray] = [None] * len(texts)
+        pieces, batches = self.plan(texts)
+        for batch in batches:
+            for i, embedding in zip(batch, self.encode_with_backoff([pieces[i] for i in batch])):
+                embeddings[i] = embedding
+        return embeddings
     
     def similarity(self, text1: str, text2: str) -> float:
         """
         Calculate cosine similarity between two texts
         """
-        emb1 = self.encode(text1)
-        emb2 = self.encode(text2)
+        emb1, emb2 = self.encode_cached([text1, text2])
         
         # Since embeddings are normalized, dot product = cosine similarity
         return float(np.dot(emb1, emb2))
     
+    def similarity_matrix(
+        self,
+        queries: List[str],
+        candidates: List[str],
+    ) -> np.ndarray:
+        """
+        Cosine similarity of every query against every candidate
+        Returns a (len(queries), len(candidates)) float32 matrix
+        """
+        query_embs = self.encode_cached(queries)
+        candidate_embs = self.encode_cached(candidates)
+        return query_embs @ candidate_embs.T
+    
     def find_similar(
         self,
         query: str,
@@ -81,27 +367,83 @@ class EmbeddingModel:
         Find most similar candidates to query
         Returns list of (index, score, text) tuples
         """
-        query_emb = self.encode(query)
-        candidate_embs = self.encode_batch(candidates)
+        if not candidates:
+            return []
+        
+        query_emb = self.encode_cached([query])[0]
+        candidate_embs = self.encode_cached(candidates)
+        
+        scores = candidate_embs @ query_emb
         
-        scores = [float(np.dot(query_emb, c)) for c in candidate_embs]
+        # Partial sort - only the top_k need ordering
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        
+        return [(int(idx), float(scores[idx]), candidates[idx]) for idx in top]
+    
+    def encode_cached(self, texts: List[str]) -> np.ndarray:
+        """
+        Embeddings for texts as a stacked (n, dim) float32 matrix
+        Texts seen before are served from the cache, the rest are encoded in one batch
+        """
+        keys = [
+            hashlib.sha1(self._preprocess(t).encode("utf-8")).digest()
+            for t in texts
+        ]
+        matrix = np.empty((len(texts), self.dimension), dtype=np.float32)
+        missing = []
         
-        # Sort by score descending
-        ranked = sorted(
-            enumerate(scores),
-            key=lambda x: x[1],
-            reverse=True
-        )[:top_k]
+        with self._cache_lock:
+            for i, key in enumerate(keys):
+                cached = self._embedding_cache.get(key)
+                if cached is None:
+                    missing.append(i)
+                else:
+                    self._embedding_cache.move_to_end(key)
+                    matrix[i] = cached
         
-        return [(idx, score, candidates[idx]) for idx, score in ranked]
+        if missing:
+            encoded = self.encode_batch([texts[i] for i in missing])
+            with self._cache_lock:
+                for i, embedding in zip(missing, encoded):
+                    matrix[i] = embedding
+                    self._embedding_cache[keys[i]] = matrix[i].copy()
+                while len(self._embedding_cache) > self._cache_size:
+                    self._embedding_cache.popitem(last=False)
+        
+        return matrix
+    
+    def quantize(self, embeddings: Union[np.ndarray, List[np.ndarray]], encoding: str) -> List[bytes]:
+        """
+        Pack embeddings into compact blobs (see EMBEDDING_ENCODINGS)
+        Returns one bytes object per vector
+        """
+        blobs = quantize_embeddings(np.asarray(embeddings), encoding)
+        return [row.tobytes() for row in blobs]
+    
+    def dequantize(self, blobs: Union[bytes, List[bytes]], encoding: str) -> np.ndarray:
+        """
+        Blobs from quantize() back to a (n, dimension) float32 matrix
+        Not renormalized - cosine scoring normalizes anyway
+        """
+        data = blobs if isinstance(blobs, (bytes, bytearray, memoryview)) else b"".join(blobs)
+        return dequantize_embeddings(data, encoding, self.dimension)
+    
+    def residency_units(self) -> Dict[str, Tuple[List[Any], str, None]]:
+        """Modules the residency manager may offload: name -> (modules, device, on_move)"""
+        if self.backend != "torch":
+            return {}
+        return {"embedding": ([self.model], str(self.model.device), None)}
     
     def _preprocess(self, text: str) -> str:
         """Preprocess text for embedding"""
         # Remove extra whitespace
         text = " ".join(text.split())
         
-        # Truncate if too long
-        if len(text) > 512:
-            text = text[:512]
+        # Token-level truncation happens in the tokenizer (or chunking, see
+        # EMBED_LONG_TEXT); this only caps pathological inputs
+        if len(text) > self.max_chars:
+            text = text[:self.max_chars]
         
         return text
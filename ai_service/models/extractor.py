@@ -6,20 +6,48 @@ Supports local models for $0 inference
 import os
 import re
 import json
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 
 import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
+from transformers import AutoTokenizer, AutoModelForCausalLM, StoppingCriteriaList
 
-from utils.prompts import EXTRACTION_PROMPTS, CATEGORIES
+from models.backends import resolve_backend, quantize_int8, export_onnx, session_options
+from models.registry import registry
+from models.decoding import (
+    ConstrainedJsonDecoder,
+    JsonObjectStop,
+    PinnedPrefix,
+    conform_to_schema,
+    extract_json_object,
+)
+from utils.prompts import EXTRACTION_PROMPTS, EXTRACTION_SCHEMAS
+from utils.identifiers import extract_potential_identifiers
+from utils.rules import (
+    rule_based_pass,
+    clean_description,
+    generate_tags,
+)
 
 
 class ItemExtractor:
     def __init__(self, device: str = "cuda"):
+        registry.check_buildable("extractor")
+        
         self.device = device
         self.llm_mode = os.getenv("LLM_MODEL", "local")
         self.model = None
         self.tokenizer = None
+        self.json_decoder = None
+        self.model_name = None
+        self.backend = resolve_backend("EXTRACTOR", device)
+        # constrained: schema-forced greedy JSON, greedy: stop at the closing
+        # brace, sample: previous sampled 200-token generation
+        self.decoding = os.getenv("LLM_DECODING", "constrained").lower()
+        self.generate_requests = 0
+        self.generated_tokens = 0
+        self.pin_prefixes = os.getenv("LLM_PIN_PREFIX", "true").lower() == "true"
+        self.prefixes: Dict[str, PinnedPrefix] = {}
+        self.prefix_hits = 0
         
         if self.llm_mode == "local":
             try:
@@ -32,6 +60,7 @@ class ItemExtractor:
     
     def _init_local_model(self):
         model_name = os.getenv("LOCAL_LLM", "microsoft/phi-2")
+        self.model_name = model_name
         cache_dir = os.getenv("MODEL_CACHE_DIR", "./models")
         print(f"Loading local LLM: {model_name}")
         
@@ -40,36 +69,127 @@ class ItemExtractor:
         )
         if self.tokenizer.pad_token is None:
             self.tokenizer.pad_token = self.tokenizer.eos_token
+        # Decoder-only generation needs prompts right-aligned in a batch
+        self.tokenizer.padding_side = "left"
         
-        self.model = AutoModelForCausalLM.from_pretrained(
-            model_name, cache_dir=cache_dir,
-            torch_dtype=torch.float16 if self.device == "cuda" else torch.float32,
-            device_map="auto" if self.device == "cuda" else None,
-            trust_remote_code=True,
-        )
-        if self.device != "cuda":
-            self.model = self.model.to(self.device)
-        self.model.eval()
+        if self.backend == "onnx":
+            self._init_onnx_model(model_name)
+        else:
+            self.model = AutoModelForCausalLM.from_pretrained(
+                model_name, cache_dir=cache_dir,
+                torch_dtype=torch.float16 if self.device == "cuda" else torch.float32,
+                device_map="auto" if self.device == "cuda" else None,
+                trust_remote_code=True,
+            )
+            if self.device != "cuda":
+                self.model = self.model.to(self.device)
+            self.model.eval()
+            if self.backend == "int8":
+                self.model = quantize_int8(self.model)
+        
+        if self.decoding == "constrained":
+            self.json_decoder = ConstrainedJsonDecoder(self.model, self.tokenizer, self.device)
+        if self.pin_prefixes:
+            self._pin_prompt_prefixes()
         print("Local LLM loaded!")
     
-    async def extract_from_text(self, text: str, post_type: Optional[str] = None) -> Dict[str, Any]:
-        result = self._rule_based_extraction(text)
+    def _init_onnx_model(self, model_name: str):
+        """
+        ONNX Runtime graph with KV cache inputs, driven through generate()
+        The constrained decoder and pinned prefixes need the torch model's
+        cache objects, so this backend decodes greedily to the closing brace
+        """
+        from optimum.onnxruntime import ORTModelForCausalLM
+        
+        path = export_onnx(model_name, "text-generation-with-past")
+        self.model = ORTModelForCausalLM.from_pretrained(
+            path, use_cache=True, session_options=session_options(),
+            provider="CPUExecutionProvider",
+        )
+        if self.decoding == "constrained":
+            self.decoding = "greedy"
+        self.pin_prefixes = False
+    
+    def _pin_prompt_prefixes(self):
+        """
+        Prefill the static head of each prompt template once
+        Requests whose prompt starts with it only prefill their own suffix
+        """
+        for name, template in EXTRACTION_PROMPTS.items():
+            head = template[:template.index("{")] if "{" in template else template
+            ids = PinnedPrefix.stable_ids(self.tokenizer, head)
+            # A handful of tokens isn't worth the VRAM
+            if len(ids) < 16:
+                continue
+            self.prefixes[name] = PinnedPrefix(self.model, ids, self.device)
+        
+        pinned = {name: len(prefix) for name, prefix in self.prefixes.items()}
+        print(f"Pinned prompt prefixes (tokens): {pinned}")
+    
+    def residency_units(self) -> Dict[str, Tuple[List[Any], str, Any]]:
+        """
+        Modules the residency manager may offload: name -> (modules, device, on_move)
+        Pinned prefix caches follow the model; a model split over several
+        GPUs by device_map stays put
+        """
+        if self.model is None or self.backend != "torch":
+            return {}
+        if len(set(getattr(self.model, "hf_device_map", {}).values())) > 1:
+            return {}
+        return {"extractor": ([self.model], self.device, self._move_prefixes)}
+    
+    def _move_prefixes(self, device: str):
+        for prefix in self.prefixes.values():
+            prefix.to(device)
+    
+    def _prompt_ids(self, name: str, prompt: str) -> Tuple[List[int], Optional[PinnedPrefix]]:
+        """Tokenized prompt plus the pinned prefix cache it can start from"""
+        ids = self.tokenizer(prompt, truncation=True, max_length=1024)["input_ids"]
+        prefix = self.prefixes.get(name)
+        if prefix is not None and prefix.matches(ids) and len(ids) > len(prefix):
+            self.prefix_hits += 1
+            return ids, prefix
+        return ids, None
+    
+    def extract_from_text(self, text: str, post_type: Optional[str] = None) -> Dict[str, Any]:
+        result, detected_post_type = rule_based_pass(text)
         if self.model is not None:
-            llm_result = await self._llm_extraction(text, post_type)
+            llm_result = self._llm_extraction(text, post_type)
             result = self._merge_results(result, llm_result)
         
+        return self._build_text_result(text, post_type, result, detected_post_type)
+    
+    @property
+    def model_id(self) -> str:
+        """Identifies what produced a text extraction (for cache keys)"""
+        if self.model is None:
+            return "rules"
+        return f"{self.model_name}:{self.backend}:{self.decoding}"
+    
+    @property
+    def deterministic(self) -> bool:
+        """Same text in, same result out - safe to cache"""
+        return self.model is None or self.decoding != "sample"
+    
+    def _build_text_result(
+        self,
+        text: str,
+        post_type: Optional[str],
+        result: Dict[str, Any],
+        detected_post_type: str,
+    ) -> Dict[str, Any]:
         filled_fields = sum(1 for v in [result.get("title"), result.get("category"), 
                                         result.get("attributes"), result.get("location"), 
                                         result.get("date")] if v)
         confidence = min(filled_fields / 5, 1.0)
-        detected_post_type = post_type.upper() if post_type else self._detect_post_type(text)
-        tags = self._generate_tags(result)
+        detected_post_type = post_type.upper() if post_type else detected_post_type
+        tags = generate_tags(result)
         
         return {
             "post_type": detected_post_type,
             "category": result.get("category", "other"),
             "title": result.get("title", ""),
-            "clean_description": self._clean_description(text),
+            "clean_description": clean_description(text),
             "description": result.get("description", text[:500]),
             "item_attributes": result.get("attributes", {}),
             "attributes": result.get("attributes", {}),
@@ -88,46 +208,67 @@ class ItemExtractor:
             "original_text": text,
         }
     
-    def _detect_post_type(self, text: str) -> str:
-        text_lower = text.lower()
-        lost_keywords = ["lost", "missing", "misplaced", "can't find", "cannot find", 
-                        "dropped", "left behind", "help me find", "looking for",
-                        "have you seen", "please help", "i lost"]
-        found_keywords = ["found", "picked up", "discovered", "someone left", 
-                         "claim", "owner", "is this yours", "belongs to",
-                         "i found", "we found", "came across"]
-        lost_score = sum(1 for kw in lost_keywords if kw in text_lower)
-        found_score = sum(1 for kw in found_keywords if kw in text_lower)
-        return "FOUND" if found_score > lost_score else "LOST"
+    def extract_from_text_batch(
+        self,
+        texts: List[str],
+        post_types: Optional[List[Optional[str]]] = None,
+        rule_results: Optional[List[Tuple[Dict[str, Any], str]]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        extract_from_text for many texts with one padded LLM generate call
+        rule_results: precomputed rule_based_pass outputs (e.g. from a process pool)
+        """
+        post_types = post_types or [None] * len(texts)
+        if rule_results is None:
+            rule_results = [rule_based_pass(text) for text in texts]
+        
+        llm_results = [{}] * len(texts)
+        if self.model is not None and texts:
+            llm_results = self._llm_extraction_batch(texts, post_types)
+        
+        results = []
+        for text, post_type, (rule_result, detected_post_type), llm_result in zip(
+            texts, post_types, rule_results, llm_results
+        ):
+            result = self._merge_results(rule_result, llm_result)
+            results.append(self._build_text_result(text, post_type, result, detected_post_type))
+        return results
     
-    def _clean_description(self, text: str) -> str:
-        cleaned = re.sub(r'\s+', ' ', text.strip())
-        cleaned = re.sub(r'#\w+', '', cleaned)
-        cleaned = re.sub(r'@\w+', '', cleaned)
-        cleaned = re.sub(r'https?://\S+', '', cleaned)
-        cleaned = re.sub(r'RT\s*:', '', cleaned)
-        cleaned = re.sub(r'\s+', ' ', cleaned).strip()
-        return cleaned[:1000] if cleaned else text[:1000]
+    def plan_batches(self, texts: List[str], batch_size: int = None) -> List[List[int]]:
+        """
+        Group text indices into generation batches of similar prompt length
+        Sorting by length first keeps padding (wasted compute) per batch small
+        """
+        batch_size = batch_size or int(os.getenv("LLM_BATCH_SIZE", 8))
+        if self.tokenizer is not None:
+            lengths = [len(ids) for ids in self.tokenizer([t[:1000] for t in texts])["input_ids"]]
+        else:
+            lengths = [len(t) for t in texts]
+        
+        order = sorted(range(len(texts)), key=lambda i: lengths[i])
+        return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
     
-    def _generate_tags(self, result: Dict[str, Any]) -> List[str]:
-        tags = []
-        category = result.get("category", "")
-        if category and category != "other":
-            tags.append(category)
-        attrs = result.get("attributes", {})
-        if attrs.get("color"):
-            tags.append(attrs["color"])
-        if attrs.get("brand"):
-            tags.append(attrs["brand"].lower())
-        title = result.get("title", "").lower()
-        for kw in ["phone", "wallet", "keys", "bag", "laptop", "watch", "glasses", 
-                   "dog", "cat", "ring", "earbuds", "headphones", "camera", "tablet", "id", "passport"]:
-            if kw in title:
-                tags.append(kw)
-                break
-        return list(set(tags))
+    def _llm_extraction_batch(self, texts: List[str], post_types: List[Optional[str]]) -> List[Dict[str, Any]]:
+        try:
+            prompts = [
+                EXTRACTION_PROMPTS["text_extraction"].format(post_type=post_type or "lost or found", text=text[:1000])
+                for text, post_type in zip(texts, post_types)
+            ]
+            inputs = self.tokenizer(prompts, return_tensors="pt", padding=True,
+                                    truncation=True, max_length=1024).to(self.device)
+            # Left padding puts every prompt at the same offset
+            prompt_length = inputs["input_ids"].shape[1]
+            with torch.no_grad():
+                outputs = self.model.generate(**inputs, **self._generation_kwargs(prompt_length, len(prompts)))
+            new_tokens = outputs[:, prompt_length:]
+            self._count_generated(new_tokens)
+            responses = self.tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
+            return [self._parse_llm_response(response) for response in responses]
+        except Exception as e:
+            print(f"LLM batch extraction error: {e}")
+            return [{}] * len(texts)
     
-    async def extract_from_image(self, detected_objects: List[Dict[str, Any]], ocr_text: Optional[str] = None) -> Dict[str, Any]:
+    def extract_from_image(self, detected_objects: List[Dict[str, Any]], ocr_text: Optional[str] = None) -> Dict[str, Any]:
         result = {"title": None, "description": None, "clean_description": None, "category": None, "attributes": {}, "location": None, "date": None}
         if detected_objects:
             primary = detected_objects[0]
@@ -137,22 +278,69 @@ class ItemExtractor:
             description = f"Image shows: {', '.join(object_names)}"
             result["description"] = description
             result["clean_description"] = description
+            # Colors measured inside the primary object's box
+            if primary.get("colors"):
+                result["attributes"]["color"] = primary["colors"][0]["name"]
         if ocr_text:
             # If OCR found text, use it as a better description
             if ocr_text.strip():
-                result["clean_description"] = self._clean_description(ocr_text)
-            from models.ocr import OCRModel
-            ocr = OCRModel()
-            identifiers = ocr.extract_potential_identifiers(ocr_text)
+                result["clean_description"] = clean_description(ocr_text)
+            identifiers = extract_potential_identifiers(ocr_text)
             result["attributes"].update(identifiers)
         return result
     
+    def merge_image_extractions(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Combine per-image extractions for one post into a single result"""
+        results = [r for r in results if r]
+        if not results:
+            return {}
+        
+        # All detections across the photos, best first
+        detected_objects = sorted(
+            (obj for r in results for obj in r.get("detected_objects", [])),
+            key=lambda x: x["confidence"],
+            reverse=True,
+        )
+        
+        # Lead with the photo holding the most confident detection
+        def top_confidence(r):
+            objects = r.get("detected_objects") or [{}]
+            return objects[0].get("confidence", 0)
+        
+        ordered = sorted(results, key=top_confidence, reverse=True)
+        merged = {}
+        for r in ordered:
+            merged = self.merge_extractions(merged, r) if merged else dict(r)
+        
+        # Attributes from better photos win on conflicts
+        attributes = {}
+        for r in reversed(ordered):
+            attributes.update(r.get("attributes") or {})
+        merged["attributes"] = attributes
+        
+        # Confidence-weighted category vote over every detection
+        votes = {}
+        for obj in detected_objects:
+            cat = obj.get("category", "other")
+            votes[cat] = votes.get(cat, 0) + obj.get("confidence", 0)
+        if votes:
+            merged["category"] = max(votes, key=votes.get)
+        
+        texts = [r.get("extracted_text") for r in results if r.get("extracted_text")]
+        merged["detected_objects"] = detected_objects[:10]
+        merged["extracted_text"] = " ".join(texts) if texts else None
+        merged["item_attributes"] = attributes
+        return merged
+    
     def merge_extractions(self, text_result: Dict[str, Any], image_result: Dict[str, Any]) -> Dict[str, Any]:
         merged = text_result.copy()
         for key, value in image_result.items():
             if key in ("attributes", "item_attributes"):
                 merged_attrs = text_result.get("attributes", {}).copy()
                 merged_attrs.update(value or {})
+                # A color the poster wrote beats one measured from the photo
+                if text_result.get("attributes", {}).get("color"):
+                    merged_attrs["color"] = text_result["attributes"]["color"]
                 merged["attributes"] = merged_attrs
                 merged["item_attributes"] = merged_attrs
             elif key in ("detected_objects", "extracted_text"):
@@ -161,142 +349,82 @@ class ItemExtractor:
                 merged[key] = value
         return merged
     
-    def _rule_based_extraction(self, text: str) -> Dict[str, Any]:
-        result = {"title": None, "description": text[:500] if text else None, "category": None, 
-                  "attributes": {}, "location": None, "date": None, "contact_info": None, "reward": None}
-        text_lower = text.lower()
-        
-        for category, keywords in CATEGORIES.items():
-            if any(kw in text_lower for kw in keywords):
-                result["category"] = category
-                break
-        if not result["category"]:
-            result["category"] = "other"
-        
-        colors = ["black", "white", "red", "blue", "green", "yellow", "orange", "purple", 
-                  "pink", "brown", "gray", "grey", "silver", "gold", "beige", "navy", "maroon"]
-        for color in colors:
-            if color in text_lower:
-                result["attributes"]["color"] = color
-                break
-        
-        brands = ["apple", "iphone", "samsung", "galaxy", "google", "pixel", "huawei", "xiaomi", 
-                  "oneplus", "sony", "lg", "motorola", "nokia", "hp", "dell", "lenovo", "asus", 
-                  "acer", "microsoft", "surface", "macbook", "ipad", "airpods", "nike", "adidas", 
-                  "puma", "reebok", "converse", "vans", "gucci", "louis vuitton", "prada", 
-                  "coach", "michael kors", "ray-ban", "oakley", "rolex", "casio", "fossil"]
-        for brand in brands:
-            if brand in text_lower:
-                result["attributes"]["brand"] = brand.title()
-                break
-        
-        location_patterns = [
-            r'(?:at|near|in|around|by|outside|inside)\s+(?:the\s+)?([A-Z][a-zA-Z\s]+(?:station|park|mall|center|centre|street|road|avenue|plaza|square|building|hospital|school|university|college|airport|market|store|shop|restaurant|cafe|hotel|office|gym|library|church|mosque|temple))',
-            r'(?:near|at|in)\s+([A-Z][a-zA-Z\s]+)',
-            r'(?:on|along)\s+([A-Z][a-zA-Z]+\s+(?:Street|Road|Avenue|Boulevard|Lane|Drive|Way|Place))',
-        ]
-        for pattern in location_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                loc_text = match.group(1).strip()
-                if len(loc_text) > 3:
-                    result["location"] = {"description": loc_text}
-                    break
-        
-        date_patterns = [
-            r'(?:on|dated?)\s+(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4})',
-            r'(\d{1,2}\s+(?:January|February|March|April|May|June|July|August|September|October|November|December)(?:\s+\d{4})?)',
-            r'\b(yesterday|today|last\s+(?:night|evening|morning|week))\b',
-            r'\b(this\s+(?:morning|afternoon|evening))\b',
-        ]
-        for pattern in date_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                result["date"] = match.group(1) if match.lastindex else match.group(0)
-                break
-        
-        contact = {}
-        phone_match = re.search(r'(\+?\d{1,3}[-.\s]?\(?\d{2,4}\)?[-.\s]?\d{3,4}[-.\s]?\d{3,4})', text)
-        if phone_match:
-            phone = re.sub(r'[^\d+]', '', phone_match.group(1))
-            if len(phone) >= 10:
-                contact["phone"] = phone
-        email_match = re.search(r'[\w\.-]+@[\w\.-]+\.\w+', text)
-        if email_match:
-            contact["email"] = email_match.group(0)
-        if contact:
-            result["contact_info"] = contact
-        
-        reward_match = re.search(r'(?:reward|cash reward|offering)\s*[:of]?\s*\$?\s*(\d+)', text, re.IGNORECASE)
-        if reward_match:
-            result["reward"] = f"${reward_match.group(1)}"
-        
-        item_types = {
-            "phone": ["phone", "iphone", "android", "smartphone", "mobile"],
-            "wallet": ["wallet", "purse", "billfold"],
-            "keys": ["keys", "keychain", "key fob", "car key"],
-            "bag": ["bag", "backpack", "handbag", "purse", "tote", "suitcase", "luggage"],
-            "laptop": ["laptop", "macbook", "notebook computer"],
-            "watch": ["watch", "smartwatch", "fitbit"],
-            "glasses": ["glasses", "sunglasses", "spectacles", "eyeglasses"],
-            "dog": ["dog", "puppy", "golden retriever", "labrador", "bulldog", "poodle", "beagle", "husky"],
-            "cat": ["cat", "kitten"],
-            "earbuds": ["earbuds", "airpods", "headphones", "earphones"],
-            "ring": ["ring", "engagement ring", "wedding ring"],
-            "necklace": ["necklace", "chain", "pendant"],
-            "camera": ["camera", "gopro", "dslr"],
-            "tablet": ["tablet", "ipad"],
-            "id card": ["id", "id card", "license", "passport", "driving license"],
-        }
-        
-        detected_item = None
-        for item_name, keywords in item_types.items():
-            if any(kw in text_lower for kw in keywords):
-                detected_item = item_name
-                break
-        
-        title_parts = []
-        if result["attributes"].get("color"):
-            title_parts.append(result["attributes"]["color"].title())
-        if result["attributes"].get("brand"):
-            title_parts.append(result["attributes"]["brand"])
-        if detected_item:
-            title_parts.append(detected_item.title())
-        
-        if title_parts:
-            result["title"] = " ".join(title_parts)
-        else:
-            sentences = text.split('.')
-            for sentence in sentences:
-                clean = sentence.strip()
-                if 10 < len(clean) < 100:
-                    if not re.search(r'call|contact|reward|email|phone|@', clean, re.IGNORECASE):
-                        result["title"] = clean
-                        break
-            if not result["title"]:
-                result["title"] = text[:80].strip()
-        
-        return result
-    
-    async def _llm_extraction(self, text: str, post_type: Optional[str] = None) -> Dict[str, Any]:
+    def _llm_extraction(self, text: str, post_type: Optional[str] = None) -> Dict[str, Any]:
         try:
             prompt = EXTRACTION_PROMPTS["text_extraction"].format(post_type=post_type or "lost or found", text=text[:1000])
-            inputs = self.tokenizer(prompt, return_tensors="pt", truncation=True, max_length=1024).to(self.device)
+            input_ids, prefix = self._prompt_ids("text_extraction", prompt)
+            if self.json_decoder is not None:
+                response = self.json_decoder.decode(input_ids, EXTRACTION_SCHEMAS["text_extraction"], prefix)
+                return self._parse_llm_response(response)
+            
+            inputs = {
+                "input_ids": torch.tensor([input_ids], device=self.device),
+                "attention_mask": torch.ones(1, len(input_ids), dtype=torch.long, device=self.device),
+            }
+            if prefix is not None:
+                # generate() skips the tokens already in the cache
+                inputs["past_key_values"] = prefix.cache()
             with torch.no_grad():
-                outputs = self.model.generate(**inputs, max_new_tokens=200, do_sample=True, 
-                                              temperature=0.3, top_p=0.9, pad_token_id=self.tokenizer.pad_token_id)
-            response = self.tokenizer.decode(outputs[0][inputs["input_ids"].shape[1]:], skip_special_tokens=True)
+                outputs = self.model.generate(**inputs, **self._generation_kwargs(len(input_ids), 1))
+            new_tokens = outputs[:, len(input_ids):]
+            self._count_generated(new_tokens)
+            response = self.tokenizer.decode(new_tokens[0], skip_special_tokens=True)
             return self._parse_llm_response(response)
         except Exception as e:
             print(f"LLM extraction error: {e}")
             return {}
     
+    def _generation_kwargs(self, prompt_length: int, batch_size: int) -> Dict[str, Any]:
+        kwargs = {"max_new_tokens": 200, "pad_token_id": self.tokenizer.pad_token_id}
+        if self.decoding == "sample":
+            kwargs.update(do_sample=True, temperature=0.3, top_p=0.9)
+        else:
+            # Greedy is deterministic (cacheable) and ends at the closing brace
+            kwargs.update(
+                do_sample=False,
+                stopping_criteria=StoppingCriteriaList([
+                    JsonObjectStop(self.tokenizer, prompt_length, batch_size)
+                ]),
+            )
+        return kwargs
+    
+    def _count_generated(self, new_tokens: torch.Tensor):
+        """Generated tokens per sequence, up to its first pad/eos"""
+        for row in new_tokens.tolist():
+            pad = self.tokenizer.pad_token_id
+            self.generated_tokens += row.index(pad) + 1 if pad in row else len(row)
+            self.generate_requests += 1
+    
+    def decode_stats(self) -> Dict[str, Any]:
+        """LLM output size per request for the active decoding mode"""
+        prefixes = {
+            "pinned": {name: len(prefix) for name, prefix in self.prefixes.items()},
+            "hits": self.prefix_hits,
+        }
+        if self.json_decoder is not None:
+            return {
+                "decoding": self.decoding,
+                "backend": self.backend,
+                **self.json_decoder.stats(),
+                "prefixes": prefixes,
+            }
+        requests = max(self.generate_requests, 1)
+        return {
+            "decoding": self.decoding,
+            "backend": self.backend,
+            "requests": self.generate_requests,
+            "output_tokens_per_request": round(self.generated_tokens / requests, 1),
+            "prefixes": prefixes,
+        }
+    
     def _parse_llm_response(self, response: str) -> Dict[str, Any]:
         result = {}
         try:
-            json_match = re.search(r'\{[^{}]*\}', response, re.DOTALL)
-            if json_match:
-                result = json.loads(json_match.group())
+            json_text = extract_json_object(response)
+            if json_text:
+                result = json.loads(json_text)
+                if self.decoding != "sample":
+                    result = conform_to_schema(result, EXTRACTION_SCHEMAS["text_extraction"])
                 return result
         except json.JSONDecodeError:
             pass
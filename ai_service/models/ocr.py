@@ -4,11 +4,18 @@ Uses EasyOCR for robust text detection
 """
 
 import os
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
 from PIL import Image
 import numpy as np
 import easyocr
 
+from utils.identifiers import extract_potential_identifiers
+from models.registry import registry
+
+# full: EasyOCR over the whole frame, regions: only where detection found
+# objects, plus a downscaled full-frame pass for large text
+OCR_MODES = ("full", "regions")
+
 
 class OCRModel:
     """
@@ -17,6 +24,9 @@ class OCRModel:
     """
     
     def __init__(self):
+        # Building a Reader reloads detection/recognition weights from disk
+        registry.check_buildable("ocr")
+        
         languages = os.getenv("OCR_LANGUAGES", "en").split(",")
         use_gpu = os.getenv("USE_GPU", "true").lower() == "true"
         
@@ -28,9 +38,26 @@ class OCRModel:
             model_storage_directory=os.getenv("MODEL_CACHE_DIR", "./models"),
         )
         
+        self.mode = os.getenv("OCR_MODE", "full").lower()
+        if self.mode not in OCR_MODES:
+            raise ValueError(f"OCR_MODE must be one of {', '.join(OCR_MODES)}, got '{self.mode}'")
+        self.overview_side = int(os.getenv("OCR_OVERVIEW_SIDE", 960))
+        self.max_regions = int(os.getenv("OCR_MAX_REGIONS", 4))
+        self.batch_size = int(os.getenv("OCR_BATCH_SIZE", 16))
+        # Padded pixels a batch may add, as a fraction of its real pixels
+        self.max_pad_waste = float(os.getenv("OCR_MAX_PAD_WASTE", 0.25))
+        # Top detection categories with nothing worth reading
+        self.skip_categories = {
+            c.strip() for c in os.getenv("OCR_SKIP_CATEGORIES", "pets").split(",") if c.strip()
+        }
+        
         print("✅ OCR model loaded!")
     
-    async def extract_text(
+    def residency_units(self) -> Dict[str, Tuple[List[Any], str, None]]:
+        """Modules the residency manager may offload: name -> (modules, device, on_move)"""
+        return {"ocr": ([self.reader.detector, self.reader.recognizer], self.reader.device, None)}
+    
+    def extract_text(
         self,
         image: Image.Image,
         min_confidence: float = 0.3,
@@ -49,6 +76,44 @@ class OCRModel:
             paragraph=False,
         )
         
+        return self._join_text(results, min_confidence)
+    
+    def extract_text_batch(
+        self,
+        images: List[Image.Image],
+        min_confidence: float = 0.3,
+    ) -> List[Optional[str]]:
+        """
+        Extract text from several images in batched recognition runs
+        Images are padded (not resized) to a common size so aspect ratios
+        and box coordinates are preserved; they are grouped by shape first
+        so a portrait photo is never padded out to a landscape one's width
+        """
+        if not images:
+            return []
+        
+        arrays = [np.array(image) for image in images]
+        texts: List[Optional[str]] = [None] * len(arrays)
+        
+        for group in _padding_groups([a.shape[:2] for a in arrays], self.max_pad_waste):
+            height = max(arrays[i].shape[0] for i in group)
+            width = max(arrays[i].shape[1] for i in group)
+            
+            batch = np.zeros((len(group), height, width, 3), dtype=np.uint8)
+            for row, i in enumerate(group):
+                batch[row, :arrays[i].shape[0], :arrays[i].shape[1]] = arrays[i]
+            
+            results = self.reader.readtext_batched(
+                batch,
+                detail=1,
+                paragraph=False,
+            )
+            for i, r in zip(group, results):
+                texts[i] = self._join_text(r, min_confidence)
+        
+        return texts
+    
+    def _join_text(self, results: list, min_confidence: float) -> Optional[str]:
         if not results:
             return None
         
@@ -63,15 +128,22 @@ class OCRModel:
         
         return " ".join(texts)
     
-    async def extract_structured(
+    def extract_structured(
         self,
         image: Image.Image,
         min_confidence: float = 0.3,
+        detected_objects: Optional[List[Dict[str, Any]]] = None,
+        box_scale: float = 1.0,
     ) -> list:
         """
         Extract text with position information
-        Returns list of (text, confidence, bbox) tuples
+        Returns list of {text, confidence, bounding_box} dicts
+        detected_objects: detect_objects output - reads only those regions
+        (see extract_regions), box_scale maps their boxes onto image
         """
+        if detected_objects is not None:
+            return self.extract_regions(image, detected_objects, box_scale, min_confidence)
+        
         image_np = np.array(image)
         
         results = self.reader.readtext(
@@ -80,16 +152,19 @@ class OCRModel:
             paragraph=False,
         )
         
+        return self._structure(results, min_confidence)
+    
+    def _structure(self, results: list, min_confidence: float) -> list:
         structured = []
         for bbox, text, confidence in results:
             if confidence >= min_confidence:
                 # Convert bbox to x, y, width, height
-                x_coords = [point[0] for point in bbox]
-                y_coords = [point[1] for point in bbox]
+                x_coords = [float(point[0]) for point in bbox]
+                y_coords = [float(point[1]) for point in bbox]
                 
                 structured.append({
                     "text": text.strip(),
-                    "confidence": round(confidence, 3),
+                    "confidence": round(float(confidence), 3),
                     "bounding_box": {
                         "x": min(x_coords),
                         "y": min(y_coords),
@@ -100,59 +175,176 @@ class OCRModel:
         
         return structured
     
-    def extract_potential_identifiers(
+    # ============== Region-targeted OCR ==============
+    
+    def should_skip(self, detected_objects: List[Dict[str, Any]]) -> bool:
+        """Decided by the most confident detection (e.g. a pet photo)"""
+        return bool(detected_objects) and detected_objects[0].get("category") in self.skip_categories
+    
+    def extract_regions(
         self,
-        text: str
-    ) -> dict:
+        image: Image.Image,
+        detected_objects: List[Dict[str, Any]],
+        box_scale: float = 1.0,
+        min_confidence: float = 0.3,
+    ) -> list:
         """
-        Extract potential identifiers from OCR text
-        (Serial numbers, phone numbers, IDs, etc.)
+        OCR limited to where text is likely, in extract_structured format
+        Text boxes come from CRAFT on a downscaled copy of the frame plus
+        full-resolution passes over the top detected objects (small print
+        on serials, ID cards, name tags). Recognition then runs once,
+        batched, over the merged text boxes at full resolution
+        detected_objects: boxes in original coordinates, box_scale maps
+        them onto image
         """
-        import re
+        if self.should_skip(detected_objects):
+            return []
         
-        identifiers = {}
+        image_np = np.array(image)
+        height, width = image_np.shape[:2]
+        horizontal, free = [], []
         
-        if not text:
-            return identifiers
+        # Whole frame, downscaled: large text anywhere in the photo
+        scale = min(1.0, self.overview_side / max(width, height))
+        if scale < 1.0:
+            overview = np.array(image.resize((max(1, round(width * scale)), max(1, round(height * scale)))))
+        else:
+            overview = image_np
+        self._detect_text_boxes(overview, 1 / scale, (0, 0), horizontal, free)
         
-        # Serial number patterns
-        serial_patterns = [
-            r'\b[A-Z0-9]{10,20}\b',  # Generic alphanumeric
-            r'\bS/N[\s:]*([A-Z0-9]+)\b',  # S/N prefix
-            r'\bSerial[\s:]*([A-Z0-9]+)\b',  # Serial prefix
-            r'\bIMEI[\s:]*(\d{15})\b',  # IMEI
-        ]
+        for x0, y0, x1, y1 in self._object_regions(detected_objects, box_scale, width, height):
+            self._detect_text_boxes(image_np[y0:y1, x0:x1], 1.0, (x0, y0), horizontal, free)
         
-        for pattern in serial_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            if matches:
-                identifiers["serial_number"] = matches[0]
-                break
+        if not horizontal and not free:
+            return []
         
-        # Phone number patterns
-        phone_pattern = r'\b(?:\+?1?[-.\s]?)?\(?[0-9]{3}\)?[-.\s]?[0-9]{3}[-.\s]?[0-9]{4}\b'
-        phone_matches = re.findall(phone_pattern, text)
-        if phone_matches:
-            identifiers["phone_number"] = phone_matches[0]
-        
-        # Email pattern
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        email_matches = re.findall(email_pattern, text)
-        if email_matches:
-            identifiers["email"] = email_matches[0]
-        
-        # Model number patterns
-        model_patterns = [
-            r'\bModel[\s:]*([A-Z0-9-]+)\b',
-            r'\b(iPhone\s*\d+\s*(?:Pro|Max|Plus)?)\b',
-            r'\b(Galaxy\s*[A-Z]\d+)\b',
-            r'\b(MacBook\s*(?:Pro|Air)?)\b',
+        results = self.reader.recognize(
+            image_np,
+            horizontal_list=_dedupe_boxes(horizontal),
+            free_list=free,
+            batch_size=self.batch_size,
+            detail=1,
+            paragraph=False,
+        )
+        return self._structure(results, min_confidence)
+    
+    def extract_text_regions(
+        self,
+        image: Image.Image,
+        detected_objects: List[Dict[str, Any]],
+        box_scale: float = 1.0,
+        min_confidence: float = 0.3,
+    ) -> Optional[str]:
+        """extract_text counterpart of extract_regions"""
+        structured = self.extract_regions(image, detected_objects, box_scale, min_confidence)
+        return " ".join(r["text"] for r in structured) or None
+    
+    def extract_text_regions_batch(
+        self,
+        images: List[Image.Image],
+        detections: List[List[Dict[str, Any]]],
+        box_scales: List[float],
+        min_confidence: float = 0.3,
+    ) -> List[Optional[str]]:
+        return [
+            self.extract_text_regions(image, objects, scale, min_confidence)
+            for image, objects, scale in zip(images, detections, box_scales)
         ]
-        
-        for pattern in model_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            if matches:
-                identifiers["model"] = matches[0]
+    
+    def _object_regions(
+        self,
+        detected_objects: List[Dict[str, Any]],
+        box_scale: float,
+        width: int,
+        height: int,
+        padding: float = 0.1,
+    ) -> List[Tuple[int, int, int, int]]:
+        """Padded (x0, y0, x1, y1) crops of the top objects, in image pixels"""
+        regions = []
+        for obj in detected_objects:
+            if obj.get("category") in self.skip_categories:
+                continue
+            box = obj["bounding_box"]
+            x, y = box["x"] * box_scale, box["y"] * box_scale
+            w, h = box["width"] * box_scale, box["height"] * box_scale
+            x0, y0 = max(0, int(x - w * padding)), max(0, int(y - h * padding))
+            x1, y1 = min(width, int(x + w * (1 + padding))), min(height, int(y + h * (1 + padding)))
+            # Too small to hold readable text
+            if x1 - x0 >= 32 and y1 - y0 >= 32:
+                regions.append((x0, y0, x1, y1))
+            if len(regions) == self.max_regions:
                 break
-        
-        return identifiers
+        return regions
+    
+    def _detect_text_boxes(
+        self,
+        image_np: np.ndarray,
+        scale: float,
+        offset: Tuple[int, int],
+        horizontal: list,
+        free: list,
+    ):
+        """CRAFT text detection only; boxes are mapped back to full-frame pixels"""
+        h_boxes, f_boxes = self.reader.detect(image_np)
+        dx, dy = offset
+        for x_min, x_max, y_min, y_max in h_boxes[0]:
+            horizontal.append([
+                int(x_min * scale) + dx, int(x_max * scale) + dx,
+                int(y_min * scale) + dy, int(y_max * scale) + dy,
+            ])
+        for points in f_boxes[0]:
+            free.append([[int(x * scale) + dx, int(y * scale) + dy] for x, y in points])
+    
+    def extract_potential_identifiers(
+        self,
+        text: str
+    ) -> dict:
+        """
+        Extract potential identifiers from OCR text
+        (Serial numbers, phone numbers, IDs, etc.)
+        """
+        return extract_potential_identifiers(text)
+
+
+def _padding_groups(shapes: List[Tuple[int, int]], max_waste: float) -> List[List[int]]:
+    """
+    Split (height, width) shapes into groups to pad to a common size
+    Shapes are taken in aspect ratio order; a group closes when padding
+    it would add more than max_waste of its real pixels
+    """
+    order = sorted(range(len(shapes)), key=lambda i: shapes[i][1] / max(shapes[i][0], 1))
+    groups, group = [], []
+    height = width = area = 0
+    for i in order:
+        h, w = shapes[i]
+        new_height, new_width, new_area = max(height, h), max(width, w), area + h * w
+        if group and (len(group) + 1) * new_height * new_width > (1 + max_waste) * new_area:
+            groups.append(group)
+            group, new_height, new_width, new_area = [], h, w, h * w
+        group.append(i)
+        height, width, area = new_height, new_width, new_area
+    if group:
+        groups.append(group)
+    return groups
+
+
+def _dedupe_boxes(boxes: List[List[int]], max_iou: float = 0.5) -> List[List[int]]:
+    """
+    Drop [x_min, x_max, y_min, y_max] boxes overlapping a larger kept one
+    (text inside an object is found by both the overview and the crop)
+    """
+    def area(b):
+        return max(0, b[1] - b[0]) * max(0, b[3] - b[2])
+    
+    kept = []
+    for box in sorted(boxes, key=area, reverse=True):
+        duplicate = False
+        for other in kept:
+            inter = area([max(box[0], other[0]), min(box[1], other[1]), max(box[2], other[2]), min(box[3], other[3])])
+            union = area(box) + area(other) - inter
+            if union and inter / union > max_iou:
+                duplicate = True
+                break
+        if not duplicate:
+            kept.append(box)
+    return kept
@@ -0,0 +1,110 @@
+"""
+Model registry
+Owns the heavy model instances so each one is built exactly once per process
+"""
+
+import time
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+class ModelRegistry:
+    """
+    Builds models on first request and hands out the shared instance after
+    Once frozen (end of startup), building a new model raises instead of
+    silently reloading weights inside a request
+    """
+
+    def __init__(self):
+        self._models: Dict[str, Any] = {}
+        self._build_counts: Dict[str, int] = {}
+        self._load_times: Dict[str, float] = {}
+        self._status: Dict[str, str] = {}
+        self._errors: Dict[str, str] = {}
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._frozen = False
+        self._lock = threading.Lock()
+
+    def get_or_create(self, name: str, factory: Callable[[], Any]) -> Any:
+        """
+        Return the model registered under name, building it if needed
+        Different models can build concurrently, each one only once
+        """
+        with self._lock:
+            if name in self._models:
+                return self._models[name]
+            self.check_buildable(name)
+            build_lock = self._build_locks.setdefault(name, threading.Lock())
+
+        with build_lock:
+            with self._lock:
+                if name in self._models:
+                    return self._models[name]
+                self._status[name] = "loading"
+
+            started = time.perf_counter()
+            try:
+                model = factory()
+            except Exception as e:
+                self.mark_failed(name, e)
+                raise
+
+            with self._lock:
+                self._load_times[name] = time.perf_counter() - started
+                self._models[name] = model
+                self._build_counts[name] = self._build_counts.get(name, 0) + 1
+                self._status[name] = "ready"
+            return model
+
+    def expect(self, names: Iterable[str]):
+        """Mark models that will be built (status "pending" until they start)"""
+        with self._lock:
+            for name in names:
+                self._status.setdefault(name, "pending")
+
+    def mark_failed(self, name: str, error: Exception):
+        """Record a failed load - also for setup that fails after the build"""
+        with self._lock:
+            self._status[name] = "failed"
+            self._errors[name] = str(error)
+
+    def check_buildable(self, name: str):
+        """Raise if startup is over - guards against per-request model construction"""
+        if self._frozen:
+            raise RuntimeError(
+                f"Model '{name}' built after startup - "
+                "heavy models must be built once in the lifespan hook"
+            )
+
+    def get(self, name: str) -> Any:
+        return self._models.get(name)
+
+    def freeze(self):
+        """Mark startup as complete"""
+        self._frozen = True
+
+    @property
+    def frozen(self) -> bool:
+        return self._frozen
+
+    def build_counts(self) -> Dict[str, int]:
+        return dict(self._build_counts)
+
+    def status(self, name: str) -> Optional[str]:
+        """pending, loading, ready or failed (None if never requested)"""
+        return self._status.get(name)
+
+    def error(self, name: str) -> Optional[str]:
+        return self._errors.get(name)
+
+    def load_times(self) -> Dict[str, float]:
+        """Seconds each model took to build"""
+        return dict(self._load_times)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+
+# Process-wide registry
+registry = ModelRegistry()
@@ -0,0 +1,336 @@
+"""
+Model residency manager
+Keeps the loaded models within a VRAM and RSS budget: idle models are
+offloaded from the GPU to CPU memory, and under RSS pressure swapped out
+to disk, then moved back transparently before their next inference call
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import torch
+
+HOME = "home"
+CPU = "cpu"
+DISK = "disk"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # Exists, owned by someone else
+    return True
+
+
+def _process_rss() -> Optional[int]:
+    """Current resident set size in bytes (Linux only)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _Unit:
+    """One offloadable model (or model part, e.g. BLIP inside VisionModel)"""
+
+    def __init__(
+        self,
+        name: str,
+        modules: List[torch.nn.Module],
+        device: str,
+        on_move: Optional[Callable[[str], None]],
+        swap_path: str,
+    ):
+        self.name = name
+        self.modules = modules
+        self.device = device
+        self.on_move = on_move
+        self.swap_path = swap_path
+        self.bytes = sum(t.numel() * t.element_size() for _, t in self.tensors())
+
+        self.location = HOME
+        self.moving = False
+        self.users = 0
+        self.last_used = time.monotonic()
+
+        self.evictions = 0
+        self.eviction_time = 0.0
+        self.last_eviction_ms = 0.0
+        self.reloads = 0
+        self.reload_time = 0.0
+        self.last_reload_ms = 0.0
+
+    @property
+    def on_gpu(self) -> bool:
+        return self.location == HOME and self.device != "cpu"
+
+    @property
+    def on_cpu(self) -> bool:
+        return self.location == CPU or (self.location == HOME and self.device == "cpu")
+
+    def tensors(self) -> Iterator[Tuple[str, torch.Tensor]]:
+        """Every parameter and buffer (non-persistent ones included)"""
+        for i, module in enumerate(self.modules):
+            for name, tensor in module.named_parameters():
+                yield f"{i}.{name}", tensor
+            for name, tensor in module.named_buffers():
+                yield f"{i}.{name}", tensor
+
+    def move(self, device: str):
+        for module in self.modules:
+            module.to(device)
+        if self.on_move:
+            self.on_move(device)
+
+    def swap_out(self):
+        """Write the weights to disk once, then free them"""
+        if not os.path.exists(self.swap_path):
+            os.makedirs(os.path.dirname(self.swap_path) or ".", exist_ok=True)
+            torch.save({name: t.detach().cpu() for name, t in self.tensors()}, self.swap_path)
+        for module in self.modules:
+            module.to("meta")
+        if self.on_move:
+            self.on_move("cpu")
+
+    def swap_in(self, device: str):
+        state = torch.load(self.swap_path, map_location="cpu", mmap=True)
+        for module in self.modules:
+            module.to_empty(device=device)
+        with torch.no_grad():
+            for name, tensor in self.tensors():
+                tensor.copy_(state[name])
+        if self.on_move:
+            self.on_move(device)
+
+
+class ResidencyManager:
+    """
+    Tracks last use and footprint of each registered model
+    - VRAM budget: before a model moves onto the GPU, least recently used
+      idle models are offloaded to CPU until it fits
+    - RSS budget: models held in CPU memory beyond the budget are swapped
+      out to disk (least recently used first)
+    - Idle timeout: sweep() offloads models unused for idle_seconds
+    Models in use by an inference call are never moved
+    """
+
+    def __init__(
+        self,
+        vram_budget_mb: float = None,
+        rss_budget_mb: float = None,
+        idle_seconds: float = None,
+        swap_dir: str = None,
+    ):
+        self.vram_budget = (vram_budget_mb if vram_budget_mb is not None
+                            else float(os.getenv("MODEL_VRAM_BUDGET_MB", 0))) * 1024 * 1024
+        self.rss_budget = (rss_budget_mb if rss_budget_mb is not None
+                           else float(os.getenv("MODEL_RSS_BUDGET_MB", 0))) * 1024 * 1024
+        self.idle_seconds = idle_seconds if idle_seconds is not None else float(os.getenv("MODEL_IDLE_SECONDS", 0))
+        self.swap_dir = swap_dir or os.path.join(os.getenv("CACHE_DIR", "./cache"), "offload")
+        self._clear_stale_swaps()
+
+        self._units: Dict[str, _Unit] = {}
+        self._lock = threading.Lock()
+        # Moves are serialized - two concurrent reloads would both count
+        # against the budget before either finished
+        self._move_lock = threading.Lock()
+
+    def register(
+        self,
+        name: str,
+        modules: List[torch.nn.Module],
+        device: str,
+        on_move: Optional[Callable[[str], None]] = None,
+    ):
+        """
+        Manage modules under name (usually the inference pool name)
+        on_move(device) lets the owner move any extra tensors it keeps
+        """
+        # Per process: swapped weights are only valid for the modules this
+        # process loaded (workers share CACHE_DIR, a restart may load another model)
+        swap_path = os.path.join(self.swap_dir, f"{name}-{os.getpid()}.pt")
+        if os.path.exists(swap_path):
+            os.remove(swap_path)  # Left by an earlier process with the same pid
+        unit = _Unit(name, modules, device, on_move, swap_path)
+        with self._lock:
+            self._units[name] = unit
+
+    def _clear_stale_swaps(self):
+        """Delete swap files of processes that are gone (or predate per-process names)"""
+        if not os.path.isdir(self.swap_dir):
+            return
+        for filename in os.listdir(self.swap_dir):
+            stem, ext = os.path.splitext(filename)
+            pid = stem.rpartition("-")[2]
+            if ext != ".pt" or (pid.isdigit() and _pid_alive(int(pid))):
+                continue
+            try:
+                os.remove(os.path.join(self.swap_dir, filename))
+            except OSError:
+                pass
+
+    def close(self):
+        """Delete this process's swap files"""
+        for unit in self._units.values():
+            if os.path.exists(unit.swap_path):
+                os.remove(unit.swap_path)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._units
+
+    @contextmanager
+    def use(self, name: str):
+        """Hold name resident on its device for the duration of a call"""
+        unit = self._units.get(name)
+        if unit is None:
+            yield
+            return
+
+        with self._lock:
+            unit.users += 1
+            resident = unit.location == HOME and not unit.moving
+        try:
+            if not resident:
+                self._restore(unit)
+            yield
+        finally:
+            with self._lock:
+                unit.users -= 1
+                unit.last_used = time.monotonic()
+
+    # ============== Moves ==============
+
+    def _restore(self, unit: _Unit):
+        with self._move_lock:
+            if unit.location == HOME:
+                return
+            if unit.device != "cpu":
+                self._make_room_on_gpu(unit.bytes, keep=unit)
+
+            started = time.perf_counter()
+            unit.moving = True
+            try:
+                if unit.location == DISK:
+                    unit.swap_in(unit.device)
+                else:
+                    unit.move(unit.device)
+                unit.location = HOME
+            finally:
+                unit.moving = False
+            elapsed = time.perf_counter() - started
+
+            unit.reloads += 1
+            unit.reload_time += elapsed
+            unit.last_reload_ms = elapsed * 1000
+            print(f"♻️ Reloaded {unit.name} ({elapsed * 1000:.0f} ms)")
+            self._enforce_rss(keep=unit)
+
+    def _evict(self, unit: _Unit, target: str) -> bool:
+        """Move an idle unit to CPU or disk, returns False if it is busy"""
+        with self._lock:
+            if unit.users or unit.moving:
+                return False
+            unit.moving = True
+
+        started = time.perf_counter()
+        try:
+            if target == DISK:
+                unit.swap_out()
+            else:
+                unit.move("cpu")
+            unit.location = target
+        finally:
+            unit.moving = False
+        if unit.device != "cpu" and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        elapsed = time.perf_counter() - started
+
+        unit.evictions += 1
+        unit.eviction_time += elapsed
+        unit.last_eviction_ms = elapsed * 1000
+        print(f"💤 Offloaded {unit.name} to {target} ({elapsed * 1000:.0f} ms)")
+        return True
+
+    def _idle_first(self, predicate: Callable[[_Unit], bool], keep: Optional[_Unit]) -> List[_Unit]:
+        units = [u for u in self._units.values() if u is not keep and predicate(u)]
+        return sorted(units, key=lambda u: u.last_used)
+
+    def _make_room_on_gpu(self, needed: int, keep: Optional[_Unit]):
+        if not self.vram_budget:
+            return
+        for unit in self._idle_first(lambda u: u.on_gpu, keep):
+            if self.gpu_bytes() + needed <= self.vram_budget:
+                return
+            self._evict(unit, CPU)
+
+    def _enforce_rss(self, keep: Optional[_Unit] = None):
+        if not self.rss_budget:
+            return
+        for unit in self._idle_first(lambda u: u.on_cpu, keep):
+            if self.cpu_bytes() <= self.rss_budget:
+                return
+            self._evict(unit, DISK)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.vram_budget or self.rss_budget or self.idle_seconds)
+
+    def sweep(self):
+        """
+        Offload models idle for longer than idle_seconds, then bring
+        everything back within budget (models all start resident)
+        """
+        now = time.monotonic()
+        with self._move_lock:
+            if self.idle_seconds:
+                for unit in self._idle_first(lambda u: u.location == HOME, None):
+                    if now - unit.last_used < self.idle_seconds:
+                        break
+                    self._evict(unit, CPU if unit.device != "cpu" else DISK)
+            self._make_room_on_gpu(0, keep=None)
+            self._enforce_rss()
+
+    # ============== Stats ==============
+
+    def gpu_bytes(self) -> int:
+        return sum(u.bytes for u in self._units.values() if u.on_gpu)
+
+    def cpu_bytes(self) -> int:
+        return sum(u.bytes for u in self._units.values() if u.on_cpu)
+
+    def stats(self) -> Dict[str, Any]:
+        def mb(n: float) -> float:
+            return round(n / 1024 / 1024, 1)
+
+        now = time.monotonic()
+        rss = _process_rss()
+        return {
+            "vram_budget_mb": mb(self.vram_budget) or None,
+            "rss_budget_mb": mb(self.rss_budget) or None,
+            "idle_seconds": self.idle_seconds or None,
+            "gpu_mb": mb(self.gpu_bytes()),
+            "cpu_mb": mb(self.cpu_bytes()),
+            "process_rss_mb": mb(rss) if rss is not None else None,
+            "models": {
+                name: {
+                    "location": unit.device if unit.location == HOME else unit.location,
+                    "footprint_mb": mb(unit.bytes),
+                    "idle_s": round(now - unit.last_used, 1),
+                    "in_use": unit.users,
+                    "evictions": unit.evictions,
+                    "avg_eviction_ms": round(unit.eviction_time / unit.evictions * 1000, 1) if unit.evictions else 0.0,
+                    "last_eviction_ms": round(unit.last_eviction_ms, 1),
+                    "reloads": unit.reloads,
+                    "avg_reload_ms": round(unit.reload_time / unit.reloads * 1000, 1) if unit.reloads else 0.0,
+                    "last_reload_ms": round(unit.last_reload_ms, 1),
+                }
+                for name, unit in self._units.items()
+            },
+        }
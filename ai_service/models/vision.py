@@ -4,8 +4,9 @@ Uses DETR (Detection Transformer) for object detection
 """
 
 import os
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Union
 from PIL import Image
+import numpy as np
 import torch
 from transformers import (
     DetrImageProcessor,
@@ -14,6 +15,35 @@ from transformers import (
     BlipForConditionalGeneration,
 )
 
+from models.backends import resolve_backend, quantize_int8, OnnxDetectionModel
+from models.registry import registry
+from utils.colors import dominant_colors
+
+# quality: beam search (num_beams=4), fast: greedy, cut off at
+# CAPTION_MAX_LATENCY_MS if set
+CAPTION_MODES = ("quality", "fast")
+
+
+class PreparedImages:
+    """
+    Images converted to RGB uint8 HWC arrays once, shared by the DETR and
+    BLIP passes (and color extraction) over the same batch; each model's
+    own processor takes it from there
+    """
+    
+    def __init__(self, images: List[Image.Image]):
+        self.arrays = [np.array(image if image.mode == "RGB" else image.convert("RGB")) for image in images]
+        self.sizes = [image.size for image in images]
+    
+    def __len__(self) -> int:
+        return len(self.arrays)
+    
+    def subset(self, indices: List[int]) -> "PreparedImages":
+        subset = PreparedImages([])
+        subset.arrays = [self.arrays[i] for i in indices]
+        subset.sizes = [self.sizes[i] for i in indices]
+        return subset
+
 
 class VisionModel:
     """
@@ -22,29 +52,50 @@ class VisionModel:
     """
     
     def __init__(self, device: str = "cuda"):
+        registry.check_buildable("vision")
+        
         self.device = device
         cache_dir = os.getenv("MODEL_CACHE_DIR", "./models")
         
+        # Checked before any weights load - a typo must not fall back silently
+        self.caption_mode = os.getenv("CAPTION_MODE", "quality").lower()
+        if self.caption_mode not in CAPTION_MODES:
+            raise ValueError(f"CAPTION_MODE must be one of {', '.join(CAPTION_MODES)}")
+        
         # Object detection model
         print("📥 Loading object detection model...")
         detection_model = os.getenv("VISION_MODEL", "facebook/detr-resnet-50")
+        self.detection_model_name = detection_model
+        
+        self.detection_backend = resolve_backend("VISION", device)
+        self.detection_model_id = (
+            detection_model if self.detection_backend == "torch"
+            else f"{detection_model}:{self.detection_backend}"
+        )
         
         self.detection_processor = DetrImageProcessor.from_pretrained(
             detection_model,
             cache_dir=cache_dir,
         )
-        self.detection_model = DetrForObjectDetection.from_pretrained(
-            detection_model,
-            cache_dir=cache_dir,
-        ).to(device)
-        self.detection_model.eval()
+        if self.detection_backend == "onnx":
+            self.detection_model = OnnxDetectionModel(detection_model)
+        else:
+            self.detection_model = DetrForObjectDetection.from_pretrained(
+                detection_model,
+                cache_dir=cache_dir,
+            ).to(device)
+            self.detection_model.eval()
+            if self.detection_backend == "int8":
+                self.detection_model = quantize_int8(self.detection_model)
         
         # Caption model (optional - may fail on slow networks)
         print("📥 Loading captioning model...")
         caption_model = "Salesforce/blip-image-captioning-base"
+        self.caption_model_name = caption_model
         
         self.caption_processor = None
         self.caption_model = None
+        self.caption_max_latency_ms = float(os.getenv("CAPTION_MAX_LATENCY_MS", 0))
         
         try:
             self.caption_processor = BlipProcessor.from_pretrained(
@@ -122,31 +173,96 @@ class VisionModel:
         
         print("✅ Vision models loaded!")
     
-    async def detect_objects(
+    def residency_units(self) -> Dict[str, Tuple[List[Any], str, None]]:
+        """
+        Modules the residency manager may offload: name -> (modules, device, on_move)
+        DETR and BLIP are separate units - captioning traffic is much rarer
+        """
+        units = {}
+        if self.detection_backend == "torch":
+            units["vision"] = ([self.detection_model], self.device, None)
+        if self.caption_model is not None:
+            units["caption"] = ([self.caption_model], self.device, None)
+        return units
+    
+    def detect_objects(
         self,
         image: Image.Image,
         threshold: float = 0.7,
+        target_size: Optional[Tuple[int, int]] = None,
+        colors: bool = False,
     ) -> List[Dict[str, Any]]:
         """
         Detect objects in image
         Returns list of detected objects with labels and confidence
+        target_size: (width, height) to report boxes in, defaults to image.size
+        colors: add each object's dominant colors (see extract_colors)
         """
+        return self.detect_objects_batch(
+            [image],
+            threshold=threshold,
+            target_sizes=[target_size] if target_size else None,
+            colors=colors,
+        )[0]
+    
+    def prepare_images(self, images: List[Image.Image]) -> PreparedImages:
+        """RGB arrays shared by detect_objects_batch and generate_captions"""
+        return PreparedImages(images)
+    
+    def detect_objects_batch(
+        self,
+        images: Union[List[Image.Image], PreparedImages],
+        threshold: float = 0.7,
+        target_sizes: Optional[List[Tuple[int, int]]] = None,
+        colors: bool = False,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Detect objects in several images with one padded forward pass
+        Returns one detection list per image, in input order
+        target_sizes: per-image (width, height) to report boxes in, so
+        downscaled inputs still yield boxes in original image coordinates
+        colors: add "colors" (dominant colors inside the box) to each object
+        """
+        if not isinstance(images, PreparedImages):
+            images = self.prepare_images(images)
+        if not len(images):
+            return []
+        
         with torch.no_grad():
+            # The processor pads the batch and returns a pixel mask
             inputs = self.detection_processor(
-                images=image,
+                images=images.arrays,
                 return_tensors="pt"
             ).to(self.device)
             
             outputs = self.detection_model(**inputs)
             
-            # Get predictions
-            target_sizes = torch.tensor([image.size[::-1]]).to(self.device)
+            # Boxes are rescaled to each image's own (or requested) size
+            sizes = target_sizes or images.sizes
             results = self.detection_processor.post_process_object_detection(
                 outputs,
-                target_sizes=target_sizes,
+                target_sizes=torch.tensor([[height, width] for width, height in sizes]).to(self.device),
                 threshold=threshold,
-            )[0]
+            )
         
+        detections = [self._format_detections(result) for result in results]
+        if colors:
+            for array, size, objects in zip(images.arrays, sizes, detections):
+                self._add_object_colors(array, size, objects)
+        return detections
+    
+    def _add_object_colors(self, array: np.ndarray, size: Tuple[int, int], objects: List[Dict[str, Any]]):
+        """Boxes are in size (width, height) coordinates, array may be downscaled"""
+        scale_x = array.shape[1] / size[0]
+        scale_y = array.shape[0] / size[1]
+        for obj in objects:
+            box = obj["bounding_box"]
+            obj["colors"] = dominant_colors(
+                array,
+                (box["x"] * scale_x, box["y"] * scale_y, box["width"] * scale_x, box["height"] * scale_y),
+            )
+    
+    def _format_detections(self, results: Dict[str, Any]) -> List[Dict[str, Any]]:
         detected = []
         for score, label, box in zip(
             results["scores"],
@@ -172,36 +288,75 @@ class VisionModel:
         
         return detected[:10]  # Return top 10
     
-    async def generate_caption(
+    def generate_caption(
         self,
         image: Image.Image,
         max_length: int = 50,
+        mode: Optional[str] = None,
     ) -> str:
         """
         Generate descriptive caption for image
         """
+        return self.generate_captions([image], max_length=max_length, mode=mode)[0]
+    
+    def generate_captions(
+        self,
+        images: Union[List[Image.Image], PreparedImages],
+        max_length: int = 50,
+        mode: Optional[str] = None,
+        max_latency_ms: Optional[float] = None,
+    ) -> List[str]:
+        """
+        Caption several images with one batched generate()
+        mode: "quality" (beam search) or "fast" (greedy); defaults to CAPTION_MODE
+        max_latency_ms: fast mode stops decoding after this long (default
+        CAPTION_MAX_LATENCY_MS), returning the captions so far
+        """
+        if not isinstance(images, PreparedImages):
+            images = self.prepare_images(images)
+        if not len(images):
+            return []
+        
         # Check if captioning model is available
         if self.caption_model is None or self.caption_processor is None:
-            return "Image caption not available (model not loaded)"
+            return ["Image caption not available (model not loaded)"] * len(images)
+        
+        mode = mode or self.caption_mode
+        if mode not in CAPTION_MODES:
+            raise ValueError(f"Caption mode must be one of {', '.join(CAPTION_MODES)}")
+        
+        if mode == "fast":
+            budget = max_latency_ms if max_latency_ms is not None else self.caption_max_latency_ms
+            decoding = {"num_beams": 1, "do_sample": False}
+            if budget:
+                decoding["max_time"] = budget / 1000
+        else:
+            decoding = {"num_beams": 4}
         
         with torch.no_grad():
-            inputs = self.caption_processor(
-                images=image,
-                return_tensors="pt"
-            ).to(self.device)
-            
             output = self.caption_model.generate(
-                **inputs,
+                pixel_values=self._caption_pixels(images),
                 max_length=max_length,
-                num_beams=4,
+                **decoding,
             )
             
-            caption = self.caption_processor.decode(
-                output[0],
+            captions = self.caption_processor.batch_decode(
+                output,
                 skip_special_tokens=True
             )
         
-        return caption
+        return [caption.strip() for caption in captions]
+    
+    def _caption_pixels(self, images: PreparedImages) -> torch.Tensor:
+        """
+        BLIP's own image processor on the shared arrays - resampling and
+        normalization stay exactly what the model was trained with
+        """
+        pixels = self.caption_processor.image_processor(
+            images=images.arrays,
+            return_tensors="pt",
+        )["pixel_values"]
+        return pixels.to(self.device, dtype=self.caption_model.dtype)
     
     def suggest_category(
         self,
@@ -230,52 +385,14 @@ class VisionModel:
         self,
         image: Image.Image,
         n_colors: int = 3,
-    ) -> List[str]:
+        bounding_box: Optional[Dict[str, float]] = None,
+    ) -> List[Dict[str, Any]]:
         """
-        Extract dominant colors from image
-        Simple implementation using color quantization
+        Extract dominant colors from image, or from inside bounding_box
+        Returns [{"name", "share"}] most common first, share being the
+        fraction of the object's pixels
         """
-        # Resize for speed
-        small_image = image.copy()
-        small_image.thumbnail((100, 100))
-        
-        # Convert to palette
-        palette_image = small_image.quantize(colors=n_colors)
-        
-        # Get palette
-        palette = palette_image.getpalette()[:n_colors * 3]
-        
-        colors = []
-        for i in range(0, len(palette), 3):
-            r, g, b = palette[i:i+3]
-            color_name = self._rgb_to_color_name(r, g, b)
-            if color_name not in colors:
-                colors.append(color_name)
-        
-        return colors
-    
-    def _rgb_to_color_name(self, r: int, g: int, b: int) -> str:
-        """Convert RGB to basic color name"""
-        # Simple heuristic for common colors
-        if r > 200 and g > 200 and b > 200:
-            return "white"
-        if r < 50 and g < 50 and b < 50:
-            return "black"
-        if r > 150 and g < 100 and b < 100:
-            return "red"
-        if r < 100 and g > 150 and b < 100:
-            return "green"
-        if r < 100 and g < 100 and b > 150:
-            return "blue"
-        if r > 150 and g > 150 and b < 100:
-            return "yellow"
-        if r > 150 and g < 100 and b > 150:
-            return "purple"
-        if r > 150 and g > 100 and b < 50:
-            return "orange"
-        if r > 100 and g > 80 and b > 60 and r < 180:
-            return "brown"
-        if abs(r - g) < 30 and abs(g - b) < 30:
-            return "gray"
-        
-        return "multicolor"
+        box = None
+        if bounding_box:
+            box = (bounding_box["x"], bounding_box["y"], bounding_box["width"], bounding_box["height"])
+        return dominant_colors(np.asarray(image.convert("RGB")), box, max_colors=n_colors)
@@ -0,0 +1,100 @@
+"""
+EmbeddingBatcher: size and timeout flushes, length buckets, failures
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from utils.batcher import EmbeddingBatcher
+
+
+def make_batcher(batches, fail=False, **kwargs):
+    def encode_batch(texts):
+        batches.append(list(texts))
+        if fail:
+            raise RuntimeError("model failed")
+        return [f"emb:{t}" for t in texts]
+
+    async def run(fn, *args):
+        return fn(*args)
+
+    return EmbeddingBatcher(encode_batch, run, **kwargs)
+
+
+def test_full_bucket_flushes_without_waiting():
+    async def main():
+        batches = []
+        batcher = make_batcher(batches, max_batch_size=4, max_wait_ms=10_000, buckets=[64])
+        started = time.perf_counter()
+        results = await asyncio.gather(*[batcher.submit(f"text {i}") for i in range(4)])
+        return batches, results, time.perf_counter() - started, batcher.stats()
+
+    batches, results, elapsed, stats = asyncio.run(main())
+    assert batches == [["text 0", "text 1", "text 2", "text 3"]]
+    assert results == [f"emb:text {i}" for i in range(4)]
+    assert elapsed < 1
+    assert stats["fill_rate"] == 1.0
+
+
+def test_partial_bucket_flushes_after_max_wait():
+    async def main():
+        batches = []
+        batcher = make_batcher(batches, max_batch_size=32, max_wait_ms=50, buckets=[64])
+        first = asyncio.ensure_future(batcher.submit("text a"))
+        await asyncio.sleep(0.01)
+        assert batches == []
+        second = asyncio.ensure_future(batcher.submit("text b"))
+        await asyncio.sleep(0.1)
+        # One timer per bucket, started by its first text
+        assert batches == [["text a", "text b"]]
+        return await asyncio.gather(first, second), batcher.stats()
+
+    results, stats = asyncio.run(main())
+    assert results == ["emb:text a", "emb:text b"]
+    assert stats["batches"] == 1 and stats["avg_batch_size"] == 2
+
+
+def test_texts_are_bucketed_by_length():
+    async def main():
+        batches = []
+        batcher = make_batcher(batches, max_batch_size=2, max_wait_ms=20, buckets=[10, 100])
+        texts = ["short", "x" * 50, "tiny", "y" * 500]
+        return batches, await asyncio.gather(*[batcher.submit(t) for t in texts])
+
+    batches, results = asyncio.run(main())
+    assert ["short", "tiny"] in batches
+    assert ["x" * 50] in batches and ["y" * 500] in batches
+    assert len(batches) == 3
+    assert results == ["emb:short", "emb:" + "x" * 50, "emb:tiny", "emb:" + "y" * 500]
+
+
+def test_batch_failure_reaches_every_caller():
+    async def main():
+        batcher = make_batcher([], fail=True, max_batch_size=2, max_wait_ms=10, buckets=[64])
+        return await asyncio.gather(batcher.submit("a"), batcher.submit("b"), return_exceptions=True)
+
+    for result in asyncio.run(main()):
+        assert isinstance(result, RuntimeError)
+
+
+def test_cancelled_caller_does_not_break_the_batch():
+    async def main():
+        batches = []
+        batcher = make_batcher(batches, max_batch_size=32, max_wait_ms=20, buckets=[64])
+        gone = asyncio.ensure_future(batcher.submit("gone"))
+        kept = asyncio.ensure_future(batcher.submit("kept"))
+        await asyncio.sleep(0)
+        gone.cancel()
+        return batches, await kept
+
+    batches, result = asyncio.run(main())
+    assert result == "emb:kept"
+    assert batches == [["gone", "kept"]]
+
+
+@pytest.mark.parametrize("length,bucket", [(0, 0), (64, 0), (65, 1), (256, 1), (257, 2)])
+def test_bucket_boundaries_are_inclusive(length, bucket):
+    batcher = make_batcher([], buckets=[256, 64])
+    assert batcher._bucket("x" * length) == bucket
@@ -0,0 +1,60 @@
+"""
+ResultCache disk tier: bounded, written off the caller's thread, persistent
+"""
+
+import asyncio
+import threading
+
+from utils.cache import ResultCache
+
+
+def test_disk_tier_is_bounded_and_survives_restart(tmp_path):
+    path = str(tmp_path / "results.sqlite")
+    cache = ResultCache(max_bytes=10_000, disk_path=path, disk_max_bytes=100_000, flush_seconds=0.05)
+    for i in range(300):
+        cache.set(f"k{i}", b"x" * 1000)
+    # Queued for the writer but already readable
+    assert cache.get("k0") is not None
+    cache.close()
+
+    cache = ResultCache(max_bytes=10_000, disk_path=path, disk_max_bytes=100_000)
+    stats = cache.stats()
+    assert 0 < stats["disk_bytes"] <= 100_000
+    # Oldest writes were evicted, the newest survived the restart
+    assert cache.get("k0") is None
+    assert cache.get("k299") == b"x" * 1000
+    cache.close()
+
+
+def test_set_many_matches_set(tmp_path):
+    cache = ResultCache(max_bytes=1_000_000)
+    cache.set_many([("a", 1), ("b", [2, 3])])
+    assert cache.get("a") == 1 and cache.get("b") == [2, 3]
+    assert cache.stats()["disk_bytes"] == 0
+
+
+def test_aget_reads_the_disk_tier_off_the_loop(tmp_path, monkeypatch):
+    path = str(tmp_path / "results.sqlite")
+    cache = ResultCache(max_bytes=10_000, disk_path=path, flush_seconds=0.05)
+    cache.set_many([("a", 1), ("b", 2)])
+    cache.close()
+
+    cache = ResultCache(max_bytes=10_000, disk_path=path)
+    cache.set("c", 3)
+    threads = []
+    get_disk = cache._get_disk
+    monkeypatch.setattr(cache, "_get_disk", lambda keys: threads.append(threading.get_ident()) or get_disk(keys))
+
+    async def lookup():
+        return threading.get_ident(), await cache.aget_many(["a", "c", "missing", "b"])
+
+    loop_thread, results = asyncio.run(lookup())
+    assert results == [1, 3, None, 2]
+    assert len(threads) == 1 and threads[0] != loop_thread
+    stats = cache.stats()
+    assert (stats["hits"], stats["disk_hits"], stats["misses"]) == (1, 2, 1)
+
+    # Disk hits were promoted to memory
+    assert asyncio.run(cache.aget("a")) == 1
+    assert len(threads) == 1
+    cache.close()
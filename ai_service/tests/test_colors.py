@@ -0,0 +1,68 @@
+"""
+Dominant colors: the LAB lookup table against a direct nearest-reference search
+"""
+
+import numpy as np
+import pytest
+
+from utils.colors import COLOR_LUT, COLOR_NAMES, COLOR_REFERENCES, LUT_BITS, dominant_colors, srgb_to_lab
+
+
+def nearest_reference(rgb):
+    """Name of the closest reference color in LAB, without the table"""
+    lab = srgb_to_lab(np.array(rgb))
+    best = min(
+        ((name, ref) for name, refs in COLOR_REFERENCES.items() for ref in refs),
+        key=lambda item: ((srgb_to_lab(np.array(item[1])) - lab) ** 2).sum(),
+    )
+    return best[0]
+
+
+def solid(rgb, size=(40, 40)):
+    return np.full(size + (3,), rgb, dtype=np.uint8)
+
+
+def test_lut_covers_every_bin():
+    assert COLOR_LUT.shape == (1 << (3 * LUT_BITS),)
+    assert COLOR_LUT.max() < len(COLOR_NAMES)
+
+
+def test_lut_matches_direct_lookup_at_bin_centers():
+    rng = np.random.default_rng(0)
+    step = 1 << (8 - LUT_BITS)
+    for r, g, b in rng.integers(0, 1 << LUT_BITS, size=(200, 3)):
+        center = [int(c) * step + step // 2 for c in (r, g, b)]
+        index = (int(r) << (2 * LUT_BITS)) | (int(g) << LUT_BITS) | int(b)
+        assert COLOR_NAMES[COLOR_LUT[index]] == nearest_reference(center)
+
+
+@pytest.mark.parametrize("name", ["black", "white", "red", "navy", "green", "yellow", "orange", "purple"])
+def test_reference_colors_name_themselves(name):
+    rgb = COLOR_REFERENCES[name][0]
+    assert dominant_colors(solid(rgb))[0] == {"name": name, "share": 1.0}
+
+
+def test_srgb_to_lab_known_values():
+    np.testing.assert_allclose(srgb_to_lab([255, 255, 255]), [100, 0, 0], atol=0.1)
+    np.testing.assert_allclose(srgb_to_lab([0, 0, 0]), [0, 0, 0], atol=0.1)
+    np.testing.assert_allclose(srgb_to_lab([255, 0, 0]), [53.24, 80.09, 67.20], atol=0.1)
+
+
+def test_shares_min_share_and_box_inset():
+    pixels = solid((0, 0, 0), (100, 100))
+    pixels[:, 70:] = (255, 255, 255)
+    pixels[:2, :2] = (200, 30, 30)
+
+    colors = dominant_colors(pixels, max_pixels=100 * 100)
+    assert [c["name"] for c in colors] == ["black", "white"]
+    assert colors[0]["share"] == pytest.approx(0.7, abs=0.01)
+
+    # The box's edges are trimmed: a white frame around a red object doesn't count
+    framed = solid((255, 255, 255), (100, 100))
+    framed[25:75, 25:75] = (200, 30, 30)
+    assert dominant_colors(framed, box=(20, 20, 60, 60))[0]["name"] == "red"
+    assert dominant_colors(framed, box=(20, 20, 60, 60), inset=0)[1]["name"] == "white"
+
+
+def test_empty_crop():
+    assert dominant_colors(np.zeros((0, 0, 3), dtype=np.uint8)) == []
@@ -0,0 +1,156 @@
+"""
+Embedding codecs (float16/int8 round trips stay within their error
+bounds), long-text chunking and similarity search
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("sentence_transformers")
+
+from models.embedder import (  # noqa: E402
+    EMBEDDING_ENCODINGS,
+    EmbeddingModel,
+    _window_starts,
+    dequantize_embeddings,
+    encoded_size,
+    quantize_embeddings,
+)
+
+DIMENSION = 384
+
+
+def unit_vectors(n: int, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).normal(size=(n, DIMENSION)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def round_trip(vectors: np.ndarray, encoding: str) -> np.ndarray:
+    blobs = quantize_embeddings(vectors, encoding)
+    assert blobs.shape == (len(vectors), encoded_size(encoding, DIMENSION))
+    return dequantize_embeddings(blobs.tobytes(), encoding, DIMENSION)
+
+
+def test_float32_is_lossless():
+    vectors = unit_vectors(20)
+    np.testing.assert_array_equal(round_trip(vectors, "float32"), vectors)
+
+
+def test_float16_error_bound():
+    vectors = unit_vectors(200)
+    # Half precision keeps 11 significant bits
+    np.testing.assert_allclose(round_trip(vectors, "float16"), vectors, rtol=2 ** -11, atol=2 ** -24)
+
+
+def test_int8_error_bound():
+    vectors = unit_vectors(200)
+    decoded = round_trip(vectors, "int8")
+    # Rounding to the per-vector step costs at most half a step per component
+    step = np.abs(vectors).max(axis=1, keepdims=True) / 127
+    assert np.all(np.abs(decoded - vectors) <= step / 2 + 1e-7)
+
+    cosine = (decoded * vectors).sum(axis=1) / np.linalg.norm(decoded, axis=1)
+    assert cosine.min() > 0.999
+
+
+def test_int8_extremes_and_zero_vector():
+    vectors = np.zeros((2, DIMENSION), dtype=np.float32)
+    vectors[1, 0], vectors[1, 1] = 0.5, -0.5
+    decoded = round_trip(vectors, "int8")
+
+    np.testing.assert_array_equal(decoded[0], 0)
+    assert decoded[1, 0] == pytest.approx(0.5) and decoded[1, 1] == pytest.approx(-0.5)
+
+
+@pytest.mark.parametrize("encoding", EMBEDDING_ENCODINGS)
+def test_concatenated_blobs_decode_per_vector(encoding):
+    vectors = unit_vectors(3)
+    blobs = [row.tobytes() for row in quantize_embeddings(vectors, encoding)]
+    joined = dequantize_embeddings(b"".join(blobs), encoding, DIMENSION)
+    single = dequantize_embeddings(blobs[1], encoding, DIMENSION)
+    np.testing.assert_array_equal(joined[1], single[0])
+
+
+def test_unknown_encoding_is_rejected():
+    with pytest.raises(ValueError):
+        quantize_embeddings(unit_vectors(1), "int4")
+
+
+@pytest.mark.parametrize("n_tokens,expected", [
+    (100, [0]),
+    (254, [0]),
+    (255, [0, 1]),
+    (600, [0, 222, 346]),
+])
+def test_window_starts_cover_the_text(n_tokens, expected):
+    starts = _window_starts(n_tokens, window=254, overlap=32, max_chunks=8)
+    assert starts == expected
+    assert starts[-1] + 254 >= n_tokens
+
+
+def test_window_starts_keep_head_and_tail():
+    starts = _window_starts(10_000, window=254, overlap=32, max_chunks=4)
+    assert starts == [0, 222, 444, 10_000 - 254]
+
+
+class FakeEncoder:
+    """Embeds a string as its (a, b) letter counts"""
+
+    def encode(self, rows, **kwargs):
+        return np.array([[row.count("a"), row.count("b")] for row in rows], dtype=np.float32)
+
+
+@pytest.mark.parametrize("mode,expected", [("mean", [4, 5]), ("max", [3, 4])])
+def test_chunks_are_pooled_and_renormalized(mode, expected):
+    model = EmbeddingModel.__new__(EmbeddingModel)
+    model.model = FakeEncoder()
+    model.long_text = mode
+
+    single, pooled = model.encode_pieces([["aaab"], ["aaa", "bbbb", "ab"]])
+    np.testing.assert_allclose(single, [3, 1])
+    np.testing.assert_allclose(pooled, np.array(expected) / np.linalg.norm(expected), rtol=1e-6)
+
+
+def similarity_model(cache_size: int = 100) -> EmbeddingModel:
+    model = EmbeddingModel.__new__(EmbeddingModel)
+    model.dimension = 2
+    model.max_chars = 10_000
+    model._cache_size = cache_size
+    model._cache_lock = threading.Lock()
+    model._embedding_cache = OrderedDict()
+    model.encoded = []
+
+    def encode_batch(texts):
+        model.encoded.append(list(texts))
+        vectors = FakeEncoder().encode(texts)
+        return list(vectors / np.linalg.norm(vectors, axis=1, keepdims=True))
+
+    model.encode_batch = encode_batch
+    return model
+
+
+def test_find_similar_ranks_by_cosine():
+    model = similarity_model()
+    candidates = ["bbbb", "aaab", "ab", "aaaa", "abbb"]
+    ranked = model.find_similar("aa", candidates, top_k=3)
+
+    assert [(index, text) for index, _, text in ranked] == [(3, "aaaa"), (1, "aaab"), (2, "ab")]
+    assert ranked[0][1] == pytest.approx(1.0)
+    assert len(model.find_similar("aa", candidates, top_k=50)) == 5
+    assert model.find_similar("aa", []) == []
+
+
+def test_similarity_matrix_reuses_cached_embeddings():
+    model = similarity_model()
+    matrix = model.similarity_matrix(["aa", "bb"], ["ab", "aaaa", "bb"])
+
+    assert matrix.shape == (2, 3)
+    np.testing.assert_allclose(matrix[:, 1], [1.0, 0.0], atol=1e-6)
+    # "bb" was encoded once, as a query; the second lookup hit the cache
+    assert model.encoded == [["aa", "bb"], ["ab", "aaaa"]]
+    assert model.similarity("aa", "  aa ") == pytest.approx(1.0)
+    assert len(model.encoded) == 2
@@ -0,0 +1,122 @@
+"""
+ModelExecutor / InferencePool: queue bounds, saturation and counters
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from utils.executor import ExecutorSaturated, InferencePool, ModelExecutor
+
+
+def test_runs_off_the_event_loop():
+    async def main():
+        executor = ModelExecutor("embedding")
+        loop_thread = threading.get_ident()
+        worker_thread = await executor.run(threading.get_ident)
+        executor.shutdown()
+        return loop_thread, worker_thread
+
+    loop_thread, worker_thread = asyncio.run(main())
+    assert loop_thread != worker_thread
+
+
+def test_full_queue_raises_executor_saturated():
+    release = threading.Event()
+
+    async def main():
+        executor = ModelExecutor("vision", max_workers=1, max_queue=2, retry_after=7)
+        # One call running, two queued behind it
+        calls = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(ExecutorSaturated) as info:
+            await executor.run(release.wait)
+        stats = executor.stats()
+
+        release.set()
+        await asyncio.gather(*calls)
+        executor.shutdown()
+        return info.value, stats, executor.stats()
+
+    error, busy, done = asyncio.run(main())
+    assert (error.model, error.retry_after) == ("vision", 7)
+    assert (busy["running"], busy["queued"], busy["rejected"]) == (1, 2, 1)
+    assert (done["queued"], done["running"], done["completed"]) == (0, 0, 3)
+
+
+def test_cancelled_queued_call_frees_its_slot():
+    release = threading.Event()
+
+    async def main():
+        executor = ModelExecutor("ocr", max_workers=1, max_queue=1)
+        running = asyncio.ensure_future(executor.run(release.wait))
+        queued = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        queued.cancel()
+        await asyncio.sleep(0)
+        # The slot is free again
+        again = asyncio.ensure_future(executor.run(lambda: "ran"))
+        await asyncio.sleep(0)
+        release.set()
+        await running
+        result = await again
+        executor.shutdown()
+        return result, executor.stats()
+
+    result, stats = asyncio.run(main())
+    assert result == "ran"
+    assert stats["rejected"] == 0 and stats["queued"] == 0
+
+
+def test_failures_are_counted_and_raised():
+    async def main():
+        executor = ModelExecutor("extractor")
+        with pytest.raises(ZeroDivisionError):
+            await executor.run(lambda: 1 / 0)
+        executor.shutdown()
+        return executor.stats()
+
+    stats = asyncio.run(main())
+    assert (stats["failed"], stats["completed"]) == (1, 0)
+
+
+def test_pool_reads_sizes_from_env(monkeypatch):
+    monkeypatch.setenv("INFERENCE_CAPTION_WORKERS", "3")
+    monkeypatch.setenv("INFERENCE_CAPTION_QUEUE", "5")
+    pool = InferencePool()
+    pool.register("caption", workers=1, queue=32)
+    pool.register("ocr", workers=2, queue=8)
+
+    stats = pool.stats()
+    assert (stats["caption"]["workers"], stats["caption"]["max_queue"]) == (3, 5)
+    assert (stats["ocr"]["workers"], stats["ocr"]["max_queue"]) == (2, 8)
+    pool.shutdown()
+
+
+def test_run_waiting_waits_out_a_full_queue():
+    release = threading.Event()
+
+    async def main():
+        pool = InferencePool()
+        pool.retry_after = 1
+        pool.register("extractor", workers=1, queue=1)
+        busy = [asyncio.ensure_future(pool.run("extractor", release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+
+        with pytest.raises(ExecutorSaturated):
+            await pool.run("extractor", lambda: "rejected")
+        waiting = asyncio.ensure_future(pool.run_waiting("extractor", lambda: "ran"))
+        await asyncio.sleep(0.1)
+        assert not waiting.done()
+
+        release.set()
+        result = await asyncio.wait_for(waiting, 5)
+        await asyncio.gather(*busy)
+        pool.shutdown()
+        return result, pool.stats()["extractor"]
+
+    result, stats = asyncio.run(main())
+    assert result == "ran"
+    assert stats["completed"] == 3
+    assert stats["rejected"] >= 2
@@ -0,0 +1,111 @@
+"""
+ImageFetcher: shared downloads, cancellation and per-host bookkeeping
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from utils.http_client import ImageFetcher
+from utils.image_io import ImageRejected
+
+
+def fetcher_with(handler) -> ImageFetcher:
+    fetcher = ImageFetcher(cache_entries=8, cache_ttl=60)
+    fetcher.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return fetcher
+
+
+def slow_server(requests, release: asyncio.Event):
+    async def handler(request):
+        requests.append(str(request.url))
+        await release.wait()
+        return httpx.Response(200, content=b"image " + request.url.path.encode())
+    return handler
+
+
+def test_concurrent_fetches_share_one_download():
+    async def run():
+        requests, release = [], asyncio.Event()
+        fetcher = fetcher_with(slow_server(requests, release))
+        calls = [asyncio.ensure_future(fetcher.fetch("http://cdn/a.jpg")) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        release.set()
+        results = await asyncio.gather(*calls)
+
+        assert results == [b"image /a.jpg"] * 3
+        assert await fetcher.fetch("http://cdn/a.jpg") == b"image /a.jpg"
+        assert requests == ["http://cdn/a.jpg"]
+        assert fetcher.stats()["cache_hits"] == 1
+        await fetcher.aclose()
+
+    asyncio.run(run())
+
+
+def test_cancelling_the_first_caller_leaves_the_others_waiting():
+    async def run():
+        requests, release = [], asyncio.Event()
+        fetcher = fetcher_with(slow_server(requests, release))
+        first = asyncio.ensure_future(fetcher.fetch("http://cdn/a.jpg"))
+        await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(fetcher.fetch("http://cdn/a.jpg"))
+        await asyncio.sleep(0.01)
+
+        first.cancel()
+        await asyncio.sleep(0.01)
+        release.set()
+
+        assert await second == b"image /a.jpg"
+        assert first.cancelled()
+        assert requests == ["http://cdn/a.jpg"]
+        await fetcher.aclose()
+
+    asyncio.run(run())
+
+
+def test_download_is_cancelled_when_nobody_waits():
+    async def run():
+        requests, release = [], asyncio.Event()
+        fetcher = fetcher_with(slow_server(requests, release))
+        caller = asyncio.ensure_future(fetcher.fetch("http://cdn/a.jpg"))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        await asyncio.sleep(0.01)
+
+        assert fetcher._in_flight == {}
+        assert fetcher._host_limits == {}
+        assert fetcher.stats()["cached_urls"] == 0
+
+        # The next caller starts a fresh download
+        release.set()
+        assert await fetcher.fetch("http://cdn/a.jpg") == b"image /a.jpg"
+        assert len(requests) == 2
+        await fetcher.aclose()
+
+    asyncio.run(run())
+
+
+def test_idle_hosts_are_forgotten():
+    async def run():
+        fetcher = fetcher_with(lambda request: httpx.Response(200, content=b"x"))
+        await asyncio.gather(*[fetcher.fetch(f"http://host{i}/a.jpg") for i in range(50)])
+
+        assert fetcher._host_limits == {}
+        assert fetcher._in_flight == {}
+        assert fetcher.stats()["downloads"] == 50
+        await fetcher.aclose()
+
+    asyncio.run(run())
+
+
+def test_failed_download_is_not_cached():
+    async def run():
+        fetcher = fetcher_with(lambda request: httpx.Response(404))
+        for _ in range(2):
+            with pytest.raises(ImageRejected, match="HTTP 404"):
+                await fetcher.fetch("http://cdn/missing.jpg")
+        assert fetcher.stats()["cached_urls"] == 0
+        await fetcher.aclose()
+
+    asyncio.run(run())
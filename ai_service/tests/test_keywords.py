@@ -0,0 +1,81 @@
+"""
+KeywordMatcher semantics, pinned against the previous substring scan
+The old code tested `keyword in text.lower()`; the compiled matcher only
+reports whole words (plus a plural "s"/"es"), so hits inside other words
+are gone while plurals and multi-word keywords still match
+"""
+
+import pytest
+
+from utils.keywords import KeywordMatcher
+from utils.rules import BRANDS, COLORS, ITEM_TYPES, KEYWORD_MATCHER, rule_based_pass
+
+VOCABULARIES = {
+    "color": {color: [color] for color in COLORS},
+    "brand": {brand: [brand] for brand in BRANDS},
+    "item_type": ITEM_TYPES,
+}
+
+
+def labels(text: str, vocab: str):
+    return set(KEYWORD_MATCHER.scan(text).labels[vocab])
+
+
+def substring_labels(text: str, vocab: str):
+    """The previous lookup"""
+    return {
+        label for label, keywords in VOCABULARIES[vocab].items()
+        if any(keyword in text.lower() for keyword in keywords)
+    }
+
+
+# (text, vocab, hits of the substring scan, hits now)
+CHANGED = [
+    ("Did anyone see my bag", "item_type", {"bag", "id card"}, {"bag"}),  # "id" in "did"
+    ("Golden retriever missing", "color", {"gold"}, set()),
+    ("Found my headphone", "item_type", {"phone"}, set()),  # "headphones" is the keyword
+    ("Catalog left on the bus", "item_type", {"cat"}, set()),
+    ("Redeemed my ticket", "color", {"red"}, set()),
+]
+
+UNCHANGED = [
+    ("Lost two phones", "item_type", {"phone"}),
+    ("Three watches found", "item_type", {"watch"}),
+    ("I lost my iPhones", "brand", {"iphone"}),
+    ("Lost my ID card", "item_type", {"id card"}),
+    ("Black leather wallet", "color", {"black"}),
+    ("Found a Louis Vuitton purse", "brand", {"louis vuitton"}),
+]
+
+
+@pytest.mark.parametrize("text,vocab,before,after", CHANGED)
+def test_no_hits_inside_other_words(text, vocab, before, after):
+    assert substring_labels(text, vocab) == before
+    assert labels(text, vocab) == after
+
+
+@pytest.mark.parametrize("text,vocab,expected", UNCHANGED)
+def test_plurals_and_phrases_still_match(text, vocab, expected):
+    assert substring_labels(text, vocab) == expected
+    assert labels(text, vocab) == expected
+
+
+def test_prefix_keywords_are_reported_with_the_longer_one():
+    # "id card" also counts as a hit for "id", as the substring scan did
+    hits = KEYWORD_MATCHER.scan("lost my id card")
+    assert hits.labels["item_type"]["id card"] == {"id", "id card"}
+    assert hits.count("item_type", "id card") == 2
+
+
+def test_overlapping_keywords_all_hit():
+    matcher = KeywordMatcher({"item": {"bag": ["bag", "laptop bag"], "laptop": ["laptop"]}})
+    hits = matcher.scan("Found a laptop bag")
+    assert hits.count("item", "bag") == 2
+    assert hits.first("item") == "bag"  # Vocabulary order, not text order
+
+
+def test_post_type_counts_distinct_cues():
+    _, post_type = rule_based_pass("I found a wallet, is this yours? Lost yesterday")
+    assert post_type == "FOUND"
+    _, post_type = rule_based_pass("I lost my keys, please help, still missing")
+    assert post_type == "LOST"
@@ -0,0 +1,112 @@
+"""
+score_matches parity with calculateMatchScore in the backend's
+matching.service.js: EXPECTED holds the backend's (total, breakdown) for
+every query/candidate pair below, computed by running that function
+"""
+
+import pytest
+
+from utils.matching import BREAKDOWN_KEYS, score_matches
+
+QUERIES = {
+    "phone": {
+        "post_id": "q1", "category": "electronics",
+        "attributes": {"color": "Black", "brand": "Apple", "model": "13"},
+        "location": {"city": "Colombo", "coordinates": [79.8612, 6.9271]},
+        "date": "2024-06-10T12:00:00+00:00",
+        "embedding": [0.6, 0.8, 0.0, 0.0],
+    },
+    "uncategorized": {
+        "post_id": "q2", "category": None,
+        "attributes": {"color": "red"},
+        "location": {"city": "Kandy", "coordinates": [80.6337, 7.2906]},
+        "created_at": "2024-06-10T12:00:00+00:00",
+        "embedding": None,
+    },
+}
+
+CANDIDATES = [
+    {"post_id": "same-everything", "category": "electronics",
+     "attributes": {"color": "black", "brand": "APPLE", "model": "13"},
+     "location": {"city": "colombo", "coordinates": [79.8612, 6.9271]},
+     "date": "2024-06-10T20:00:00+00:00", "embedding": [0.6, 0.8, 0.0, 0.0]},
+    {"post_id": "800m-away", "category": "electronics", "attributes": {"brand": "Apple"},
+     "location": {"city": "Dehiwala", "coordinates": [79.8612, 6.9343]},
+     "date": "2024-06-12T12:00:00+00:00", "embedding": [0.0, 1.0, 0.0, 0.0]},
+    {"post_id": "3km-away", "category": "bags", "attributes": {"color": "Black"},
+     "location": {"city": "Nugegoda", "coordinates": [79.8900, 6.9271]},
+     "date": "2024-06-15T12:00:00+00:00", "embedding": [0.0, 0.0, 1.0, 0.0]},
+    {"post_id": "8km-away", "category": "electronics", "attributes": {},
+     "location": {"city": "Maharagama", "coordinates": [79.9333, 6.9271]},
+     "date": "2024-06-30T12:00:00+00:00", "embedding": [-0.6, -0.8, 0.0, 0.0]},
+    {"post_id": "far-and-old", "category": "electronics", "attributes": {"model": "14"},
+     "location": {"city": "Kandy", "coordinates": [80.6337, 7.2906]},
+     "date": "2024-03-01T12:00:00+00:00", "embedding": [0.5, 0.5, 0.5, 0.5]},
+    {"post_id": "no-city", "category": "electronics", "attributes": {"color": "red"},
+     "location": {"coordinates": [79.8612, 6.9271]},
+     "created_at": "2024-06-09T12:00:00+00:00", "embedding": [0.6, 0.8]},
+    {"post_id": "no-category", "category": None, "attributes": {"color": "Red"},
+     "location": {"city": "KANDY"},
+     "date": "2024-06-11T00:00:00+00:00", "embedding": None},
+    {"post_id": "no-date", "category": None, "attributes": {},
+     "location": {"city": "Galle", "coordinates": [80.2170, 6.0535]},
+     "embedding": [0.6, 0.8, 0.0, 0.0]},
+]
+
+# (total, [categoryMatch, attributeMatch, locationMatch, timeMatch, embeddingMatch, textMatch])
+EXPECTED = {
+    "phone": {
+        "same-everything": (100, [25, 25, 20, 15, 15, 0]),
+        "800m-away": (79, [25, 10, 20, 12, 12, 0]),
+        "3km-away": (31, [0, 8, 15, 8, 0, 0]),
+        "8km-away": (24, [25, 0, 10, 4, -15, 0]),
+        "far-and-old": (36, [25, 0, 0, 0, 11, 0]),
+        "no-city": (40, [25, 0, 0, 15, 0, 0]),
+        "no-category": (15, [0, 0, 0, 15, 0, 0]),
+        "no-date": (15, [0, 0, 0, 0, 15, 0]),
+    },
+    "uncategorized": {
+        "same-everything": (15, [0, 0, 0, 15, 0, 0]),
+        "800m-away": (12, [0, 0, 0, 12, 0, 0]),
+        "3km-away": (8, [0, 0, 0, 8, 0, 0]),
+        "8km-away": (4, [0, 0, 0, 4, 0, 0]),
+        "far-and-old": (20, [0, 0, 20, 0, 0, 0]),
+        "no-city": (23, [0, 8, 0, 15, 0, 0]),
+        "no-category": (68, [25, 8, 20, 15, 0, 0]),
+        "no-date": (25, [25, 0, 0, 0, 0, 0]),
+    },
+}
+
+
+def score_all(query, **kwargs):
+    matches = score_matches(query, CANDIDATES, top_k=len(CANDIDATES), min_score=-100, **kwargs)
+    return {m["post_id"]: m for m in matches}
+
+
+@pytest.mark.parametrize("name", sorted(QUERIES))
+def test_totals_and_breakdowns_match_the_backend(name):
+    scored = score_all(QUERIES[name])
+    assert set(scored) == set(EXPECTED[name])
+    for post_id, (total, breakdown) in EXPECTED[name].items():
+        assert scored[post_id]["score"] == total, post_id
+        assert [scored[post_id]["breakdown"][key] for key in BREAKDOWN_KEYS] == breakdown, post_id
+
+
+def test_missing_categories_match_each_other():
+    scored = score_all(QUERIES["uncategorized"])
+    assert scored["no-category"]["reasons"][0]["factor"] == "Category Match"
+    assert scored["same-everything"]["breakdown"]["categoryMatch"] == 0
+
+
+def test_text_overlap_is_opt_in():
+    query = dict(QUERIES["phone"], title="black iphone 13 charger", description="")
+    candidates = [dict(CANDIDATES[0], title="black iphone 13 with charger", description="")]
+
+    assert score_matches(query, candidates)[0]["breakdown"]["textMatch"] == 0
+    assert score_matches(query, candidates, text_weight=10)[0]["breakdown"]["textMatch"] > 0
+
+
+def test_min_score_and_top_k():
+    scored = score_matches(QUERIES["phone"], CANDIDATES, top_k=2, min_score=40)
+    assert [m["post_id"] for m in scored] == ["same-everything", "800m-away"]
+    assert all(m["score"] >= 40 for m in score_matches(QUERIES["phone"], CANDIDATES, top_k=10))
@@ -0,0 +1,38 @@
+"""
+iter_lines: chunk boundaries and the line length limit
+"""
+
+import asyncio
+
+from utils.ndjson import LineTooLong, iter_lines, parse_line
+
+
+def lines(chunks, max_line_bytes=None):
+    async def source():
+        for chunk in chunks:
+            yield chunk
+
+    async def collect():
+        return [line async for line in iter_lines(source(), max_line_bytes)]
+
+    return asyncio.run(collect())
+
+
+def test_lines_split_across_chunks():
+    assert lines([b'"a', b'b"\n"c"\n\n', b'  \n"d', b'"']) == [b'"ab"', b'"c"', b'"d"']
+    assert lines([b"x" * 10 for _ in range(1000)] + [b"\n"]) == [b"x" * 10000]
+
+
+def test_long_line_becomes_an_error_and_is_skipped():
+    out = lines([b'"ok"\n' + b"x" * 6, b"x" * 100, b'x\n"next"\n', b"y" * 20], max_line_bytes=8)
+
+    assert out[0] == b'"ok"'
+    assert isinstance(out[1], LineTooLong)
+    assert out[2] == b'"next"'
+    assert isinstance(out[3], LineTooLong)
+    assert len(out) == 4
+    assert parse_line(out[1]) == (None, "Line longer than 8 bytes")
+
+
+def test_line_at_the_limit_is_kept():
+    assert lines([b"12345678\n", b"123456789\n"], max_line_bytes=8)[0] == b"12345678"
@@ -0,0 +1,95 @@
+"""
+StagePipeline: dependency order, concurrency, failures and critical_path
+"""
+
+import asyncio
+
+import pytest
+
+from utils.pipeline import StagePipeline
+
+
+def stage(log, name, delay, result=None):
+    async def run(**inputs):
+        log.append(("start", name, sorted(inputs)))
+        await asyncio.sleep(delay)
+        log.append(("end", name))
+        return result if result is not None else name
+    return run
+
+
+def test_stages_wait_for_their_dependencies_only():
+    log = []
+    pipeline = StagePipeline()
+    pipeline.add("decode", stage(log, "decode", 0.01))
+    pipeline.add("text", stage(log, "text", 0.05))
+    pipeline.add("detect", stage(log, "detect", 0.01), after=["decode"])
+    pipeline.add("ocr", stage(log, "ocr", 0.02), after=["decode"])
+    pipeline.add("merge", stage(log, "merge", 0), after=["detect", "ocr", "text"])
+
+    outputs = asyncio.run(pipeline.run())
+
+    assert outputs == {name: name for name in ["decode", "text", "detect", "ocr", "merge"]}
+    order = [entry[:2] for entry in log]
+    # Independent stages start together, dependents after their inputs end
+    assert order[:2] == [("start", "decode"), ("start", "text")]
+    assert order.index(("start", "detect")) > order.index(("end", "decode"))
+    assert order.index(("start", "ocr")) < order.index(("end", "detect"))
+    assert order[-2:] == [("start", "merge"), ("end", "merge")]
+    assert ("start", "merge", ["detect", "ocr", "text"]) in log
+
+
+def test_dependencies_are_passed_as_keyword_arguments():
+    pipeline = StagePipeline()
+    pipeline.add("a", stage([], "a", 0, result=2))
+
+    async def double(a):
+        return a * 2
+
+    pipeline.add("b", double, after=["a"])
+    assert asyncio.run(pipeline.run()) == {"a": 2, "b": 4}
+
+
+def test_critical_path_follows_the_latest_finishing_dependency():
+    pipeline = StagePipeline()
+    pipeline.add("decode", stage([], "decode", 0.01))
+    pipeline.add("text", stage([], "text", 0.01))
+    pipeline.add("detect", stage([], "detect", 0.01), after=["decode"])
+    pipeline.add("ocr", stage([], "ocr", 0.06), after=["decode"])
+    pipeline.add("merge", stage([], "merge", 0), after=["text", "detect", "ocr"])
+    asyncio.run(pipeline.run())
+
+    assert pipeline.critical_path() == ["decode", "ocr", "merge"]
+    report = pipeline.report()
+    assert report["critical_path"] == ["decode", "ocr", "merge"]
+    assert set(report["stages"]) == {"decode", "text", "detect", "ocr", "merge"}
+    assert report["total_ms"] >= report["stages"]["ocr"]["duration_ms"]
+
+
+def test_failed_stage_cancels_the_rest():
+    log = []
+    pipeline = StagePipeline()
+
+    async def broken():
+        raise ValueError("bad image")
+
+    pipeline.add("slow", stage(log, "slow", 10))
+    pipeline.add("broken", broken)
+    pipeline.add("after", stage(log, "after", 0), after=["broken"])
+
+    async def main():
+        with pytest.raises(ValueError):
+            await pipeline.run()
+        await asyncio.sleep(0)
+
+    asyncio.run(main())
+    assert ("end", "slow") not in [entry[:2] for entry in log]
+    assert ("start", "after") not in [entry[:2] for entry in log]
+
+
+def test_unknown_dependency_is_rejected():
+    pipeline = StagePipeline()
+    with pytest.raises(ValueError):
+        pipeline.add("detect", stage([], "detect", 0), after=["decode"])
+    assert "detect" not in pipeline
+    assert StagePipeline().critical_path() == []
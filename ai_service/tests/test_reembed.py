@@ -0,0 +1,93 @@
+"""
+ReembedJob: output layout, skipped posts, crash/resume and checkpoint checks
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("sentence_transformers")
+
+from jobs.reembed import ReembedJob, load_vectors, post_text  # noqa: E402
+from utils.vector_index import VectorIndex  # noqa: E402
+
+
+class FakeModel:
+    dimension = 4
+
+    def __init__(self, version="fake@4", fail_after=None):
+        self.version = version
+        self.fail_after = fail_after
+        self.calls = 0
+
+    def encode_batch(self, texts, batch_size=None):
+        self.calls += 1
+        if self.fail_after is not None and self.calls > self.fail_after:
+            raise RuntimeError("worker died")
+        vectors = np.array([[len(t), t.count("a"), t.count("e"), 1] for t in texts], dtype=np.float32)
+        return list(vectors / np.linalg.norm(vectors, axis=1, keepdims=True))
+
+
+def write_posts(path, n):
+    with open(path, "w") as f:
+        for i in range(n):
+            post = {"_id": {"$oid": f"p{i}"}, "title": f"lost item {i}" + " a" * i, "category": "keys", "type": "lost"}
+            if i % 7 == 3:
+                post = {"_id": f"p{i}", "title": ""}  # Nothing to embed
+            f.write(json.dumps(post) + "\n")
+    return str(path)
+
+
+def test_memmap_output_round_trips(tmp_path):
+    posts = write_posts(tmp_path / "posts.jsonl", 30)
+    summary = ReembedJob(FakeModel(), str(tmp_path / "out"), chunk_size=8).run(posts)
+
+    ids, vectors = load_vectors(str(tmp_path / "out"))
+    assert summary["records"] == 30 and summary["skipped"] == 4
+    assert ids == [f"p{i}" for i in range(30) if i % 7 != 3]
+    assert vectors.shape == (26, 4)
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1, rtol=1e-6)
+
+
+def test_resume_after_a_crash_matches_a_clean_run(tmp_path):
+    posts = write_posts(tmp_path / "posts.jsonl", 40)
+    clean = ReembedJob(FakeModel(), str(tmp_path / "clean"), encoding="int8", chunk_size=5)
+    clean.run(posts)
+
+    crashed = ReembedJob(
+        FakeModel(fail_after=3), str(tmp_path / "out"), encoding="int8", chunk_size=5, checkpoint_seconds=0,
+    )
+    with pytest.raises(RuntimeError):
+        crashed.run(posts)
+    with open(tmp_path / "out" / "checkpoint.json") as f:
+        assert json.load(f)["rows"] == 15
+
+    ReembedJob(FakeModel(), str(tmp_path / "out"), encoding="int8", chunk_size=5).run(posts)
+    ids, vectors = load_vectors(str(tmp_path / "out"))
+    clean_ids, clean_vectors = load_vectors(str(tmp_path / "clean"))
+    assert ids == clean_ids
+    np.testing.assert_array_equal(vectors, clean_vectors)
+
+
+def test_checkpoint_from_another_model_is_refused(tmp_path):
+    posts = write_posts(tmp_path / "posts.jsonl", 10)
+    ReembedJob(FakeModel(), str(tmp_path / "out")).run(posts)
+
+    with pytest.raises(RuntimeError, match="model"):
+        ReembedJob(FakeModel(version="fake@5"), str(tmp_path / "out")).run(posts)
+    summary = ReembedJob(FakeModel(version="fake@5"), str(tmp_path / "out")).run(posts, restart=True)
+    assert summary["embedded"] == 9
+
+
+def test_index_output(tmp_path):
+    posts = write_posts(tmp_path / "posts.jsonl", 12)
+    index_path = str(tmp_path / "index.npz")
+    ReembedJob(FakeModel(), str(tmp_path / "out"), index_path=index_path, chunk_size=4).run(posts)
+
+    index = VectorIndex(4)
+    index.load(index_path)
+    assert len(index) == 10
+    query = FakeModel().encode_batch([post_text({"title": "lost item 5" + " a" * 5})])[0]
+    assert index.search(query, top_k=1, category="keys")[0]["post_id"] == "p5"
@@ -0,0 +1,67 @@
+"""
+Heavy models are built once, in the lifespan hook
+A frozen registry must refuse to build (or let a constructor build) any
+model afterwards - EasyOCR's Reader is the stand-in for the real weights
+"""
+
+import sys
+import types
+
+import pytest
+
+from models.registry import ModelRegistry
+
+
+class FakeReader:
+    instances = 0
+
+    def __init__(self, *args, **kwargs):
+        FakeReader.instances += 1
+        self.device = "cpu"
+
+
+@pytest.fixture
+def fresh_registry(monkeypatch):
+    monkeypatch.setitem(sys.modules, "easyocr", types.SimpleNamespace(Reader=FakeReader))
+    monkeypatch.setattr(FakeReader, "instances", 0)
+    sys.modules.pop("models.ocr", None)
+    import models.ocr
+
+    registry = ModelRegistry()
+    monkeypatch.setattr(models.ocr, "registry", registry)
+    yield registry, models.ocr
+    sys.modules.pop("models.ocr", None)
+
+
+def test_ocr_reader_is_not_built_after_startup(fresh_registry):
+    registry, ocr = fresh_registry
+
+    model = registry.get_or_create("ocr", ocr.OCRModel)
+    assert registry.get_or_create("ocr", ocr.OCRModel) is model
+    registry.freeze()
+
+    with pytest.raises(RuntimeError, match="after startup"):
+        ocr.OCRModel()
+    assert registry.build_counts()["ocr"] == 1
+    assert FakeReader.instances == 1
+
+
+def test_frozen_registry_refuses_new_models():
+    registry = ModelRegistry()
+    registry.get_or_create("embedding", object)
+    registry.freeze()
+
+    assert registry.get_or_create("embedding", object) is registry.get("embedding")
+    with pytest.raises(RuntimeError):
+        registry.get_or_create("vision", object)
+    assert registry.build_counts() == {"embedding": 1}
+
+
+def test_setup_failure_after_build_marks_model_failed():
+    registry = ModelRegistry()
+    registry.get_or_create("embedding", object)
+    assert registry.status("embedding") == "ready"
+
+    registry.mark_failed("embedding", OSError("index file is corrupt"))
+    assert registry.status("embedding") == "failed"
+    assert registry.error("embedding") == "index file is corrupt"
@@ -0,0 +1,123 @@
+"""
+VectorIndex: flat vs IVF search, deletes, filters and persistence
+"""
+
+import numpy as np
+import pytest
+
+from utils.vector_index import VectorIndex
+
+DIMENSION = 16
+
+
+def clustered(n: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(20, DIMENSION))
+    vectors = centers[rng.integers(len(centers), size=n)] + rng.normal(scale=0.3, size=(n, DIMENSION))
+    return vectors.astype(np.float32)
+
+
+def ids(results):
+    return [r["post_id"] for r in results]
+
+
+@pytest.mark.parametrize("size", [1, 2, 5, 15])
+def test_ivf_trains_on_tiny_corpora(size):
+    index = VectorIndex(DIMENSION, ivf_threshold=1)
+    index.upsert_batch([str(i) for i in range(size)], clustered(size))
+
+    assert index.stats()["mode"] == "ivf"
+    assert index.stats()["lists"] <= size
+    assert len(index.search(clustered(1, seed=1)[0], top_k=size)) == size
+
+
+def test_ivf_recall_against_flat():
+    vectors = clustered(2000)
+    post_ids = [str(i) for i in range(len(vectors))]
+    flat = VectorIndex(DIMENSION, ivf_threshold=10 ** 9)
+    ivf = VectorIndex(DIMENSION, ivf_threshold=1000, nprobe=16)
+    flat.upsert_batch(post_ids, vectors)
+    ivf.upsert_batch(post_ids, vectors)
+    assert ivf.stats()["mode"] == "ivf"
+
+    queries = clustered(50, seed=1)
+    hits = sum(
+        len(set(ids(flat.search(q, top_k=10))) & set(ids(ivf.search(q, top_k=10))))
+        for q in queries
+    )
+    assert hits / (10 * len(queries)) >= 0.9
+
+
+def test_filters_return_top_k_when_matches_exist():
+    vectors = clustered(2000)
+    categories = ["keys" if i % 100 == 0 else "phone" for i in range(len(vectors))]
+    index = VectorIndex(DIMENSION, ivf_threshold=1000, nprobe=1)
+    index.upsert_batch([str(i) for i in range(len(vectors))], vectors, categories, ["lost"] * len(vectors))
+
+    # 20 "keys" posts, most outside the one probed list
+    results = index.search(clustered(1, seed=1)[0], top_k=10, category="keys")
+    assert len(results) == 10
+    assert all(int(post_id) % 100 == 0 for post_id in ids(results))
+
+    assert index.search(vectors[0], top_k=10, post_type="found") == []
+    assert index.search(vectors[0], top_k=10, category="wallet") == []
+
+
+def test_flat_filters_and_exclude():
+    index = VectorIndex(DIMENSION)
+    vectors = clustered(3)
+    index.upsert_batch(["a", "b", "c"], vectors, ["keys", "keys", "phone"], ["lost", "found", "found"])
+
+    assert set(ids(index.search(vectors[0], category="keys"))) == {"a", "b"}
+    assert ids(index.search(vectors[0], category="Keys", post_type="found")) == ["b"]
+    assert "a" not in ids(index.search(vectors[0], exclude_id="a"))
+
+
+@pytest.mark.parametrize("ivf_threshold", [10 ** 9, 1])
+def test_delete_moves_last_row_into_the_hole(ivf_threshold):
+    vectors = clustered(4)
+    index = VectorIndex(DIMENSION, ivf_threshold=ivf_threshold)
+    index.upsert_batch(["a", "b", "c", "d"], vectors)
+
+    assert index.delete("b")
+    assert not index.delete("b")
+    assert len(index) == 3
+
+    # "d" now lives in b's old row and is still found by its own vector
+    assert index.search(vectors[3], top_k=1) == [{"post_id": "d", "score": 1.0}]
+    assert "b" not in ids(index.search(vectors[1], top_k=3))
+    assert index.delete_batch(["a", "d", "missing"]) == 2
+    assert ids(index.search(vectors[2], top_k=3)) == ["c"]
+
+
+def test_upsert_replaces_existing_post():
+    vectors = clustered(2)
+    index = VectorIndex(DIMENSION)
+    index.upsert("a", vectors[0], "keys")
+    index.upsert("a", vectors[1], "phone")
+
+    assert len(index) == 1
+    assert index.search(vectors[1], top_k=1, category="phone")[0]["score"] == 1.0
+
+
+def test_save_load_round_trip(tmp_path):
+    vectors = clustered(50)
+    index = VectorIndex(DIMENSION)
+    index.upsert_batch(
+        [f"p{i}" for i in range(50)], vectors,
+        ["keys" if i % 2 else None for i in range(50)], ["lost"] * 50,
+    )
+    path = str(tmp_path / "index.npz")
+    index.save(path)
+
+    loaded = VectorIndex(DIMENSION)
+    loaded.load(path)
+    assert len(loaded) == 50
+    for query in clustered(5, seed=1):
+        assert loaded.search(query, top_k=5) == index.search(query, top_k=5)
+        assert loaded.search(query, category="keys") == index.search(query, category="keys")
+
+
+def test_wrong_dimension_is_rejected():
+    with pytest.raises(ValueError):
+        VectorIndex(DIMENSION).upsert_batch(["a"], np.zeros((1, DIMENSION + 1)))
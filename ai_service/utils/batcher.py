@@ -0,0 +1,132 @@
+"""
+Dynamic micro-batching for embedding requests
+Collects concurrent /embed calls for a few milliseconds and runs them
+through a single encode_batch forward pass
+"""
+
+import os
+import time
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Tuple
+
+
+class EmbeddingBatcher:
+    """
+    Groups concurrent single-text requests into batches
+    Texts are bucketed by length so short texts don't pay for padding
+    up to the longest text in the batch
+    """
+
+    def __init__(
+        self,
+        encode_batch: Callable[[List[str]], List[Any]],
+        run: Callable[..., Awaitable[Any]],
+        max_batch_size: int = None,
+        max_wait_ms: float = None,
+        buckets: Sequence[int] = None,
+    ):
+        """
+        encode_batch: blocking batch encoder (EmbeddingModel.encode_batch)
+        run: coroutine that executes a blocking call off the event loop
+        buckets: ascending text-length boundaries, e.g. (64, 256)
+        """
+        self.encode_batch = encode_batch
+        self.run = run
+        self.max_batch_size = max_batch_size or int(os.getenv("EMBED_BATCH_MAX_SIZE", 32))
+        self.max_wait = (max_wait_ms if max_wait_ms is not None
+                         else float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", 5))) / 1000
+        if buckets is None:
+            raw = os.getenv("EMBED_BATCH_BUCKETS", "64,256")
+            buckets = [int(b) for b in raw.split(",") if b.strip()]
+        self.buckets = sorted(buckets)
+
+        self._pending: Dict[int, List[Tuple[str, asyncio.Future]]] = {}
+        self._timers: Dict[int, asyncio.TimerHandle] = {}
+        self._tasks = set()
+
+        # Rolling window for latency percentiles
+        self._latencies = deque(maxlen=2048)
+        self._batches = 0
+        self._items = 0
+
+    def _bucket(self, text: str) -> int:
+        length = len(text)
+        for i, boundary in enumerate(self.buckets):
+            if length <= boundary:
+                return i
+        return len(self.buckets)
+
+    async def submit(self, text: str) -> Any:
+        """Queue a text and wait for its embedding"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        bucket = self._bucket(text)
+
+        items = self._pending.setdefault(bucket, [])
+        items.append((text, future))
+
+        if len(items) >= self.max_batch_size:
+            self._flush(bucket)
+        elif len(items) == 1:
+            self._timers[bucket] = loop.call_later(self.max_wait, self._flush, bucket)
+
+        started = time.perf_counter()
+        try:
+            return await future
+        finally:
+            self._latencies.append(time.perf_counter() - started)
+
+    def _flush(self, bucket: int):
+        timer = self._timers.pop(bucket, None)
+        if timer is not None:
+            timer.cancel()
+
+        items = self._pending.pop(bucket, None)
+        if not items:
+            return
+
+        # Keep a reference so the task isn't garbage collected mid-flight
+        task = asyncio.ensure_future(self._run_batch(items))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, items: List[Tuple[str, asyncio.Future]]):
+        texts = [text for text, _ in items]
+        self._batches += 1
+        self._items += len(items)
+
+        try:
+            embeddings = await self.run(self.encode_batch, texts)
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), embedding in zip(items, embeddings):
+            if not future.done():
+                future.set_result(embedding)
+
+    def stats(self) -> Dict[str, Any]:
+        """Latency percentiles and batch fill rate for /health"""
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            index = min(int(p * len(latencies)), len(latencies) - 1)
+            return round(latencies[index] * 1000, 2)
+
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "buckets": self.buckets,
+            "batches": self._batches,
+            "items": self._items,
+            "avg_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+            "fill_rate": round(self._items / (self._batches * self.max_batch_size), 3)
+                         if self._batches else 0.0,
+            "p50_ms": percentile(0.50),
+            "p99_ms": percentile(0.99),
+        }
@@ -0,0 +1,289 @@
+"""
+Content-addressed result cache
+Keys are a hash of the normalized input plus model name and version,
+so reposts and client retries skip inference entirely
+"""
+
+import os
+import pickle
+import sqlite3
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+# Bump to invalidate every cached result (e.g. after changing post-processing)
+CACHE_VERSION = os.getenv("RESULT_CACHE_VERSION", "1")
+
+
+def make_key(kind: str, model_id: str, payload: Union[bytes, str]) -> str:
+    """
+    Build a cache key
+    kind: endpoint family ("embed", "extract_text", "extract_image", "caption")
+    model_id: model name/version that produced the result
+    payload: image bytes or normalized text
+    """
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+
+    digest = hashlib.sha256(payload).hexdigest()
+    return f"{kind}:{model_id}:{CACHE_VERSION}:{digest}"
+
+
+class ResultCache:
+    """
+    Two-tier cache
+    - Memory: LRU bounded by total pickled size
+    - Disk (optional): SQLite file that survives restarts, bounded by
+      disk_max_bytes (least recently written/hit entries go first)
+    Disk writes never happen on the caller's thread: set() queues them and
+    a writer thread commits them in batches. Async callers use aget() /
+    aget_many(), which read the disk tier off the event loop
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = None,
+        disk_path: Optional[str] = None,
+        disk_max_bytes: int = None,
+        flush_seconds: float = None,
+    ):
+        self.max_bytes = max_bytes or int(os.getenv("RESULT_CACHE_MB", 256)) * 1024 * 1024
+        self.disk_max_bytes = disk_max_bytes or int(os.getenv("RESULT_CACHE_DISK_MB", 1024)) * 1024 * 1024
+        self.flush_seconds = flush_seconds if flush_seconds is not None else float(
+            os.getenv("RESULT_CACHE_FLUSH_SECONDS", 1.0)
+        )
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        # Serializes lookups on the shared read connection (not the writer's)
+        self._read_lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self.disk_bytes = 0
+
+        # Waiting for the writer thread: key -> blob, and disk hits to refresh
+        self._pending: Dict[str, bytes] = {}
+        self._touched: Dict[str, float] = {}
+        self._wake = threading.Event()
+        self._closed = False
+        self._writer = None
+
+        self._db = None
+        self._disk_path = disk_path
+        if disk_path:
+            os.makedirs(os.path.dirname(disk_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(results)")}
+            if columns and "used" not in columns:
+                # Written before the disk tier was bounded - it's only a cache
+                self._db.execute("DROP TABLE results")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results "
+                "(key TEXT PRIMARY KEY, value BLOB, size INTEGER, used REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+            self._db.commit()
+            self.disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+            self._writer = threading.Thread(target=self._write_loop, name="result-cache-writer", daemon=True)
+            self._writer.start()
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.get_many([key])[0]
+
+    def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """Results for keys (None for misses); blocks on the disk tier"""
+        blobs = self._get_memory(keys)
+        missing = [key for key, blob in zip(keys, blobs) if blob is None]
+        if missing:
+            found = self._get_disk(missing)
+            blobs = [found.get(key) if blob is None else blob for key, blob in zip(keys, blobs)]
+        return [None if blob is None else pickle.loads(blob) for blob in blobs]
+
+    async def aget(self, key: str) -> Optional[Any]:
+        return (await self.aget_many([key]))[0]
+
+    async def aget_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """
+        get_many for the event loop: memory hits are answered in place,
+        the SQLite lookup and unpickling of disk hits run on a thread
+        """
+        blobs = self._get_memory(keys)
+        missing = [key for key, blob in zip(keys, blobs) if blob is None]
+        results = [None if blob is None else pickle.loads(blob) for blob in blobs]
+        if missing:
+            found = await asyncio.to_thread(
+                lambda: {key: pickle.loads(blob) for key, blob in self._get_disk(missing).items()}
+            )
+            results = [found.get(key) if blob is None else r for key, blob, r in zip(keys, blobs, results)]
+        return results
+
+    def _get_memory(self, keys: List[str]) -> List[Optional[bytes]]:
+        """Blobs from memory or the write queue; misses are counted by _get_disk"""
+        blobs = []
+        with self._lock:
+            for key in keys:
+                blob = self._entries.get(key)
+                if blob is not None:
+                    self._entries.move_to_end(key)
+                else:
+                    blob = self._pending.get(key)
+                if blob is not None:
+                    self.hits += 1
+                elif self._db is None:
+                    self.misses += 1
+                blobs.append(blob)
+        return blobs
+
+    def _get_disk(self, keys: List[str]) -> Dict[str, bytes]:
+        """Rows for keys, promoted to memory; the SELECT runs outside the cache lock"""
+        found = {}
+        if self._db is not None:
+            with self._read_lock:
+                for i in range(0, len(keys), 500):
+                    part = keys[i:i + 500]
+                    found.update(self._db.execute(
+                        f"SELECT key, value FROM results WHERE key IN ({','.join('?' * len(part))})",
+                        part,
+                    ).fetchall())
+
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                blob = found.get(key)
+                if blob is None:
+                    self.misses += 1
+                    continue
+                self.disk_hits += 1
+                self._touched[key] = now
+                self._put_memory(key, blob)
+        return found
+
+    def set(self, key: str, value: Any):
+        self.set_many([(key, value)])
+
+    def set_many(self, items: Iterable[Tuple[str, Any]]):
+        """Store several results under one lock acquisition"""
+        blobs = [(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)) for key, value in items]
+
+        with self._lock:
+            for key, blob in blobs:
+                self._put_memory(key, blob)
+                if self._db is not None and len(blob) <= self.disk_max_bytes:
+                    self._pending[key] = blob
+        if self._db is not None and blobs:
+            self._wake.set()
+
+    def _put_memory(self, key: str, blob: bytes):
+        if len(blob) > self.max_bytes:
+            return
+
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+
+        self._entries[key] = blob
+        self._size += len(blob)
+
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+            self.evictions += 1
+
+    # ============== Disk writer ==============
+
+    def _write_loop(self):
+        # Its own connection - WAL lets get() keep reading while this commits
+        db = sqlite3.connect(self._disk_path)
+        try:
+            while not self._closed:
+                self._wake.wait(self.flush_seconds)
+                self._wake.clear()
+                # Let a burst of set() calls gather into one transaction
+                time.sleep(min(self.flush_seconds, 0.05))
+                self._flush(db)
+            self._flush(db)
+        finally:
+            db.close()
+
+    def _flush(self, db: sqlite3.Connection):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            touched, self._touched = self._touched, {}
+        if not pending and not touched:
+            return
+
+        now = time.time()
+        with db:
+            if pending:
+                # Bytes of rows about to be replaced (SQLite caps bound parameters)
+                keys = list(pending)
+                replaced = 0
+                for i in range(0, len(keys), 500):
+                    part = keys[i:i + 500]
+                    replaced += db.execute(
+                        f"SELECT COALESCE(SUM(size), 0) FROM results WHERE key IN ({','.join('?' * len(part))})",
+                        part,
+                    ).fetchone()[0]
+                db.executemany(
+                    "INSERT OR REPLACE INTO results (key, value, size, used) VALUES (?, ?, ?, ?)",
+                    [(key, blob, len(blob), now) for key, blob in pending.items()],
+                )
+                self.disk_bytes += sum(len(blob) for blob in pending.values()) - replaced
+            if touched:
+                db.executemany("UPDATE results SET used = ? WHERE key = ?", [(t, k) for k, t in touched.items()])
+
+            if self.disk_bytes > self.disk_max_bytes:
+                self._evict_disk(db)
+
+    def _evict_disk(self, db: sqlite3.Connection):
+        """Drop least recently used rows down to 90% of the disk budget"""
+        target = self.disk_max_bytes * 0.9
+        while self.disk_bytes > target:
+            rows = db.execute("SELECT key, size FROM results ORDER BY used LIMIT 64").fetchall()
+            if not rows:
+                self.disk_bytes = 0
+                return
+            db.executemany("DELETE FROM results WHERE key = ?", [(key,) for key, _ in rows])
+            self.disk_bytes -= sum(size for _, size in rows)
+            self.disk_evictions += len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for /health"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "disk": self._db is not None,
+                "disk_bytes": self.disk_bytes,
+                "disk_max_bytes": self.disk_max_bytes if self._db is not None else None,
+                "disk_evictions": self.disk_evictions,
+                "disk_pending": len(self._pending),
+            }
+
+    def close(self):
+        """Write out pending results and close the disk tier"""
+        self._closed = True
+        if self._writer is not None:
+            self._wake.set()
+            self._writer.join()
+            self._writer = None
+        if self._db is not None:
+            with self._read_lock:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,114 @@
+"""
+Dominant color analysis
+Pixels are binned to 5 bits per channel and named through a 32^3 lookup
+table built once at import: each bin maps to the nearest reference color
+in CIELAB, so naming a whole crop is one gather plus one bincount
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Reference sRGB values per color name (names match the text vocabulary
+# in utils/rules.py, "grey" being an alias of gray)
+COLOR_REFERENCES: Dict[str, List[Tuple[int, int, int]]] = {
+    "black": [(0, 0, 0), (30, 30, 30)],
+    "white": [(255, 255, 255), (235, 235, 230)],
+    "gray": [(90, 90, 90), (128, 128, 128), (160, 160, 160)],
+    "silver": [(192, 192, 192), (200, 205, 210)],
+    "red": [(200, 30, 30), (230, 50, 50), (170, 20, 30)],
+    "maroon": [(128, 0, 0), (100, 20, 30)],
+    "pink": [(255, 192, 203), (255, 150, 180), (230, 100, 160)],
+    "orange": [(255, 140, 0), (230, 110, 30), (250, 160, 60)],
+    "brown": [(90, 55, 30), (120, 70, 30), (150, 95, 55)],
+    "beige": [(220, 200, 160), (200, 180, 140), (235, 220, 190)],
+    "gold": [(212, 175, 55), (200, 160, 60)],
+    "yellow": [(255, 220, 0), (240, 230, 80), (250, 240, 140)],
+    "green": [(30, 150, 40), (60, 180, 75), (20, 90, 40), (120, 180, 80), (80, 110, 50)],
+    "navy": [(0, 0, 128), (25, 25, 112), (20, 30, 80), (30, 40, 60)],
+    "blue": [(0, 0, 255), (30, 80, 200), (70, 130, 220), (100, 160, 230), (0, 120, 180)],
+    "purple": [(120, 50, 150), (150, 80, 180), (90, 40, 110), (180, 130, 200)],
+}
+
+COLOR_NAMES = list(COLOR_REFERENCES)
+
+LUT_BITS = 5
+
+
+def srgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+    """(..., 3) sRGB in 0-255 -> CIELAB (D65)"""
+    c = np.asarray(rgb, dtype=np.float64) / 255.0
+    c = np.where(c > 0.04045, ((c + 0.055) / 1.055) ** 2.4, c / 12.92)
+    xyz = c @ np.array([
+        [0.4124, 0.2126, 0.0193],
+        [0.3576, 0.7152, 0.1192],
+        [0.1805, 0.0722, 0.9505],
+    ])
+    xyz /= np.array([0.95047, 1.0, 1.08883])
+    f = np.where(xyz > 0.008856, np.cbrt(xyz), 7.787 * xyz + 16 / 116)
+    return np.stack([
+        116 * f[..., 1] - 16,
+        500 * (f[..., 0] - f[..., 1]),
+        200 * (f[..., 1] - f[..., 2]),
+    ], axis=-1)
+
+
+def _build_lut() -> np.ndarray:
+    """Color index for every 5-bit RGB bin, indexed by r << 10 | g << 5 | b"""
+    levels = (np.arange(1 << LUT_BITS) << (8 - LUT_BITS)) + (1 << (7 - LUT_BITS))
+    r, g, b = np.meshgrid(levels, levels, levels, indexing="ij")
+    bins = srgb_to_lab(np.stack([r, g, b], axis=-1).reshape(-1, 3))
+
+    references = [(i, rgb) for i, name in enumerate(COLOR_NAMES) for rgb in COLOR_REFERENCES[name]]
+    reference_lab = srgb_to_lab(np.array([rgb for _, rgb in references]))
+    owner = np.array([i for i, _ in references], dtype=np.uint8)
+
+    distances = ((bins[:, None, :] - reference_lab[None, :, :]) ** 2).sum(axis=-1)
+    return owner[np.argmin(distances, axis=1)]
+
+
+COLOR_LUT = _build_lut()
+
+
+def dominant_colors(
+    pixels: np.ndarray,
+    box: Optional[Tuple[float, float, float, float]] = None,
+    max_colors: int = 3,
+    min_share: float = 0.05,
+    inset: float = 0.1,
+    max_pixels: int = 4096,
+) -> List[Dict[str, float]]:
+    """
+    Named dominant colors of an RGB array, most common first
+    box: (x, y, width, height) in pixel coordinates; shrunk by inset on
+    each side so the edges, mostly background, don't count
+    Returns [{"name", "share"}] where share is the fraction of sampled pixels
+    """
+    if box is not None:
+        height, width = pixels.shape[:2]
+        x, y, w, h = box
+        x0 = int(np.clip(x + w * inset, 0, width - 1))
+        y0 = int(np.clip(y + h * inset, 0, height - 1))
+        x1 = int(np.clip(x + w * (1 - inset), x0 + 1, width))
+        y1 = int(np.clip(y + h * (1 - inset), y0 + 1, height))
+        pixels = pixels[y0:y1, x0:x1]
+
+    if pixels.size == 0:
+        return []
+
+    # Evenly strided sample - the shares don't need every pixel
+    step = max(1, int(np.sqrt(pixels.shape[0] * pixels.shape[1] / max_pixels)))
+    sample = pixels[::step, ::step, :3].reshape(-1, 3) >> (8 - LUT_BITS)
+    index = (
+        (sample[:, 0].astype(np.intp) << (2 * LUT_BITS))
+        | (sample[:, 1].astype(np.intp) << LUT_BITS)
+        | sample[:, 2]
+    )
+
+    counts = np.bincount(COLOR_LUT[index], minlength=len(COLOR_NAMES))
+    shares = counts / counts.sum()
+    return [
+        {"name": COLOR_NAMES[i], "share": round(float(shares[i]), 3)}
+        for i in np.argsort(-shares, kind="stable")[:max_colors]
+        if shares[i] >= min_share
+    ]
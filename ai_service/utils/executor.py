@@ -0,0 +1,190 @@
+"""
+Inference execution layer
+Runs blocking model calls on dedicated per-model thread pools
+so the event loop stays free for /health and other requests
+"""
+
+import os
+import time
+import asyncio
+import functools
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+class ExecutorSaturated(Exception):
+    """
+    Raised when a model's queue is full
+    Mapped to 503 + Retry-After by the API layer
+    """
+
+    def __init__(self, model: str, retry_after: int):
+        super().__init__(f"{model} model is busy, please retry later")
+        self.model = model
+        self.retry_after = retry_after
+
+
+class ModelExecutor:
+    """
+    Bounded executor for a single model
+    Torch and EasyOCR release the GIL during inference, so threads are enough
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_workers: int = 1,
+        max_queue: int = 32,
+        retry_after: int = 2,
+    ):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        # Optional ResidencyManager - keeps the model on its device per call
+        self.residency = None
+
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=f"infer-{name}",
+        )
+
+        # Counters are touched from the event loop and worker threads
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._wait_time = 0.0
+        self._run_time = 0.0
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs) on this model's pool
+        Raises ExecutorSaturated if max_queue calls are already waiting
+        """
+        with self._lock:
+            if self._queued >= self.max_queue:
+                self._rejected += 1
+                raise ExecutorSaturated(self.name, self.retry_after)
+            self._queued += 1
+
+        call = functools.partial(self._call, fn, args, kwargs, time.perf_counter())
+        future = self._pool.submit(call)
+
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # Client went away before a worker picked the call up
+            if future.cancel():
+                with self._lock:
+                    self._queued -= 1
+            raise
+
+    def _call(self, fn: Callable, args: tuple, kwargs: dict, submitted: float) -> Any:
+        started = time.perf_counter()
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._wait_time += started - submitted
+
+        failed = False
+        resident = self.residency.use(self.name) if self.residency is not None else nullcontext()
+        try:
+            with resident:
+                return fn(*args, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._run_time += time.perf_counter() - started
+                if failed:
+                    self._failed += 1
+                else:
+                    self._completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue metrics for /health"""
+        with self._lock:
+            finished = self._completed + self._failed
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queued": self._queued,
+                "running": self._running,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "avg_wait_ms": round(self._wait_time / finished * 1000, 2) if finished else 0.0,
+                "avg_run_ms": round(self._run_time / finished * 1000, 2) if finished else 0.0,
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class InferencePool:
+    """
+    Registry of per-model executors
+    Concurrency and queue depth are configured per model via env:
+    INFERENCE_<NAME>_WORKERS and INFERENCE_<NAME>_QUEUE
+    """
+
+    def __init__(self):
+        self.retry_after = int(os.getenv("INFERENCE_RETRY_AFTER", 2))
+        self.residency = None
+        self._executors: Dict[str, ModelExecutor] = {}
+
+    def register(
+        self,
+        name: str,
+        workers: int = 1,
+        queue: int = 32,
+    ) -> ModelExecutor:
+        prefix = f"INFERENCE_{name.upper()}"
+        executor = ModelExecutor(
+            name,
+            max_workers=int(os.getenv(f"{prefix}_WORKERS", workers)),
+            max_queue=int(os.getenv(f"{prefix}_QUEUE", queue)),
+            retry_after=self.retry_after,
+        )
+        executor.residency = self.residency
+        self._executors[name] = executor
+        return executor
+
+    def attach_residency(self, residency):
+        """Route every call through residency.use(<executor name>)"""
+        self.residency = residency
+        for executor in self._executors.values():
+            executor.residency = residency
+
+    def __getitem__(self, name: str) -> ModelExecutor:
+        return self._executors[name]
+
+    async def run(self, name: str, fn: Callable, *args, **kwargs) -> Any:
+        return await self._executors[name].run(fn, *args, **kwargs)
+
+    async def run_waiting(self, name: str, fn: Callable, *args, **kwargs) -> Any:
+        """
+        run(), but a full queue is waited out (backing off up to retry_after)
+        instead of raised - for work a streamed response has already promised
+        """
+        delay = 0.05
+        while True:
+            try:
+                return await self.run(name, fn, *args, **kwargs)
+            except ExecutorSaturated as e:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, e.retry_after)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: ex.stats() for name, ex in self._executors.items()}
+
+    def shutdown(self):
+        for executor in self._executors.values():
+            executor.shutdown()
@@ -0,0 +1,172 @@
+"""
+Pooled HTTP client for image_url downloads
+One app-lifetime client with keep-alive, per-host concurrency limits,
+streaming size caps and a small URL -> bytes cache
+"""
+
+import os
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Dict
+from urllib.parse import urlsplit
+
+import httpx
+
+from utils.image_io import MAX_IMAGE_BYTES, ImageRejected
+
+try:
+    import h2  # noqa: F401 - enables HTTP/2 in httpx
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class ImageFetcher:
+    """
+    Downloads images with connection reuse
+    Cloudinary assets are often fetched twice in a row (/extract/image then
+    /generate/caption), so recent downloads are kept for a short time
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = MAX_IMAGE_BYTES,
+        timeout: float = None,
+        per_host: int = None,
+        cache_entries: int = None,
+        cache_ttl: float = None,
+    ):
+        self.max_bytes = max_bytes
+        self.per_host = per_host or int(os.getenv("FETCH_MAX_PER_HOST", 8))
+        self.cache_entries = cache_entries if cache_entries is not None else int(os.getenv("FETCH_CACHE_ENTRIES", 32))
+        self.cache_ttl = cache_ttl if cache_ttl is not None else float(os.getenv("FETCH_CACHE_TTL", 60))
+
+        timeout = timeout or float(os.getenv("FETCH_TIMEOUT", 10))
+        self.client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(timeout, connect=min(timeout, 5.0)),
+            limits=httpx.Limits(
+                max_connections=int(os.getenv("FETCH_MAX_CONNECTIONS", 64)),
+                max_keepalive_connections=int(os.getenv("FETCH_MAX_KEEPALIVE", 16)),
+                keepalive_expiry=30.0,
+            ),
+            follow_redirects=True,
+        )
+
+        # host -> [semaphore, downloads holding or waiting for it]
+        self._host_limits: Dict[str, list] = {}
+        # url -> [download task, callers waiting for it]
+        self._in_flight: Dict[str, list] = {}
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+
+        self.downloads = 0
+        self.cache_hits = 0
+        self.bytes_downloaded = 0
+
+    async def fetch(self, url: str) -> bytes:
+        """Download url, raising ImageRejected on errors or oversized bodies"""
+        cached = self._cache.get(url)
+        if cached is not None:
+            stored_at, contents = cached
+            if time.monotonic() - stored_at < self.cache_ttl:
+                self._cache.move_to_end(url)
+                self.cache_hits += 1
+                return contents
+            del self._cache[url]
+
+        # Share one download between concurrent requests for the same URL.
+        # It runs as a task of its own, so a caller that is cancelled only
+        # stops waiting; the download is cancelled once nobody waits for it
+        entry = self._in_flight.get(url)
+        if entry is None:
+            entry = self._in_flight[url] = [asyncio.ensure_future(self._download(url)), 0]
+            entry[0].add_done_callback(lambda t: self._finish(url, t))
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not task.done():
+                task.cancel()
+                # A caller arriving before the task winds down starts afresh
+                if self._in_flight.get(url) is entry:
+                    del self._in_flight[url]
+
+    def _finish(self, url: str, task: asyncio.Task):
+        entry = self._in_flight.get(url)
+        if entry is not None and entry[0] is task:
+            del self._in_flight[url]
+        if task.cancelled():
+            return
+        # Retrieved here so a failure nobody awaited anymore isn't logged
+        if task.exception() is not None:
+            return
+
+        if self.cache_entries > 0:
+            self._cache[url] = (time.monotonic(), task.result())
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+    async def _download(self, url: str) -> bytes:
+        host = urlsplit(url).netloc
+        if not host:
+            raise ImageRejected(f"Invalid image_url: {url}")
+
+        # Only hosts with downloads running or queued keep a semaphore
+        limit = self._host_limits.get(host)
+        if limit is None:
+            limit = self._host_limits[host] = [asyncio.Semaphore(self.per_host), 0]
+        limit[1] += 1
+        try:
+            async with limit[0]:
+                try:
+                    async with self.client.stream("GET", url) as response:
+                        response.raise_for_status()
+
+                        length = response.headers.get("content-length")
+                        if length and length.isdigit() and int(length) > self.max_bytes:
+                            raise self._too_large()
+
+                        chunks = []
+                        received = 0
+                        async for chunk in response.aiter_bytes():
+                            received += len(chunk)
+                            # Abort as soon as the cap is crossed
+                            if received > self.max_bytes:
+                                raise self._too_large()
+                            chunks.append(chunk)
+                except httpx.HTTPStatusError as e:
+                    raise ImageRejected(f"image_url returned HTTP {e.response.status_code}")
+                except httpx.TimeoutException:
+                    raise ImageRejected("Timed out fetching image_url", status_code=504)
+                except httpx.HTTPError as e:
+                    raise ImageRejected(f"Could not fetch image_url: {e}")
+        finally:
+            limit[1] -= 1
+            if limit[1] == 0:
+                del self._host_limits[host]
+
+        self.downloads += 1
+        self.bytes_downloaded += received
+        return b"".join(chunks)
+
+    def _too_large(self) -> ImageRejected:
+        return ImageRejected(
+            f"Image too large (max {self.max_bytes / 1024 / 1024:.0f} MB)",
+            status_code=413,
+        )
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "downloads": self.downloads,
+            "cache_hits": self.cache_hits,
+            "bytes_downloaded": self.bytes_downloaded,
+            "cached_urls": len(self._cache),
+            "active_hosts": len(self._host_limits),
+            "http2": HTTP2_AVAILABLE,
+        }
+
+    async def aclose(self):
+        await self.client.aclose()
@@ -0,0 +1,65 @@
+"""
+Identifier extraction from OCR text
+Stateless helpers shared by OCRModel and ItemExtractor
+Patterns are compiled once at import
+"""
+
+import re
+from typing import Dict
+
+# Serial number patterns (first match wins)
+SERIAL_PATTERNS = [
+    re.compile(r'\b[A-Z0-9]{10,20}\b', re.IGNORECASE),  # Generic alphanumeric
+    re.compile(r'\bS/N[\s:]*([A-Z0-9]+)\b', re.IGNORECASE),  # S/N prefix
+    re.compile(r'\bSerial[\s:]*([A-Z0-9]+)\b', re.IGNORECASE),  # Serial prefix
+    re.compile(r'\bIMEI[\s:]*(\d{15})\b', re.IGNORECASE),  # IMEI
+]
+
+PHONE_PATTERN = re.compile(
+    r'\b(?:\+?1?[-.\s]?)?\(?[0-9]{3}\)?[-.\s]?[0-9]{3}[-.\s]?[0-9]{4}\b'
+)
+
+EMAIL_PATTERN = re.compile(
+    r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
+)
+
+# Model number patterns (first match wins)
+MODEL_PATTERNS = [
+    re.compile(r'\bModel[\s:]*([A-Z0-9-]+)\b', re.IGNORECASE),
+    re.compile(r'\b(iPhone\s*\d+\s*(?:Pro|Max|Plus)?)\b', re.IGNORECASE),
+    re.compile(r'\b(Galaxy\s*[A-Z]\d+)\b', re.IGNORECASE),
+    re.compile(r'\b(MacBook\s*(?:Pro|Air)?)\b', re.IGNORECASE),
+]
+
+
+def extract_potential_identifiers(text: str) -> Dict[str, str]:
+    """
+    Extract potential identifiers from OCR text
+    (Serial numbers, phone numbers, IDs, etc.)
+    """
+    identifiers = {}
+
+    if not text:
+        return identifiers
+
+    for pattern in SERIAL_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            identifiers["serial_number"] = match.group(1) if match.lastindex else match.group(0)
+            break
+
+    match = PHONE_PATTERN.search(text)
+    if match:
+        identifiers["phone_number"] = match.group(0)
+
+    match = EMAIL_PATTERN.search(text)
+    if match:
+        identifiers["email"] = match.group(0)
+
+    for pattern in MODEL_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            identifiers["model"] = match.group(1)
+            break
+
+    return identifiers
@@ -0,0 +1,118 @@
+"""
+Image ingestion shared by all image endpoints
+Enforces size limits before decoding, decodes JPEGs at reduced scale,
+applies EXIF orientation and downscales once for the models
+"""
+
+import io
+import os
+from typing import Tuple
+
+from PIL import Image, ImageOps
+
+MAX_IMAGE_BYTES = int(float(os.getenv("MAX_IMAGE_SIZE_MB", 10)) * 1024 * 1024)
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", 50_000_000))
+
+# DETR resizes to a longest edge of 1333 and BLIP to 384, so nothing
+# downstream benefits from more than this
+MODEL_MAX_SIDE = int(os.getenv("MODEL_IMAGE_MAX_SIDE", 1333))
+
+# OCR keeps more detail for small print (serials, ID cards)
+OCR_MAX_SIDE = int(os.getenv("OCR_IMAGE_MAX_SIDE", 2000))
+
+
+class ImageRejected(ValueError):
+    """Image is too large or can't be decoded"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class IngestedImage:
+    """
+    Decoded image at the resolutions the models need
+    model: RGB image, longest side <= MODEL_MAX_SIDE (detection, captioning)
+    ocr: RGB image, longest side <= OCR_MAX_SIDE
+    original_size: (width, height) after EXIF orientation, before any downscale
+    """
+
+    def __init__(self, model: Image.Image, ocr: Image.Image, original_size: Tuple[int, int]):
+        self.model = model
+        self.ocr = ocr
+        self.original_size = original_size
+
+    @property
+    def ocr_scale(self) -> float:
+        """Factor from original coordinates to OCR image coordinates"""
+        return self.ocr.size[0] / self.original_size[0]
+
+
+def _fit(size: Tuple[int, int], max_side: int) -> Tuple[int, int]:
+    width, height = size
+    scale = min(1.0, max_side / max(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def check_image_bytes(size: int):
+    """Reject oversized payloads before they are decoded"""
+    if size > MAX_IMAGE_BYTES:
+        raise ImageRejected(
+            f"Image too large ({size / 1024 / 1024:.1f} MB, max "
+            f"{MAX_IMAGE_BYTES / 1024 / 1024:.0f} MB)",
+            status_code=413,
+        )
+
+
+def ingest_image(contents: bytes) -> IngestedImage:
+    """Decode raw upload bytes into model- and OCR-sized RGB images"""
+    check_image_bytes(len(contents))
+
+    try:
+        image = Image.open(io.BytesIO(contents))
+    except Exception:
+        raise ImageRejected("Unsupported or corrupt image")
+
+    # Header only so far - check dimensions before allocating pixels
+    width, height = image.size
+    if width * height > MAX_IMAGE_PIXELS:
+        raise ImageRejected(
+            f"Image has too many pixels ({width}x{height})",
+            status_code=413,
+        )
+
+    # EXIF orientation 5-8 swaps width and height
+    orientation = image.getexif().get(0x0112, 1)
+    original_size = (height, width) if orientation in (5, 6, 7, 8) else (width, height)
+
+    # JPEG can decode directly at 1/2, 1/4 or 1/8 scale
+    if image.format == "JPEG":
+        image.draft("RGB", _fit((width, height), OCR_MAX_SIDE))
+
+    try:
+        image = ImageOps.exif_transpose(image)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+    except Exception:
+        raise ImageRejected("Unsupported or corrupt image")
+
+    # A draft decode usually lands just above the cap (e.g. 2016 for a
+    # 4032px phone photo) - not worth a full-frame resample
+    ocr_image = image
+    if max(image.size) > OCR_MAX_SIDE * 1.1:
+        ocr_image = image.resize(
+            _fit(image.size, OCR_MAX_SIDE),
+            Image.Resampling.BICUBIC,
+            reducing_gap=3.0,
+        )
+
+    # The detection/caption processors resample again, bilinear is enough here
+    model_image = ocr_image
+    if max(ocr_image.size) > MODEL_MAX_SIDE:
+        model_image = ocr_image.resize(
+            _fit(ocr_image.size, MODEL_MAX_SIDE),
+            Image.Resampling.BILINEAR,
+            reducing_gap=2.0,
+        )
+
+    return IngestedImage(model=model_image, ocr=ocr_image, original_size=original_size)
@@ -0,0 +1,109 @@
+"""
+Compiled multi-vocabulary keyword matcher
+All vocabularies (categories, colors, brands, item types, post type cues)
+are merged into one trie-shaped regex built at import, so a single pass
+over the text finds every whole-word keyword hit
+"""
+
+import re
+from typing import Dict, List, Set, Tuple
+
+
+def _trie_regex(words: List[str]) -> str:
+    """
+    Build a regex alternation shaped like a prefix trie
+    e.g. [bag, backpack, bat] -> ba(?:ckpack|g|t)
+    Greedy optional groups make the longest keyword win at each position
+    """
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict) -> str:
+        is_end = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not is_end:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        return group + "?" if is_end else group
+
+    return build(trie)
+
+
+class KeywordHits:
+    """Keywords found in one text, grouped by vocabulary and label"""
+
+    def __init__(self, order: Dict[str, List[str]]):
+        self._order = order
+        self.labels: Dict[str, Dict[str, Set[str]]] = {vocab: {} for vocab in order}
+
+    def first(self, vocab: str):
+        """First label (in vocabulary order) with at least one hit"""
+        hits = self.labels[vocab]
+        if not hits:
+            return None
+        for label in self._order[vocab]:
+            if label in hits:
+                return label
+        return None
+
+    def count(self, vocab: str, label: str) -> int:
+        """Number of distinct keywords of label that were hit"""
+        return len(self.labels[vocab].get(label, ()))
+
+
+class KeywordMatcher:
+    """
+    vocabularies: vocab name -> label -> keywords
+    Matching is case-insensitive and whole-word, with an optional plural
+    suffix, so "id" no longer matches inside "did" but "phones" still hits "phone"
+    """
+
+    def __init__(self, vocabularies: Dict[str, Dict[str, List[str]]]):
+        self._order = {vocab: list(labels) for vocab, labels in vocabularies.items()}
+        self._owners: Dict[str, List[Tuple[str, str]]] = {}
+        for vocab, labels in vocabularies.items():
+            for label, keywords in labels.items():
+                for keyword in keywords:
+                    self._owners.setdefault(keyword.lower(), []).append((vocab, label))
+
+        # Shorter keywords that are whole-word prefixes of a longer one
+        # ("id" in "id card") - the regex only reports the longest
+        self._prefixes: Dict[str, List[str]] = {
+            keyword: [
+                other for other in self._owners
+                if len(other) < len(keyword)
+                and keyword.startswith(other)
+                and not (keyword[len(other)].isalnum() or keyword[len(other)] == "_")
+            ]
+            for keyword in self._owners
+        }
+
+        # Zero-width lookahead so overlapping hits (e.g. "laptop bag" and
+        # "bag") are all reported
+        self._pattern = re.compile(
+            r"(?<!\w)(?=(" + _trie_regex(list(self._owners)) + r")(?:e?s)?(?!\w))"
+        )
+
+        # keyword -> every (vocab, label, keyword) it implies, prefixes included
+        self._expanded: Dict[str, List[Tuple[str, str, str]]] = {
+            keyword: [
+                (vocab, label, found)
+                for found in (keyword, *self._prefixes[keyword])
+                for vocab, label in self._owners[found]
+            ]
+            for keyword in self._owners
+        }
+
+    def scan(self, text: str) -> KeywordHits:
+        hits = KeywordHits(self._order)
+        labels = hits.labels
+        for keyword in set(self._pattern.findall(text.lower())):
+            for vocab, label, found in self._expanded[keyword]:
+                labels[vocab].setdefault(label, set()).add(found)
+        return hits
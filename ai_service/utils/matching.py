@@ -0,0 +1,254 @@
+"""
+Match scoring between one query post and many candidates
+Same factors, points and reasons as calculateMatchScore in the backend's
+matching.service.js, computed as NumPy column operations over the whole
+candidate set instead of one awaited call per candidate
+"""
+
+import re
+import math
+from functools import lru_cache
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+import numpy as np
+
+from utils.prompts import MATCH_REASONS
+
+EARTH_RADIUS_KM = 6371.0
+
+# Breakdown keys as stored in Match.scoreBreakdown
+BREAKDOWN_KEYS = (
+    "categoryMatch", "attributeMatch", "locationMatch",
+    "timeMatch", "embeddingMatch", "textMatch",
+)
+
+CATEGORY_POINTS = 25
+ATTRIBUTE_POINTS = {"color": 8, "brand": 10, "model": 7}
+ATTRIBUTE_MAX = 25
+# (reason, points) per location / time bucket, bucket 0 scores nothing
+LOCATION_BUCKETS = [(None, 0), ("location_city", 20), ("location_1km", 20), ("location_5km", 15), ("location_10km", 10)]
+TIME_BUCKETS = [(None, 0), ("time_1d", 15), ("time_3d", 12), ("time_7d", 8), (None, 4)]
+EMBEDDING_POINTS = 15
+EMBEDDING_REASON_SIMILARITY = 0.7
+TEXT_REASON_OVERLAP = 0.2
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "the", "and", "for", "with", "was", "were", "has", "have", "had", "not", "but",
+    "lost", "found", "near", "from", "this", "that", "its", "are", "you", "your",
+    "please", "contact", "call", "item", "today", "yesterday", "any", "who", "anyone",
+}
+
+
+def _lower(value: Any) -> str:
+    return value.lower() if isinstance(value, str) else ""
+
+
+def _timestamp(value: Any) -> float:
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return math.nan
+    return value.timestamp() if isinstance(value, datetime) else math.nan
+
+
+@lru_cache(maxsize=50000)
+def _words(text: str) -> frozenset:
+    # The same candidate pool is scored against every new post
+    return frozenset(w for w in _WORD.findall(text.lower()) if len(w) >= 3 and w not in _STOPWORDS)
+
+
+def _tokens(post: Dict[str, Any]) -> Set[str]:
+    return _words(f"{post.get('title') or ''} {post.get('description') or ''}")
+
+
+def _coordinates(post: Dict[str, Any]):
+    """(lon, lat) from location.coordinates, NaN if absent"""
+    coordinates = (post.get("location") or {}).get("coordinates")
+    if coordinates and len(coordinates) == 2:
+        return float(coordinates[0]), float(coordinates[1])
+    return math.nan, math.nan
+
+
+def haversine_km(lon1: float, lat1: float, lon2: np.ndarray, lat2: np.ndarray) -> np.ndarray:
+    lat1, lon1 = math.radians(lat1), math.radians(lon1)
+    lat2, lon2 = np.radians(lat2), np.radians(lon2)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def _js_round(values: np.ndarray) -> np.ndarray:
+    """Math.round - halves go up, unlike np.round"""
+    return np.floor(values + 0.5)
+
+
+class CandidateColumns:
+    """Candidate posts as arrays, one entry per candidate"""
+
+    def __init__(
+        self,
+        candidates: Sequence[Dict[str, Any]],
+        dimension: Optional[int] = None,
+        with_tokens: bool = True,
+    ):
+        self.post_ids = [c.get("post_id") for c in candidates]
+        self.category = np.array([c.get("category") or "" for c in candidates], dtype=str)
+
+        attributes = [c.get("attributes") or {} for c in candidates]
+        self.attributes = {
+            key: np.array([_lower(a.get(key)) for a in attributes], dtype=str)
+            for key in ATTRIBUTE_POINTS
+        }
+
+        self.city = np.array([_lower((c.get("location") or {}).get("city")) for c in candidates], dtype=str)
+        coordinates = np.array([_coordinates(c) for c in candidates], dtype=np.float64).reshape(-1, 2)
+        self.lon, self.lat = coordinates[:, 0], coordinates[:, 1]
+
+        self.timestamp = np.array(
+            [_timestamp(c.get("date") or c.get("created_at")) for c in candidates],
+            dtype=np.float64,
+        )
+
+        self.tokens = [_tokens(c) for c in candidates] if with_tokens else []
+        self.token_counts = np.array([len(t) for t in self.tokens], dtype=np.float64)
+
+        # Unit-norm rows; candidates without a (same-size) embedding get zeros
+        self.has_embedding = np.zeros(len(candidates), dtype=bool)
+        self.embeddings = None
+        if dimension:
+            rows = [
+                i for i, c in enumerate(candidates)
+                if c.get("embedding") is not None and len(c["embedding"]) == dimension
+            ]
+            self.embeddings = np.zeros((len(candidates), dimension), dtype=np.float32)
+            if rows:
+                matrix = np.array([candidates[i]["embedding"] for i in rows], dtype=np.float32)
+                norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                self.embeddings[rows] = matrix / np.where(norms > 0, norms, 1)
+                self.has_embedding[rows] = norms[:, 0] > 0
+
+    def __len__(self) -> int:
+        return len(self.post_ids)
+
+
+def score_matches(
+    query: Dict[str, Any],
+    candidates: Sequence[Dict[str, Any]],
+    top_k: int = 10,
+    min_score: float = 40,
+    text_weight: float = 0,
+    query_embedding: Optional[Sequence[float]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Score every candidate against query, return the top_k at or above
+    min_score with {post_id, score, breakdown, reasons}, best first
+    Posts are dicts with post_id, title, description, category,
+    attributes{color,brand,model}, location{city, coordinates [lon, lat]},
+    date/created_at and embedding
+    text_weight: opt-in points for full title/description word overlap
+    (Jaccard); the backend never fills textMatch, so the default of 0
+    reproduces its totals exactly
+    """
+    if query_embedding is None:
+        query_embedding = query.get("embedding")
+    dimension = len(query_embedding) if query_embedding is not None else None
+    columns = CandidateColumns(candidates, dimension, with_tokens=bool(text_weight))
+    n = len(columns)
+    if n == 0:
+        return []
+
+    # 1. Category - compared like the backend's ===, so two posts without
+    # a category match too (null === null)
+    q_category = query.get("category") or ""
+    category_match = columns.category == q_category
+    category = np.where(category_match, CATEGORY_POINTS, 0)
+
+    # 2. Attributes (color 8, brand 10, model 7, capped at 25)
+    q_attributes = query.get("attributes") or {}
+    attribute_hits = {}
+    attribute = np.zeros(n)
+    for key, points in ATTRIBUTE_POINTS.items():
+        value = _lower(q_attributes.get(key))
+        hits = (columns.attributes[key] == value) if value else np.zeros(n, dtype=bool)
+        attribute_hits[key] = hits
+        attribute += np.where(hits, points, 0)
+    attribute = np.minimum(attribute, ATTRIBUTE_MAX)
+
+    # 3. Location - same city, else distance buckets (only when both have a city)
+    q_city = _lower((query.get("location") or {}).get("city"))
+    q_lon, q_lat = _coordinates(query)
+    both_city = (columns.city != "") if q_city else np.zeros(n, dtype=bool)
+    same_city = both_city & (columns.city == q_city)
+    distance = haversine_km(q_lon, q_lat, columns.lon, columns.lat)
+    nearby = both_city & ~same_city
+    location_bucket = np.select(
+        [same_city, nearby & (distance < 1), nearby & (distance < 5), nearby & (distance < 10)],
+        [1, 2, 3, 4],
+        0,
+    )
+    location = np.array([points for _, points in LOCATION_BUCKETS])[location_bucket]
+
+    # 4. Time window - posts without a date score nothing
+    days = np.abs(columns.timestamp - _timestamp(query.get("date") or query.get("created_at"))) / 86400
+    time_bucket = np.select([days <= 1, days <= 3, days <= 7, days <= 30], [1, 2, 3, 4], 0)
+    time_points = np.array([points for _, points in TIME_BUCKETS])[time_bucket]
+
+    # 5. Embedding cosine
+    similarity = np.zeros(n, dtype=np.float32)
+    embedding = np.zeros(n)
+    if columns.embeddings is not None:
+        q = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if norm > 0:
+            similarity = np.where(columns.has_embedding, columns.embeddings @ (q / norm), 0)
+            embedding = np.where(columns.has_embedding, _js_round(similarity * EMBEDDING_POINTS), 0)
+
+    # 6. Title/description word overlap
+    q_tokens = _tokens(query)
+    overlap = np.zeros(n)
+    if q_tokens and columns.tokens:
+        shared = np.array([len(q_tokens & t) for t in columns.tokens], dtype=np.float64)
+        union = len(q_tokens) + columns.token_counts - shared
+        overlap = np.divide(shared, union, out=np.zeros(n), where=union > 0)
+    text = _js_round(overlap * text_weight)
+
+    breakdown = np.stack([category, attribute, location, time_points, embedding, text], axis=1)
+    total = np.minimum(breakdown.sum(axis=1), 100)
+
+    eligible = np.flatnonzero(total >= min_score)
+    order = eligible[np.argsort(-total[eligible], kind="stable")][:top_k]
+
+    matches = []
+    for i in order:
+        reasons = []
+
+        def reason(name: str, score: float, **fields):
+            factor, details = MATCH_REASONS[name]
+            reasons.append({"factor": factor, "score": int(score), "details": details.format(**fields)})
+
+        if category_match[i]:
+            reason("category", category[i], category=q_category or "null")
+        matched = [key for key in ATTRIBUTE_POINTS if attribute_hits[key][i]]
+        if matched:
+            reason("attributes", attribute[i], attributes=", ".join(matched))
+        location_reason = LOCATION_BUCKETS[location_bucket[i]][0]
+        if location_reason:
+            reason(location_reason, location[i], city=(query.get("location") or {}).get("city"))
+        time_reason = TIME_BUCKETS[time_bucket[i]][0]
+        if time_reason:
+            reason(time_reason, time_points[i])
+        if columns.has_embedding[i] and similarity[i] > EMBEDDING_REASON_SIMILARITY:
+            reason("embedding", embedding[i])
+        if text[i] > 0 and overlap[i] >= TEXT_REASON_OVERLAP:
+            reason("text", text[i], words=", ".join(sorted(q_tokens & columns.tokens[i])[:5]))
+
+        matches.append({
+            "post_id": columns.post_ids[i],
+            "score": int(total[i]),
+            "breakdown": {key: int(value) for key, value in zip(BREAKDOWN_KEYS, breakdown[i])},
+            "reasons": reasons,
+            "distance_km": round(float(distance[i]), 2) if np.isfinite(distance[i]) else None,
+        })
+    return matches
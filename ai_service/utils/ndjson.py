@@ -0,0 +1,106 @@
+"""
+NDJSON request and response streaming
+Lets an endpoint read a request body of any length line by line while it
+is already streaming results back
+"""
+
+import json
+import asyncio
+from typing import Any, AsyncIterator, Optional, Tuple
+
+from starlette.responses import StreamingResponse
+
+# Marks the end of the input in read_ahead()'s queue
+END = object()
+
+
+class LineTooLong:
+    """Stands in for a line longer than the limit; the rest of it is skipped"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: Optional[int] = None) -> AsyncIterator[Any]:
+    """
+    Non-empty lines from a byte stream, however the chunks split them
+    Each chunk is scanned once, so a long line costs linear time. A line
+    past max_line_bytes comes out as a LineTooLong as soon as it gets
+    there, and its remaining bytes are dropped rather than buffered
+    """
+    pending = bytearray()
+    oversized = False
+    async for chunk in chunks:
+        start = 0
+        end = chunk.find(b"\n")
+        while end >= 0:
+            if not oversized:
+                pending += chunk[start:end]
+                if max_line_bytes and len(pending) > max_line_bytes:
+                    yield LineTooLong(max_line_bytes)
+                elif pending.strip():
+                    yield bytes(pending)
+            pending.clear()
+            oversized = False
+            start = end + 1
+            end = chunk.find(b"\n", start)
+        if not oversized:
+            pending += chunk[start:]
+            if max_line_bytes and len(pending) > max_line_bytes:
+                pending.clear()
+                oversized = True
+                yield LineTooLong(max_line_bytes)
+    if not oversized and pending.strip():
+        yield bytes(pending)
+
+
+def parse_line(line: Any) -> Tuple[Optional[Any], Optional[str]]:
+    """(value, None), or (None, error message) for a malformed line"""
+    if isinstance(line, LineTooLong):
+        return None, f"Line longer than {line.max_bytes} bytes"
+    try:
+        return json.loads(line), None
+    except ValueError as e:
+        return None, f"Invalid JSON: {e}"
+
+
+def read_ahead(
+    chunks: AsyncIterator[bytes], max_lines: int, max_line_bytes: Optional[int] = None
+) -> Tuple[asyncio.Queue, asyncio.Task]:
+    """
+    Read lines into a queue on a task of its own, ending with END (or the
+    exception that stopped it). Reading runs ahead of the response by up
+    to max_lines; past that it waits, and the client's upload stalls on
+    TCP flow control until results are consumed. A client that uploads
+    everything before it reads must keep its body under roughly that many
+    lines plus what the socket buffers hold. Lines past max_line_bytes
+    arrive as LineTooLong, so memory stays bounded by the window
+    """
+    lines: asyncio.Queue = asyncio.Queue(maxsize=max_lines)
+
+    async def read():
+        try:
+            async for line in iter_lines(chunks, max_line_bytes):
+                await lines.put(line)
+            await lines.put(END)
+        except Exception as e:  # ClientDisconnect included
+            await lines.put(e)
+
+    return lines, asyncio.ensure_future(read())
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose body iterator may still be reading the request
+    StreamingResponse watches receive() for a disconnect while streaming
+    (ASGI < 2.4, which includes uvicorn's HTTP protocols) and would swallow
+    the request body; here a disconnect surfaces through the request
+    stream instead (ClientDisconnect)
+    """
+
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,99 @@
+"""
+Small DAG executor for request handlers
+Independent stages (text extraction, detection, OCR) run concurrently,
+each on its own model executor, and per-stage timings are recorded
+"""
+
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Tuple
+
+
+class StagePipeline:
+    """
+    Stages are coroutine functions that receive their dependencies'
+    results as keyword arguments, e.g.
+
+        pipeline.add("decode", lambda: decode(contents))
+        pipeline.add("detect", lambda decode: detect(decode), after=["decode"])
+    """
+
+    def __init__(self):
+        self._stages: Dict[str, Tuple[Callable[..., Awaitable[Any]], Sequence[str]]] = {}
+        self._timings: Dict[str, Tuple[float, float]] = {}
+        self._started = 0.0
+        self._finished = 0.0
+
+    def add(
+        self,
+        name: str,
+        fn: Callable[..., Awaitable[Any]],
+        after: Sequence[str] = (),
+    ):
+        """Register a stage, dependencies must be added first"""
+        for dep in after:
+            if dep not in self._stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self._stages[name] = (fn, tuple(after))
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._stages
+
+    async def run(self) -> Dict[str, Any]:
+        """Run every stage as soon as its dependencies finish"""
+        self._started = time.perf_counter()
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_stage(name: str) -> Any:
+            fn, deps = self._stages[name]
+            inputs = {dep: await tasks[dep] for dep in deps}
+
+            started = time.perf_counter()
+            result = await fn(**inputs)
+            self._timings[name] = (started, time.perf_counter())
+            return result
+
+        for name in self._stages:
+            tasks[name] = asyncio.ensure_future(run_stage(name))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+        finally:
+            self._finished = time.perf_counter()
+
+        return {name: task.result() for name, task in tasks.items()}
+
+    def critical_path(self) -> List[str]:
+        """Chain of stages that determined the total latency"""
+        if not self._timings:
+            return []
+
+        path = []
+        name = max(self._timings, key=lambda n: self._timings[n][1])
+        while name:
+            path.append(name)
+            deps = [d for d in self._stages[name][1] if d in self._timings]
+            name = max(deps, key=lambda d: self._timings[d][1]) if deps else None
+
+        return list(reversed(path))
+
+    def report(self) -> Dict[str, Any]:
+        """Per-stage timing breakdown (milliseconds from pipeline start)"""
+        def ms(seconds: float) -> float:
+            return round(seconds * 1000, 2)
+
+        return {
+            "total_ms": ms(self._finished - self._started),
+            "stages": {
+                name: {
+                    "start_ms": ms(start - self._started),
+                    "duration_ms": ms(end - start),
+                }
+                for name, (start, end) in self._timings.items()
+            },
+            "critical_path": self.critical_path(),
+        }
@@ -66,9 +66,9 @@ CATEGORIES = {
 
 # Extraction prompts
 EXTRACTION_PROMPTS = {
-    "text_extraction": """Extract item details from this {post_type} item description.
-
-Text: "{text}"
+    # Static instructions first so their KV cache can be computed once at
+    # startup and shared by every request (see ItemExtractor)
+    "text_extraction": """Extract item details from a lost or found item description.
 
 Extract the following information as JSON:
 - title: A short descriptive title for the item
@@ -77,7 +77,12 @@ Extract the following information as JSON:
 - location: Object with description, city if mentioned
 - date: Date when lost/found if mentioned
 
-Return ONLY valid JSON, no explanation.""",
+Return ONLY valid JSON, no explanation.
+
+Post type: {post_type}
+Text: "{text}"
+
+JSON:""",
 
     "image_analysis": """Analyze this image and extract item details.
 
@@ -116,6 +121,27 @@ Make it clear, detailed, and helpful. Include any identifying details.
 Keep it under 200 words.""",
 }
 
+# Output schema of each extraction prompt, used to constrain local LLM decoding
+# "string" / "string|null" are JSON strings, lists are enums, dicts are objects
+EXTRACTION_SCHEMAS = {
+    "text_extraction": {
+        "title": "string",
+        "category": list(CATEGORIES) + ["other"],
+        "attributes": {
+            "color": "string|null",
+            "brand": "string|null",
+            "model": "string|null",
+            "size": "string|null",
+            "material": "string|null",
+        },
+        "location": {
+            "description": "string|null",
+            "city": "string|null",
+        },
+        "date": "string|null",
+    },
+}
+
 # Matching score explanations
 MATCH_EXPLANATIONS = {
     "category": "Both items are in the same category",
@@ -127,6 +153,22 @@ MATCH_EXPLANATIONS = {
     "embedding": "High semantic similarity detected by AI",
 }
 
+# Per-factor match reasons ({factor, score, details}), same wording as the
+# backend's matching.service.js so stored Match.matchReasons stay uniform
+MATCH_REASONS = {
+    "category": ("Category Match", 'Both items are in "{category}" category'),
+    "attributes": ("Attribute Match", "Matching: {attributes}"),
+    "location_city": ("Location Match", "Both items in {city}"),
+    "location_1km": ("Location Match", "Items found within 1km of each other"),
+    "location_5km": ("Location Match", "Items found within 5km of each other"),
+    "location_10km": ("Location Match", "Items found within 10km of each other"),
+    "time_1d": ("Time Match", "Items lost/found within 1 day of each other"),
+    "time_3d": ("Time Match", "Items lost/found within 3 days of each other"),
+    "time_7d": ("Time Match", "Items lost/found within a week of each other"),
+    "embedding": ("AI Similarity", "High semantic similarity detected"),
+    "text": ("Text Match", "Shared words: {words}"),
+}
+
 # Response templates
 RESPONSE_TEMPLATES = {
     "match_notification": """🔗 Potential Match Found!
@@ -0,0 +1,216 @@
+"""
+Rule-based extraction
+Pure functions (no model state) so they can run in worker processes
+"""
+
+import re
+import asyncio
+from concurrent.futures import Executor
+from typing import Dict, Any, Optional, List, Tuple
+
+from utils.prompts import CATEGORIES
+from utils.keywords import KeywordMatcher, KeywordHits
+
+COLORS = ["black", "white", "red", "blue", "green", "yellow", "orange", "purple",
+          "pink", "brown", "gray", "grey", "silver", "gold", "beige", "navy", "maroon"]
+
+BRANDS = ["apple", "iphone", "samsung", "galaxy", "google", "pixel", "huawei", "xiaomi",
+          "oneplus", "sony", "lg", "motorola", "nokia", "hp", "dell", "lenovo", "asus",
+          "acer", "microsoft", "surface", "macbook", "ipad", "airpods", "nike", "adidas",
+          "puma", "reebok", "converse", "vans", "gucci", "louis vuitton", "prada",
+          "coach", "michael kors", "ray-ban", "oakley", "rolex", "casio", "fossil"]
+
+ITEM_TYPES = {
+    "phone": ["phone", "iphone", "android", "smartphone", "mobile"],
+    "wallet": ["wallet", "purse", "billfold"],
+    "keys": ["keys", "keychain", "key fob", "car key"],
+    "bag": ["bag", "backpack", "handbag", "purse", "tote", "suitcase", "luggage"],
+    "laptop": ["laptop", "macbook", "notebook computer"],
+    "watch": ["watch", "smartwatch", "fitbit"],
+    "glasses": ["glasses", "sunglasses", "spectacles", "eyeglasses"],
+    "dog": ["dog", "puppy", "golden retriever", "labrador", "bulldog", "poodle", "beagle", "husky"],
+    "cat": ["cat", "kitten"],
+    "earbuds": ["earbuds", "airpods", "headphones", "earphones"],
+    "ring": ["ring", "engagement ring", "wedding ring"],
+    "necklace": ["necklace", "chain", "pendant"],
+    "camera": ["camera", "gopro", "dslr"],
+    "tablet": ["tablet", "ipad"],
+    "id card": ["id", "id card", "license", "passport", "driving license"],
+}
+
+POST_TYPE_KEYWORDS = {
+    "LOST": ["lost", "missing", "misplaced", "can't find", "cannot find",
+             "dropped", "left behind", "help me find", "looking for",
+             "have you seen", "please help", "i lost"],
+    "FOUND": ["found", "picked up", "discovered", "someone left",
+              "claim", "owner", "is this yours", "belongs to",
+              "i found", "we found", "came across"],
+}
+
+TAG_KEYWORDS = ["phone", "wallet", "keys", "bag", "laptop", "watch", "glasses",
+                "dog", "cat", "ring", "earbuds", "headphones", "camera", "tablet", "id", "passport"]
+
+# Every vocabulary in one matcher - one pass over the text finds all hits
+KEYWORD_MATCHER = KeywordMatcher({
+    "category": CATEGORIES,
+    "color": {c: [c] for c in COLORS},
+    "brand": {b: [b] for b in BRANDS},
+    "item_type": ITEM_TYPES,
+    "post_type": POST_TYPE_KEYWORDS,
+    "tag": {t: [t] for t in TAG_KEYWORDS},
+})
+
+LOCATION_PATTERNS = [
+    re.compile(r'(?:at|near|in|around|by|outside|inside)\s+(?:the\s+)?([A-Z][a-zA-Z\s]+(?:station|park|mall|center|centre|street|road|avenue|plaza|square|building|hospital|school|university|college|airport|market|store|shop|restaurant|cafe|hotel|office|gym|library|church|mosque|temple))', re.IGNORECASE),
+    re.compile(r'(?:near|at|in)\s+([A-Z][a-zA-Z\s]+)', re.IGNORECASE),
+    re.compile(r'(?:on|along)\s+([A-Z][a-zA-Z]+\s+(?:Street|Road|Avenue|Boulevard|Lane|Drive|Way|Place))', re.IGNORECASE),
+]
+
+DATE_PATTERNS = [
+    re.compile(r'(?:on|dated?)\s+(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4})', re.IGNORECASE),
+    re.compile(r'(\d{1,2}\s+(?:January|February|March|April|May|June|July|August|September|October|November|December)(?:\s+\d{4})?)', re.IGNORECASE),
+    re.compile(r'\b(yesterday|today|last\s+(?:night|evening|morning|week))\b', re.IGNORECASE),
+    re.compile(r'\b(this\s+(?:morning|afternoon|evening))\b', re.IGNORECASE),
+]
+
+PHONE_PATTERN = re.compile(r'(\+?\d{1,3}[-.\s]?\(?\d{2,4}\)?[-.\s]?\d{3,4}[-.\s]?\d{3,4})')
+PHONE_STRIP_PATTERN = re.compile(r'[^\d+]')
+EMAIL_PATTERN = re.compile(r'[\w\.-]+@[\w\.-]+\.\w+')
+REWARD_PATTERN = re.compile(r'(?:reward|cash reward|offering)\s*[:of]?\s*\$?\s*(\d+)', re.IGNORECASE)
+CONTACT_WORDS_PATTERN = re.compile(r'call|contact|reward|email|phone|@', re.IGNORECASE)
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+HASHTAG_PATTERN = re.compile(r'#\w+')
+MENTION_PATTERN = re.compile(r'@\w+')
+URL_PATTERN = re.compile(r'https?://\S+')
+RETWEET_PATTERN = re.compile(r'RT\s*:')
+
+
+def rule_based_extraction(text: str, hits: Optional[KeywordHits] = None) -> Dict[str, Any]:
+    result = {"title": None, "description": text[:500] if text else None, "category": None, 
+              "attributes": {}, "location": None, "date": None, "contact_info": None, "reward": None}
+    hits = hits or KEYWORD_MATCHER.scan(text)
+    
+    result["category"] = hits.first("category") or "other"
+    
+    color = hits.first("color")
+    if color:
+        result["attributes"]["color"] = color
+    
+    brand = hits.first("brand")
+    if brand:
+        result["attributes"]["brand"] = brand.title()
+    
+    for pattern in LOCATION_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            loc_text = match.group(1).strip()
+            if len(loc_text) > 3:
+                result["location"] = {"description": loc_text}
+                break
+    
+    for pattern in DATE_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            result["date"] = match.group(1) if match.lastindex else match.group(0)
+            break
+    
+    contact = {}
+    phone_match = PHONE_PATTERN.search(text)
+    if phone_match:
+        phone = PHONE_STRIP_PATTERN.sub('', phone_match.group(1))
+        if len(phone) >= 10:
+            contact["phone"] = phone
+    email_match = EMAIL_PATTERN.search(text)
+    if email_match:
+        contact["email"] = email_match.group(0)
+    if contact:
+        result["contact_info"] = contact
+    
+    reward_match = REWARD_PATTERN.search(text)
+    if reward_match:
+        result["reward"] = f"${reward_match.group(1)}"
+    
+    detected_item = hits.first("item_type")
+    
+    title_parts = []
+    if result["attributes"].get("color"):
+        title_parts.append(result["attributes"]["color"].title())
+    if result["attributes"].get("brand"):
+        title_parts.append(result["attributes"]["brand"])
+    if detected_item:
+        title_parts.append(detected_item.title())
+    
+    if title_parts:
+        result["title"] = " ".join(title_parts)
+    else:
+        sentences = text.split('.')
+        for sentence in sentences:
+            clean = sentence.strip()
+            if 10 < len(clean) < 100:
+                if not CONTACT_WORDS_PATTERN.search(clean):
+                    result["title"] = clean
+                    break
+        if not result["title"]:
+            result["title"] = text[:80].strip()
+    
+    return result
+
+
+def detect_post_type(text: str, hits: Optional[KeywordHits] = None) -> str:
+    hits = hits or KEYWORD_MATCHER.scan(text)
+    lost_score = hits.count("post_type", "LOST")
+    found_score = hits.count("post_type", "FOUND")
+    return "FOUND" if found_score > lost_score else "LOST"
+
+
+def clean_description(text: str) -> str:
+    cleaned = WHITESPACE_PATTERN.sub(' ', text.strip())
+    cleaned = HASHTAG_PATTERN.sub('', cleaned)
+    cleaned = MENTION_PATTERN.sub('', cleaned)
+    cleaned = URL_PATTERN.sub('', cleaned)
+    cleaned = RETWEET_PATTERN.sub('', cleaned)
+    cleaned = WHITESPACE_PATTERN.sub(' ', cleaned).strip()
+    return cleaned[:1000] if cleaned else text[:1000]
+
+
+def generate_tags(result: Dict[str, Any]) -> List[str]:
+    tags = []
+    category = result.get("category", "")
+    if category and category != "other":
+        tags.append(category)
+    attrs = result.get("attributes", {})
+    if attrs.get("color"):
+        tags.append(attrs["color"])
+    if attrs.get("brand"):
+        tags.append(attrs["brand"].lower())
+    title = result.get("title") or ""
+    tag = KEYWORD_MATCHER.scan(title).first("tag")
+    if tag:
+        tags.append(tag)
+    return list(set(tags))
+
+
+def rule_based_pass(text: str) -> Tuple[Dict[str, Any], str]:
+    """
+    Everything ItemExtractor needs from the rules for one text
+    Returns (rule result, detected post type) from a single keyword scan
+    """
+    hits = KEYWORD_MATCHER.scan(text)
+    return rule_based_extraction(text, hits), detect_post_type(text, hits)
+
+
+def rule_based_pass_batch(texts: List[str]) -> List[Tuple[Dict[str, Any], str]]:
+    """rule_based_pass over a chunk - the unit of work for the process pool"""
+    return [rule_based_pass(text) for text in texts]
+
+
+async def rule_pass(pool: Executor, texts: List[str], workers: int) -> List[Tuple[Dict[str, Any], str]]:
+    """Rule-based pass over a bulk import, split across a process pool"""
+    loop = asyncio.get_running_loop()
+    chunk = max(1, -(-len(texts) // workers))
+    parts = await asyncio.gather(*(
+        loop.run_in_executor(pool, rule_based_pass_batch, texts[i:i + chunk])
+        for i in range(0, len(texts), chunk)
+    ))
+    return [r for part in parts for r in part]
@@ -0,0 +1,359 @@
+"""
+Vector index over post embeddings
+Flat (exact) search for small corpora, IVF (k-means partitioned) search
+once the corpus grows past a configurable size
+"""
+
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+class VectorIndex:
+    """
+    In-memory index of normalized post embeddings with category/post_type filters
+    Rows are kept dense (deletes swap the last row into the hole) so the
+    flat path is a single matmul over a contiguous float32 block
+    """
+
+    def __init__(
+        self,
+        dimension: int,
+        ivf_threshold: int = None,
+        nprobe: int = None,
+    ):
+        self.dimension = dimension
+        self.ivf_threshold = ivf_threshold or int(os.getenv("VECTOR_INDEX_IVF_THRESHOLD", 50000))
+        self.nprobe = nprobe or int(os.getenv("VECTOR_INDEX_NPROBE", 8))
+
+        self._lock = threading.RLock()
+        self._vectors = np.zeros((1024, dimension), dtype=np.float32)
+        self._categories = np.zeros(1024, dtype=np.int16)
+        self._post_types = np.zeros(1024, dtype=np.int8)
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+
+        # String labels are stored as small integer codes
+        self._category_codes: Dict[str, int] = {}
+        self._post_type_codes: Dict[str, int] = {}
+
+        # IVF state (None until the corpus is large enough)
+        self._centroids: Optional[np.ndarray] = None
+        self._assign = np.zeros(1024, dtype=np.int32)
+        self._members: List[set] = []
+        self._member_arrays: Dict[int, np.ndarray] = {}
+        self._trained_size = 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @staticmethod
+    def _code(codes: Dict[str, int], label: Optional[str]) -> int:
+        label = (label or "").lower()
+        if label not in codes:
+            codes[label] = len(codes)
+        return codes[label]
+
+    def _grow(self, size: int):
+        capacity = len(self._vectors)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        self._vectors = np.resize(self._vectors, (capacity, self.dimension))
+        self._categories = np.resize(self._categories, capacity)
+        self._post_types = np.resize(self._post_types, capacity)
+        self._assign = np.resize(self._assign, capacity)
+
+    # ============== Writes ==============
+
+    def upsert(
+        self,
+        post_id: str,
+        vector: np.ndarray,
+        category: Optional[str] = None,
+        post_type: Optional[str] = None,
+    ):
+        """Insert or replace a post's embedding"""
+        self.upsert_batch([post_id], [vector], [category], [post_type])
+
+    def upsert_batch(
+        self,
+        post_ids: List[str],
+        vectors: np.ndarray,
+        categories: Optional[List[Optional[str]]] = None,
+        post_types: Optional[List[Optional[str]]] = None,
+    ):
+        """Insert or replace many embeddings with one vectorized write"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(post_ids), -1)
+        if vectors.shape[1] != self.dimension:
+            raise ValueError(f"Expected {self.dimension}-dim vectors, got {vectors.shape[1]}")
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+
+        categories = categories or [None] * len(post_ids)
+        post_types = post_types or [None] * len(post_ids)
+
+        with self._lock:
+            rows = np.empty(len(post_ids), dtype=np.int64)
+            for i, post_id in enumerate(post_ids):
+                row = self._rows.get(post_id)
+                if row is None:
+                    row = len(self._ids)
+                    self._ids.append(post_id)
+                    self._rows[post_id] = row
+                elif self._centroids is not None:
+                    self._unassign(row)
+                rows[i] = row
+
+            self._grow(len(self._ids))
+            self._vectors[rows] = vectors
+            self._categories[rows] = [self._code(self._category_codes, c) for c in categories]
+            self._post_types[rows] = [self._code(self._post_type_codes, t) for t in post_types]
+
+            if self._centroids is not None:
+                self._assign_rows(rows)
+
+            self._maybe_train()
+
+    def delete(self, post_id: str) -> bool:
+        """Remove a post, returns False if it wasn't indexed"""
+        with self._lock:
+            row = self._rows.pop(post_id, None)
+            if row is None:
+                return False
+
+            last = len(self._ids) - 1
+            if self._centroids is not None:
+                self._unassign(row)
+                if row != last:
+                    self._unassign(last)
+
+            if row != last:
+                # Move the last row into the hole to keep storage dense
+                moved_id = self._ids[last]
+                self._vectors[row] = self._vectors[last]
+                self._categories[row] = self._categories[last]
+                self._post_types[row] = self._post_types[last]
+                self._ids[row] = moved_id
+                self._rows[moved_id] = row
+                if self._centroids is not None:
+                    self._assign[row] = self._assign[last]
+                    self._members[self._assign[row]].add(row)
+                    self._member_arrays.pop(int(self._assign[row]), None)
+
+            self._ids.pop()
+            return True
+
+    def delete_batch(self, post_ids: List[str]) -> int:
+        """Remove several posts under one lock, returns how many were indexed"""
+        with self._lock:
+            return sum(self.delete(post_id) for post_id in post_ids)
+
+    # ============== IVF ==============
+
+    def _unassign(self, row: int):
+        cluster = int(self._assign[row])
+        self._members[cluster].discard(row)
+        self._member_arrays.pop(cluster, None)
+
+    def _assign_rows(self, rows: np.ndarray):
+        clusters = np.argmax(self._vectors[rows] @ self._centroids.T, axis=1)
+        self._assign[rows] = clusters
+        for row, cluster in zip(rows.tolist(), clusters.tolist()):
+            self._members[cluster].add(row)
+            self._member_arrays.pop(cluster, None)
+
+    def _maybe_train(self):
+        size = len(self._ids)
+        if size < self.ivf_threshold:
+            return
+        # Retrain whenever the corpus has doubled since the last training
+        if self._centroids is not None and size < 2 * self._trained_size:
+            return
+        self.train()
+
+    def train(self, n_iter: int = 10, seed: int = 0):
+        """(Re)build the IVF partitions with spherical k-means"""
+        with self._lock:
+            size = len(self._ids)
+            if size == 0:
+                return
+
+            # Never more lists than vectors to seed them from
+            n_lists = max(1, min(int(4 * np.sqrt(size)), size))
+            rng = np.random.default_rng(seed)
+            sample_size = min(size, n_lists * 16)
+            sample = self._vectors[rng.choice(size, sample_size, replace=False)]
+
+            centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+            for _ in range(n_iter):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                order = np.argsort(labels, kind="stable")
+                present, starts = np.unique(labels[order], return_index=True)
+                sums = np.zeros_like(centroids)
+                sums[present] = np.add.reduceat(sample[order], starts, axis=0)
+                norms = np.linalg.norm(sums, axis=1, keepdims=True)
+                # Empty clusters keep their previous centroid
+                centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+
+            self._centroids = centroids.astype(np.float32)
+            self._members = [set() for _ in range(n_lists)]
+            self._member_arrays = {}
+            self._trained_size = size
+
+            # Assign in chunks to bound peak memory
+            for start in range(0, size, 65536):
+                self._assign_rows(np.arange(start, min(start + 65536, size)))
+
+    def _candidate_rows(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        scores = self._centroids @ query
+        probes = np.argpartition(-scores, nprobe - 1)[:nprobe]
+
+        arrays = []
+        for cluster in probes.tolist():
+            members = self._member_arrays.get(cluster)
+            if members is None:
+                members = np.fromiter(self._members[cluster], dtype=np.int64)
+                self._member_arrays[cluster] = members
+            arrays.append(members)
+
+        return np.concatenate(arrays) if arrays else np.empty(0, dtype=np.int64)
+
+    # ============== Search ==============
+
+    def search(
+        self,
+        query: np.ndarray,
+        top_k: int = 10,
+        category: Optional[str] = None,
+        post_type: Optional[str] = None,
+        exclude_id: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Top-k most similar posts by cosine similarity
+        Returns list of {post_id, score} sorted by score descending
+        """
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        with self._lock:
+            size = len(self._ids)
+            if size == 0:
+                return []
+
+            category_code = post_type_code = None
+            if category is not None:
+                category_code = self._category_codes.get(category.lower())
+                if category_code is None:
+                    return []
+            if post_type is not None:
+                post_type_code = self._post_type_codes.get(post_type.lower())
+                if post_type_code is None:
+                    return []
+            exclude_row = self._rows.get(exclude_id) if exclude_id else None
+
+            if self._centroids is None:
+                rows = None
+                scores = self._scores(rows, query, category_code, post_type_code, exclude_row)
+            else:
+                nprobe = min(self.nprobe, len(self._centroids))
+                while True:
+                    rows = self._candidate_rows(query, nprobe)
+                    scores = self._scores(rows, query, category_code, post_type_code, exclude_row)
+                    # Filters apply to the probed lists only - widen the probe
+                    # until k posts pass them (every list probed = exact search)
+                    if nprobe == len(self._centroids) or np.count_nonzero(scores > -np.inf) >= top_k:
+                        break
+                    nprobe = min(2 * nprobe, len(self._centroids))
+
+            if len(scores) == 0:
+                return []
+
+            k = min(top_k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+
+            results = []
+            for position in top.tolist():
+                score = float(scores[position])
+                if score == -np.inf:
+                    break
+                row = position if rows is None else int(rows[position])
+                results.append({"post_id": self._ids[row], "score": round(score, 4)})
+            return results
+
+    def _scores(
+        self,
+        rows: Optional[np.ndarray],
+        query: np.ndarray,
+        category_code: Optional[int],
+        post_type_code: Optional[int],
+        exclude_row: Optional[int],
+    ) -> np.ndarray:
+        """Cosine scores of rows (None = every row), -inf where filtered out"""
+        if rows is None:
+            size = len(self._ids)
+            vectors = self._vectors[:size]
+            categories = self._categories[:size]
+            post_types = self._post_types[:size]
+        else:
+            vectors = self._vectors[rows]
+            categories = self._categories[rows]
+            post_types = self._post_types[rows]
+
+        scores = vectors @ query
+
+        # Filtered-out rows can never make the top-k
+        if category_code is not None:
+            scores[categories != category_code] = -np.inf
+        if post_type_code is not None:
+            scores[post_types != post_type_code] = -np.inf
+        if exclude_row is not None:
+            if rows is None:
+                scores[exclude_row] = -np.inf
+            else:
+                scores[rows == exclude_row] = -np.inf
+        return scores
+
+    # ============== Persistence ==============
+
+    def save(self, path: str):
+        """Write vectors and metadata to an .npz file"""
+        with self._lock:
+            size = len(self._ids)
+            categories = {v: k for k, v in self._category_codes.items()}
+            post_types = {v: k for k, v in self._post_type_codes.items()}
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            np.savez(
+                path,
+                ids=np.array(self._ids, dtype=object),
+                vectors=self._vectors[:size],
+                categories=np.array([categories[c] for c in self._categories[:size].tolist()], dtype=object),
+                post_types=np.array([post_types[c] for c in self._post_types[:size].tolist()], dtype=object),
+            )
+
+    def load(self, path: str):
+        """Load an index written by save()"""
+        data = np.load(path, allow_pickle=True)
+        self.upsert_batch(
+            [str(i) for i in data["ids"]],
+            data["vectors"],
+            [c or None for c in data["categories"]],
+            [t or None for t in data["post_types"]],
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._ids),
+            "dimension": self.dimension,
+            "mode": "ivf" if self._centroids is not None else "flat",
+            "lists": len(self._centroids) if self._centroids is not None else 0,
+            "nprobe": self.nprobe,
+            "ivf_threshold": self.ivf_threshold,
+        }